@@ -17,6 +17,7 @@ from .extensions import ma
 from .resource import NodeResource
 from .resource import NodeListResource
 from .resource import CreateNodeResource
+from .resource import NodeHealthResource
 from .resource import ClusterResource
 from .resource import ClusterListResource
 from .resource import ProviderResource
@@ -31,11 +32,22 @@ from .resource import ContainerLogListResource
 from .resource import ContainerListResource
 from .resource import ContainerResource
 from .resource import NewContainerResource
+from .resource import ContainerResumeResource
 from .resource import ScaleContainerResource
+from .resource import DatabaseMetricsResource
+from .resource import JobListResource
+from .resource import JobResource
 from .database import db
+from .dockerclient import client_pool
+from .templating import templates
+from .modelcache import singletons
+from .scheduler import scheduler
+from .helper.node_helper import status_executor
+from .machine import node_health
 from .setup.signals import connect_setup_signals
 from .setup.signals import connect_teardown_signals
 from .log import configure_global_logging
+from .utils import claim_runfile
 
 
 def _get_config_object(api_env=""):
@@ -68,6 +80,7 @@ def create_app():
 
     register_resources()
     register_extensions(app)
+    register_hooks(app)
 
     crochet_setup()
     connect_setup_signals()
@@ -78,7 +91,38 @@ def create_app():
 def register_extensions(app):
     restapi.init_app(app)
     db.init_app(app)
+    if app.config.get("DATABASE_ENSURE_INDEXES"):
+        with app.app_context():
+            db.ensure_indexes()
     ma.init_app(app)
+    client_pool.init_app(app)
+    templates.init_app(app)
+    singletons.init_app(app)
+    scheduler.init_app(app)
+    status_executor.init_app(app)
+    node_health.init_app(app)
+
+
+def register_hooks(app):
+    @app.before_request
+    def begin_unit_of_work():
+        # repeated lookups within a request are served from identity map
+        db.begin_unit()
+
+    @app.teardown_request
+    def end_unit_of_work(exc=None):
+        db.end_unit()
+
+    if app.config["DEPLOY_DISPATCHER_AUTOSTART"]:
+        @app.before_first_request
+        def start_dispatcher():
+            # when launched without ``gsettings.py`` (e.g. dev server),
+            # no worker has claimed the dispatcher; queued jobs would
+            # never run otherwise
+            runfile = os.path.join(app.config["DATA_DIR"], "scheduler.run")
+            if claim_runfile(runfile):
+                app.logger.info("launching deployment scheduler")
+                scheduler.start(app)
 
 
 def register_resources():
@@ -86,6 +130,9 @@ def register_resources():
                          '/nodes/<string:node_type>',
                          endpoint='create_node')
     restapi.add_resource(NodeListResource, '/nodes', endpoint='node_list')
+    restapi.add_resource(NodeHealthResource,
+                         '/nodes/health',
+                         endpoint='node_health')
     restapi.add_resource(NodeResource,
                          '/nodes/<string:node_name>',
                          endpoint='node')
@@ -142,6 +189,10 @@ def register_resources():
                          "/containers/<string:container_id>",
                          endpoint="container",
                          )
+    restapi.add_resource(ContainerResumeResource,
+                         "/containers/<string:container_id>/resume",
+                         endpoint="container_resume",
+                         )
     restapi.add_resource(NewContainerResource,
                          "/containers/<string:container_type>",
                          endpoint="new_container",
@@ -150,3 +201,14 @@ def register_resources():
                          "/scale-containers/<string:container_type>/<int:number>",
                          endpoint="scale_container",
                          )
+
+    restapi.add_resource(DatabaseMetricsResource,
+                         "/metrics/database",
+                         endpoint="database_metrics",
+                         )
+
+    restapi.add_resource(JobListResource, "/jobs", endpoint="job_list")
+    restapi.add_resource(JobResource,
+                         "/jobs/<string:job_id>",
+                         endpoint="job",
+                         )
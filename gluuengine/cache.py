@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import threading
+import time
+
+#: Default number of seconds before cached value is expired
+DEFAULT_TTL = 60
+
+
+class TTLCache(object):
+    """A thread-safe in-process cache where each key has its own
+    time-to-live.
+
+    :param default_ttl: Number of seconds before cached value is expired,
+                        if ``ttl`` is not passed to :meth:`set`.
+    """
+
+    def __init__(self, default_ttl=DEFAULT_TTL):
+        self.default_ttl = default_ttl
+
+        # a mapping of key and ``(value, expires_at)``
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Gets cached value.
+
+        :param key: Cache key.
+        :param default: Value returned if key is missing or expired.
+        :returns: Cached value or ``default``.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Sets cached value.
+
+        :param key: Cache key.
+        :param value: Value to cache.
+        :param ttl: Number of seconds before value is expired.
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        """Removes cached value (if any).
+
+        :param key: Cache key.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """Removes cached values whose key matches given predicate.
+
+        :param predicate: A callable which accepts a key and returns
+                          ``True`` if the key must be removed.
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        """Removes all cached values.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        missing = object()
+        return self.get(key, missing) is not missing
@@ -7,9 +7,11 @@ import os
 import uuid
 
 import click
+from pymongo.errors import PyMongoError
 
 from .app import create_app
 from .database import db
+from .database import INDEXES
 from .dockerclient import Docker
 from .errors import DockerExecError
 from .machine import Machine
@@ -145,10 +147,7 @@ def distribute_ssl_cert():
         return
 
     with app.app_context():
-        try:
-            master_node = db.search_from_table("nodes", {"type": "master"})[0]
-        except IndexError:
-            master_node = None
+        master_node = db.get_master_node()
 
         if not master_node:
             click.echo("master node is not available; process cancelled")
@@ -207,3 +206,30 @@ def distribute_ssl_cert():
 
         # mark the process as finished
         click.echo("distributing SSL cert and key is done")
+
+
+@main.command("index-usage")
+@click.option("--ensure", is_flag=True,
+              help="Create missing indexes before reporting.")
+def index_usage(ensure):
+    """Report usage of database indexes.
+    """
+    app = create_app()
+
+    with app.app_context():
+        if ensure and not db.ensure_indexes():
+            click.echo("unable to create indexes; process cancelled")
+            return
+
+        for table_name in sorted(INDEXES):
+            click.echo("{}:".format(table_name))
+            try:
+                stats = db.index_usage(table_name)
+            except PyMongoError as exc:
+                # e.g. embedded backend doesn't support ``$indexStats``
+                click.echo("  unable to get index usage; reason={}".format(exc))
+                continue
+            for stat in stats:
+                click.echo("  {:<40} ops={:<10} since={}".format(
+                    stat["name"], stat["ops"], stat["since"],
+                ))
@@ -3,73 +3,488 @@
 #
 # All rights reserved.
 
-import json
+import logging
+import threading
+import urllib
+import urlparse
+from contextlib import contextmanager
 
-import jsonpickle
-from werkzeug.utils import import_string
 from flask_pymongo import PyMongo
+from pymongo import ASCENDING
+from pymongo import DeleteOne
+from pymongo import InsertOne
+from pymongo import ReplaceOne
+from pymongo import ReadPreference
+from pymongo.errors import PyMongoError
+
+from .dbmonitor import db_metrics
+from .dbmonitor import register_listeners
+from .modelcache import singletons
+from .serializer import dump
+from .serializer import encode_value
+from .serializer import load
+from .serializer import ModelView
+from .sqlitedb import is_sqlite_uri
+from .sqlitedb import path_from_uri
+from .sqlitedb import SQLiteDatabase
+from .unitofwork import query_key
+from .unitofwork import UnitOfWork
+
+#: Indexes of each collection; compound indexes follow the query shapes
+#: used by models and resources (equality on ``node_id`` or ``cluster_id``,
+#: then ``type`` and ``state``)
+INDEXES = {
+    "containers": [
+        [("id", ASCENDING)],
+        [("name", ASCENDING)],
+        [("node_id", ASCENDING), ("type", ASCENDING), ("state", ASCENDING)],
+        [("cluster_id", ASCENDING), ("type", ASCENDING), ("state", ASCENDING)],
+        [("type", ASCENDING), ("state", ASCENDING)],
+    ],
+    "nodes": [
+        [("id", ASCENDING)],
+        [("name", ASCENDING)],
+        [("type", ASCENDING)],
+    ],
+    "container_logs": [
+        [("id", ASCENDING)],
+        [("container_name", ASCENDING)],
+    ],
+    "clusters": [
+        [("id", ASCENDING)],
+    ],
+    "providers": [
+        [("id", ASCENDING)],
+        [("driver", ASCENDING)],
+    ],
+    "license_keys": [
+        [("id", ASCENDING)],
+    ],
+    "jobs": [
+        [("id", ASCENDING)],
+        [("state", ASCENDING), ("key", ASCENDING)],
+        [("state", ASCENDING), ("group", ASCENDING)],
+    ],
+}
+
+
+#: A mapping of ``Config`` key and its MongoDB URI option
+POOL_OPTIONS = (
+    ("DATABASE_MAX_POOL_SIZE", "maxPoolSize"),
+    ("DATABASE_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS"),
+    ("DATABASE_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS"),
+    ("DATABASE_CONNECT_TIMEOUT_MS", "connectTimeoutMS"),
+    ("DATABASE_SOCKET_TIMEOUT_MS", "socketTimeoutMS"),
+)
+
+#: A mapping of read preference name and its object
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def with_pool_options(uri, config):
+    """Adds connection pool options from config into MongoDB URI.
+
+    Options already set in URI take precedence.
+
+    :param uri: MongoDB URI.
+    :param config: App's config.
+    :returns: MongoDB URI with pool options.
+    """
+    parts = urlparse.urlsplit(uri)
+    query = urlparse.parse_qsl(parts.query)
+    existing = set(k.lower() for k, _ in query)
+
+    for config_key, option in POOL_OPTIONS:
+        value = config.get(config_key)
+        if value is None or option.lower() in existing:
+            continue
+        query.append((option, value))
+
+    return urlparse.urlunsplit((
+        parts.scheme, parts.netloc, parts.path,
+        urllib.urlencode(query), parts.fragment,
+    ))
 
 
 class Database(PyMongo):
+    def __init__(self, app=None, config_prefix="MONGO"):
+        self.logger = logging.getLogger(
+            __name__ + "." + self.__class__.__name__,
+        )
+        self._local = threading.local()
+        self.list_read_preference = None
+        super(Database, self).__init__(app, config_prefix)
+
+    def init_app(self, app, config_prefix="MONGO"):
+        uri_key = "{}_URI".format(config_prefix)
+        if is_sqlite_uri(app.config.get(uri_key, "")):
+            self._init_sqlite(app, config_prefix, app.config[uri_key])
+            return
+
+        if app.config.get(uri_key):
+            app.config[uri_key] = with_pool_options(
+                app.config[uri_key], app.config,
+            )
+
+        # listeners must be registered before client is created
+        db_metrics.slow_query_ms = app.config.get(
+            "DATABASE_SLOW_QUERY_MS", db_metrics.slow_query_ms,
+        )
+        register_listeners(db_metrics)
+
+        read_pref = app.config.get("DATABASE_LIST_READ_PREFERENCE", "primary")
+        try:
+            self.list_read_preference = READ_PREFERENCES[read_pref]
+        except KeyError:
+            raise ValueError("DATABASE_LIST_READ_PREFERENCE: no such read "
+                             "preference name ({!r})".format(read_pref))
+        super(Database, self).init_app(app, config_prefix)
+
+    def _init_sqlite(self, app, config_prefix, uri):
+        # embedded database is stored in the same slot used by
+        # flask-pymongo, hence ``self.db`` works for both backends;
+        # initializing the app again starts with a fresh in-memory database
+        self.config_prefix = config_prefix
+        self.list_read_preference = None
+        app.extensions.setdefault("pymongo", {})[config_prefix] = (
+            None, SQLiteDatabase(path_from_uri(uri)),
+        )
+
+    def _list_collection(self, table_name):
+        # list endpoints may tolerate slightly stale reads, hence they
+        # can be served by secondaries
+        collection = self.db[table_name]
+        if self.list_read_preference is None:
+            return collection
+        return collection.with_options(
+            read_preference=self.list_read_preference,
+        )
+
+    @property
+    def unit(self):
+        """Unit of work of current thread (if any).
+        """
+        return getattr(self._local, "unit", None)
+
+    def begin_unit(self):
+        """Starts a unit of work in current thread (if not started yet).
+
+        :returns: ``True`` if a new unit of work is started.
+        """
+        if self.unit is not None:
+            return False
+        self._local.unit = UnitOfWork()
+        return True
+
+    def end_unit(self):
+        """Ends unit of work of current thread.
+        """
+        self._local.unit = None
+
+    @contextmanager
+    def unit_of_work(self):
+        """Runs the block in a unit of work; repeated lookups within
+        the block are served from identity map. Nested blocks share
+        the outermost unit of work.
+        """
+        started = self.begin_unit()
+        try:
+            yield self.unit
+        finally:
+            if started:
+                self.end_unit()
+
+    def _cached_query(self, table_name, key, loader):
+        unit = self.unit
+        if unit is None:
+            return loader()
+
+        objs = unit.get_query(table_name, key)
+        if objs is None:
+            objs = unit.set_query(table_name, key, loader())
+        return list(objs)
+
+    def _invalidate(self, table_name):
+        # called after each write
+        singletons.invalidate(table_name)
+
+        unit = self.unit
+        if unit is not None:
+            unit.invalidate(table_name)
+
+    def _first(self, table_name, condition=None):
+        if condition is None:
+            objs = self.all(table_name)
+        else:
+            objs = self.search_from_table(table_name, condition)
+        return objs[0] if objs else None
+
+    def get_cluster(self):
+        """Gets the cluster (cached process-wide).
+
+        :returns: A copy of cluster object or ``None``.
+        """
+        return singletons.get(
+            "clusters", "cluster", lambda: self._first("clusters"),
+        )
+
+    def get_master_node(self):
+        """Gets the master node (cached process-wide).
+
+        :returns: A copy of master node object or ``None``.
+        """
+        return singletons.get(
+            "nodes", "master",
+            lambda: self._first("nodes", {"type": "master"}),
+        )
+
+    def get_discovery_node(self):
+        """Gets the discovery node (cached process-wide).
+
+        :returns: A copy of discovery node object or ``None``.
+        """
+        return singletons.get(
+            "nodes", "discovery",
+            lambda: self._first("nodes", {"type": "discovery"}),
+        )
+
     def _load_pyobject(self, data):
-        # ``jsonpickle.decode`` automatically instantiates object from
-        # ``py/object`` value stored in database; the problem is,
-        # this object won't recognize new attribute hence we're
-        # instantiating object and setting its attributes manually
-        cls = import_string(data["py/object"])
-        obj = cls()
-        for k, v in data.iteritems():
-            setattr(obj, k, v)
-        return obj
+        # model class is looked up from ``py/object`` value stored in
+        # database; attributes unknown to the stored document are
+        # populated from class's defaults
+        return load(data)
+
+    def _iter_items(self, data, projection=None):
+        if projection is None:
+            for item in data:
+                yield self._load_pyobject(item)
+            return
+
+        # partially loaded documents are wrapped in read-only views
+        fields = [k for k, v in projection.iteritems() if v]
+        for item in data:
+            yield ModelView(item, fields)
+
+    def _load_items(self, data, projection=None):
+        return list(self._iter_items(data, projection))
 
     def get(self, identifier, table_name):
-        obj = self.db[table_name].find_one({"id": identifier})
+        def loader():
+            obj = self.db[table_name].find_one({"id": identifier})
+            return [self._load_pyobject(obj)] if obj else []
 
-        if not obj:
-            return
-        return self._load_pyobject(obj)
+        objs = self._cached_query(
+            table_name, query_key("get", identifier), loader,
+        )
+        return objs[0] if objs else None
 
     def persist(self, obj, table_name):
         # encode the object so we can decode it later
-        encoded = jsonpickle.encode(obj)
-
-        # tinydb requires a ``dict`` object
-        data = json.loads(encoded)
+        data = dump(obj)
         data["_id"] = data["id"]
-        return self.db[table_name].insert_one(data)
+        result = self.db[table_name].insert_one(data)
+        self._invalidate(table_name)
+        return result
 
-    def all(self, table_name):
-        data = self.db[table_name].find()
-        return [self._load_pyobject(item) for item in data]
+    def all(self, table_name, projection=None):
+        def loader():
+            return self._load_items(self.db[table_name].find())
+
+        # views of partially loaded documents (used by list endpoints)
+        # are not cached
+        if projection is not None:
+            data = self._list_collection(table_name).find(projection=projection)
+            return self._load_items(data, projection)
+        return self._cached_query(table_name, query_key("all"), loader)
 
     def delete(self, identifier, table_name):
-        return self.db[table_name].delete_one({"id": identifier})
+        result = self.db[table_name].delete_one({"id": identifier})
+        self._invalidate(table_name)
+        return result
 
     def update(self, identifier, obj, table_name):
         # encode the object so we can decode it later
-        encoded = jsonpickle.encode(obj)
+        data = dump(obj)
+        result = self.db[table_name].update({"id": identifier}, data, True)
+        self._invalidate(table_name)
+        return result
+
+    def search_from_table(self, table_name, condition, projection=None):
+        def loader():
+            return self._load_items(self.db[table_name].find(condition))
+
+        # views of partially loaded documents (used by list endpoints)
+        # are not cached
+        if projection is not None:
+            data = self._list_collection(table_name).find(
+                condition, projection=projection,
+            )
+            return self._load_items(data, projection)
+        return self._cached_query(
+            table_name, query_key("search", condition), loader,
+        )
+
+    def iter_from_table(self, table_name, condition=None, projection=None):
+        """Iterates model objects (ordered by ``id``) straight from
+        database cursor.
+
+        :param table_name: Name of the collection.
+        :param condition: Query condition.
+        :param projection: Query projection (if any); see
+                           :func:`~gluuengine.serializer.projection`.
+        :returns: A generator of model objects (or views).
+        """
+        data = self._list_collection(table_name).find(
+            condition or {}, projection=projection,
+        ).sort("id", ASCENDING)
+        return self._iter_items(data, projection)
+
+    def paginate(self, table_name, condition=None, projection=None,
+                 limit=100, after=None):
+        """Gets a page of model objects ordered by ``id``.
 
-        # tinydb requires a ``dict`` object
-        data = json.loads(encoded)
-        return self.db[table_name].update({"id": identifier}, data, True)
+        :param table_name: Name of the collection.
+        :param condition: Query condition.
+        :param projection: Query projection (if any).
+        :param limit: Maximum number of objects in a page.
+        :param after: ``id`` of last object in previous page (if any).
+        :returns: A tuple of list of model objects (or views) and ``id``
+                  of last object if there are more pages, otherwise ``None``.
+        """
+        condition = condition or {}
+        if after is not None:
+            condition = {"$and": [condition, {"id": {"$gt": after}}]}
 
-    def search_from_table(self, table_name, condition):
-        data = self.db[table_name].find(condition)
-        return [self._load_pyobject(item) for item in data]
+        # fetch an extra document to find out whether next page exists
+        data = self._list_collection(table_name).find(
+            condition, projection=projection,
+        ).sort("id", ASCENDING).limit(limit + 1)
+        items = self._load_items(data, projection)
+
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, items[-1].id
 
     def count_from_table(self, table_name, condition):
         return self.db[table_name].count(condition)
 
     def update_to_table(self, table_name, condition, obj):
         # encode the object so we can decode it later
-        encoded = jsonpickle.encode(obj)
+        data = dump(obj)
+        result = self.db[table_name].update(condition, data, True)
+        self._invalidate(table_name)
+        return result
+
+    def set_fields(self, table_name, condition, fields):
+        """Updates given fields of a document atomically (using ``$set``)
+        instead of replacing the whole document.
+
+        :param table_name: Name of the collection.
+        :param condition: Query condition of the document.
+        :param fields: A ``dict`` of field name and its new value.
+        :returns: An instance of ``pymongo.results.UpdateResult``.
+        """
+        result = self.db[table_name].update_one(
+            condition, {"$set": encode_value(fields)},
+        )
+        self._invalidate(table_name)
+        return result
+
+    def bulk_persist(self, objs, table_name):
+        """Inserts model objects in a single batch.
+
+        :param objs: A list of model objects.
+        :param table_name: Name of the collection.
+        :returns: An instance of ``pymongo.results.BulkWriteResult``
+                  or ``None`` if there's nothing to write.
+        """
+        requests = []
+        for obj in objs:
+            data = dump(obj)
+            data["_id"] = data["id"]
+            requests.append(InsertOne(data))
+        return self._bulk_write(table_name, requests)
+
+    def bulk_update(self, objs, table_name):
+        """Replaces (or inserts) documents of model objects in a single
+        batch.
+
+        :param objs: A list of model objects.
+        :param table_name: Name of the collection.
+        :returns: An instance of ``pymongo.results.BulkWriteResult``
+                  or ``None`` if there's nothing to write.
+        """
+        requests = [
+            ReplaceOne({"id": obj.id}, dump(obj), upsert=True)
+            for obj in objs
+        ]
+        return self._bulk_write(table_name, requests)
+
+    def bulk_delete(self, table_name, conditions):
+        """Deletes documents matching each condition in a single batch.
 
-        # tinydb requires a ``dict`` object
-        data = json.loads(encoded)
-        return self.db[table_name].update(condition, data, True)
+        :param table_name: Name of the collection.
+        :param conditions: A list of query conditions.
+        :returns: An instance of ``pymongo.results.BulkWriteResult``
+                  or ``None`` if there's nothing to write.
+        """
+        requests = [DeleteOne(condition) for condition in conditions]
+        return self._bulk_write(table_name, requests)
+
+    def _bulk_write(self, table_name, requests):
+        if not requests:
+            return
+        result = self.db[table_name].bulk_write(requests, ordered=False)
+        self._invalidate(table_name)
+        return result
 
     def delete_from_table(self, table_name, condition):
-        return self.db[table_name].delete_one(condition)
+        result = self.db[table_name].delete_one(condition)
+        self._invalidate(table_name)
+        return result
+
+    def ensure_indexes(self, indexes=None):
+        """Creates indexes (if not exist) of collections.
+
+        Must be called within app context.
+
+        :param indexes: A ``dict`` of collection name and list of index keys
+                        (by default uses :data:`INDEXES`).
+        :returns: ``True`` if all indexes are created, otherwise ``False``.
+        """
+        indexes = INDEXES if indexes is None else indexes
+        try:
+            for table_name, keys_list in indexes.iteritems():
+                for keys in keys_list:
+                    self.db[table_name].create_index(keys, background=True)
+        except PyMongoError as exc:
+            self.logger.warn("unable to create indexes; reason={}".format(exc))
+            return False
+        return True
+
+    def index_usage(self, table_name):
+        """Gets usage statistics of collection's indexes.
+
+        :param table_name: Name of the collection.
+        :returns: A list of ``dict`` of index name, keys, and number of
+                  operations using the index since server started.
+        """
+        stats = self.db[table_name].aggregate([{"$indexStats": {}}])
+        return [
+            {
+                "name": stat["name"],
+                "key": stat["key"],
+                "ops": stat["accesses"]["ops"],
+                "since": stat["accesses"]["since"],
+            } for stat in stats
+        ]
 
 
 # shortcut to database object
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+#: Default threshold (in milliseconds) of slow queries
+DEFAULT_SLOW_QUERY_MS = 100
+
+#: Maximum number of recent slow queries kept in memory
+SLOW_QUERY_HISTORY = 50
+
+
+class DatabaseMetrics(object):
+    """Thread-safe counters of MongoDB connection pool and commands
+    in current process.
+
+    :param slow_query_ms: Threshold (in milliseconds) of slow queries.
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Resets all counters.
+        """
+        with self._lock:
+            self.pool = {
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "checked_out": 0,
+                "wait_time_ms": 0.0,
+                "max_wait_time_ms": 0.0,
+                "connections_created": 0,
+                "connections_closed": 0,
+            }
+            self.tables = {}
+            self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+
+    def record_checkout(self, wait_ms, failed=False):
+        """Records connection checkout.
+
+        :param wait_ms: Time (in milliseconds) spent waiting for connection.
+        :param failed: Whether the checkout is failed (e.g. timed out).
+        """
+        with self._lock:
+            if failed:
+                self.pool["checkout_failures"] += 1
+            else:
+                self.pool["checkouts"] += 1
+                self.pool["checked_out"] += 1
+            self.pool["wait_time_ms"] += wait_ms
+            self.pool["max_wait_time_ms"] = max(
+                self.pool["max_wait_time_ms"], wait_ms,
+            )
+
+    def record_checkin(self):
+        """Records connection being returned to the pool.
+        """
+        with self._lock:
+            self.pool["checked_out"] = max(self.pool["checked_out"] - 1, 0)
+
+    def record_connection(self, created=True):
+        """Records connection being created or closed.
+        """
+        key = "connections_created" if created else "connections_closed"
+        with self._lock:
+            self.pool[key] += 1
+
+    def record_command(self, table_name, command_name, duration_ms,
+                       failed=False):
+        """Records a finished command.
+
+        :param table_name: Name of the collection.
+        :param command_name: Name of the command, e.g. ``find``.
+        :param duration_ms: Duration (in milliseconds) of the command.
+        :param failed: Whether the command is failed.
+        """
+        slow = duration_ms >= self.slow_query_ms
+
+        with self._lock:
+            stats = self.tables.setdefault(table_name, {
+                "commands": 0,
+                "failures": 0,
+                "slow": 0,
+                "total_time_ms": 0.0,
+                "max_time_ms": 0.0,
+            })
+            stats["commands"] += 1
+            stats["total_time_ms"] += duration_ms
+            stats["max_time_ms"] = max(stats["max_time_ms"], duration_ms)
+            if failed:
+                stats["failures"] += 1
+            if slow:
+                stats["slow"] += 1
+                self.slow_queries.append({
+                    "table": table_name,
+                    "command": command_name,
+                    "duration_ms": duration_ms,
+                    "timestamp": time.time(),
+                })
+
+    def as_dict(self):
+        """Gets snapshot of all counters.
+
+        :returns: A ``dict`` of pool, per-table, and slow queries metrics.
+        """
+        with self._lock:
+            pool = dict(self.pool)
+            checkouts = pool["checkouts"] + pool["checkout_failures"]
+            pool["avg_wait_time_ms"] = (
+                pool["wait_time_ms"] / checkouts if checkouts else 0.0
+            )
+            return {
+                "pool": pool,
+                "tables": {k: dict(v) for k, v in self.tables.iteritems()},
+                "slow_queries": list(self.slow_queries),
+                "slow_query_ms": self.slow_query_ms,
+            }
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Collects duration of commands per collection.
+
+    :param metrics: An instance of :class:`DatabaseMetrics`.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        return (event.request_id, event.connection_id)
+
+    def started(self, event):
+        command = event.command
+        table_name = command.get(event.command_name)
+        if event.command_name == "getMore":
+            table_name = command.get("collection")
+        if not isinstance(table_name, basestring):
+            # not a collection-level command, e.g. ``ismaster``
+            return
+
+        with self._lock:
+            self._pending[self._key(event)] = table_name
+
+    def _finished(self, event, failed):
+        with self._lock:
+            table_name = self._pending.pop(self._key(event), None)
+        if table_name is None:
+            return
+        self.metrics.record_command(
+            table_name, event.command_name,
+            event.duration_micros / 1000.0, failed=failed,
+        )
+
+    def succeeded(self, event):
+        self._finished(event, False)
+
+    def failed(self, event):
+        self._finished(event, True)
+
+
+if hasattr(monitoring, "ConnectionPoolListener"):
+    class PoolMetricsListener(monitoring.ConnectionPoolListener):
+        """Collects connection checkouts and time spent waiting
+        for a connection.
+
+        :param metrics: An instance of :class:`DatabaseMetrics`.
+        """
+
+        def __init__(self, metrics):
+            self.metrics = metrics
+
+            # checkout events are published in the thread which
+            # requests the connection
+            self._local = threading.local()
+
+        def _wait_ms(self):
+            started = getattr(self._local, "started", None)
+            self._local.started = None
+            if started is None:
+                return 0.0
+            return (time.time() - started) * 1000
+
+        def connection_check_out_started(self, event):
+            self._local.started = time.time()
+
+        def connection_checked_out(self, event):
+            self.metrics.record_checkout(self._wait_ms())
+
+        def connection_check_out_failed(self, event):
+            self.metrics.record_checkout(self._wait_ms(), failed=True)
+
+        def connection_checked_in(self, event):
+            self.metrics.record_checkin()
+
+        def connection_created(self, event):
+            self.metrics.record_connection(created=True)
+
+        def connection_closed(self, event):
+            self.metrics.record_connection(created=False)
+
+        def connection_ready(self, event):
+            pass
+
+        def pool_created(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+else:  # pragma: no cover
+    # pool events are available in pymongo>=3.9
+    PoolMetricsListener = None
+
+
+#: Metrics of current process
+db_metrics = DatabaseMetrics()
+
+_registered = []
+
+
+def register_listeners(metrics=db_metrics):
+    """Registers metrics listeners globally. Must be called before
+    creating ``MongoClient``; subsequent calls are no-op.
+
+    :param metrics: An instance of :class:`DatabaseMetrics`.
+    """
+    if _registered:
+        return
+
+    listeners = [CommandMetricsListener(metrics)]
+    if PoolMetricsListener is not None:
+        listeners.append(PoolMetricsListener(metrics))
+
+    for listener in listeners:
+        monitoring.register(listener)
+    _registered.extend(listeners)
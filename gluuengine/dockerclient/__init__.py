@@ -4,3 +4,5 @@
 # All rights reserved.
 
 from ._docker import Docker  # noqa
+from ._pool import ClientPool  # noqa
+from ._pool import client_pool  # noqa
@@ -5,14 +5,16 @@
 
 import json
 import os
+import re
 import shutil
 import tempfile
+import uuid
 from collections import namedtuple
 from contextlib import contextmanager
 
-import docker
-
+from ._pool import client_pool
 from ..errors import DockerExecError
+from ..utils import make_data_tarfile
 from ..utils import make_tarfile
 from ..utils import extract_tarfile
 
@@ -22,11 +24,15 @@ DockerExecResult = namedtuple("DockerExecResult",
 
 
 class Docker(object):
-    def __init__(self, config, swarm_config):
+    def __init__(self, config, swarm_config, pool=None):
         self.config = config
         self.swarm_config = swarm_config
         self.registry_base_url = "gluufederation"
 
+        # clients are reused across calls (and across ``Docker`` objects)
+        # to avoid TLS handshake on each API call
+        self.pool = pool or client_pool
+
     def image_exists(self, name):
         """Checks whether a docker image exists.
 
@@ -90,6 +96,14 @@ class Docker(object):
         with self._get_client() as client:
             client.stop(container_id)
 
+    def start_container(self, container_id):
+        """Starts given (stopped) container.
+
+        :param container_id: ID or name of the container.
+        """
+        with self._get_client() as client:
+            client.start(container=container_id)
+
     def pull_image(self, image):
         with self._get_client(use_swarm=False) as client:
             resp = client.pull(repository=image, stream=True)
@@ -160,23 +174,42 @@ class Docker(object):
                 client.start(container=container_id)
             return container_id
 
-    def copy_to_container(self, container, src, dest):
-        res = self.exec_cmd(container, "mktemp -d")
-        tmp_path = res.retval
+    def copy_to_container(self, container, src, dest, mode=None):
+        """Copies local file or directory into the container.
 
-        with make_tarfile(src) as tf:
-            with self._get_client() as client:
-                client.put_archive(container, tmp_path, tf)
+        The archive is built in memory with ``dest`` as the path
+        of each entry, so it lands in place with a single API call;
+        missing parent directories are created by docker engine.
+        Copied files are owned by ``root``.
 
-        self.exec_cmd(
-            container,
-            "mkdir -p {}".format(os.path.dirname(dest)),
-        )
-        self.exec_cmd(
-            container,
-            "mv {}/{} {}".format(tmp_path, os.path.basename(src), dest),
-        )
-        self.exec_cmd(container, "rm -rf {}".format(tmp_path))
+        If ``src`` is a directory, it will be copied as
+        ``<dest>/<basename of src>``.
+
+        :param container: ID or name of the container.
+        :param src: Path to local file or directory.
+        :param dest: Absolute path inside the container.
+        :param mode: Permission bits of copied files (if any).
+        """
+        if os.path.isdir(src):
+            dest = os.path.join(dest, os.path.basename(src.rstrip("/")))
+
+        tf = make_tarfile(src, arcname=dest.lstrip("/"),
+                          mode=mode, uid=0, gid=0)
+        with self._get_client() as client:
+            client.put_archive(container, "/", tf)
+
+    def put_files(self, container, files):
+        """Writes file contents into the container in a single archive.
+
+        :param container: ID or name of the container.
+        :param files: A list of ``(dest, content, mode)`` tuples, where
+                      ``dest`` is absolute path inside the container.
+        :returns: A list of destination paths (the manifest).
+        """
+        tf = make_data_tarfile(files, uid=0, gid=0)
+        with self._get_client() as client:
+            client.put_archive(container, "/", tf)
+        return [dest for dest, _, _ in files]
 
     def copy_from_container(self, container, src, dest):
         with tempfile.NamedTemporaryFile() as fd:
@@ -222,6 +255,79 @@ class Docker(object):
                                       retval=retval.strip())
             return result
 
+    def exec_batch(self, container, cmds, stop_on_error=True):
+        """Runs a sequence of commands using a single docker exec.
+
+        Commands are shipped as one shell script, hence they are
+        interpreted by ``sh`` inside the container. Output of each command
+        (``stdout`` and ``stderr`` combined) is captured separately.
+
+        :param container: ID or name of the container.
+        :param cmds: A list of commands.
+        :param stop_on_error: Whether to stop at the first failing command
+                              and raise :class:`DockerExecError`.
+        :returns: A list of :class:`DockerExecResult` of executed commands.
+        """
+        if not cmds:
+            return []
+
+        marker = "__GLUUENGINE_{}__".format(uuid.uuid4().hex)
+        script = self._batch_script(cmds, marker, stop_on_error)
+
+        with self._get_client() as client:
+            exec_cmd = client.exec_create(container, cmd=["sh", "-c", script])
+            retval = client.exec_start(exec_cmd)
+
+        results = self._parse_batch_output(cmds, retval, marker)
+
+        if stop_on_error:
+            for result in results:
+                if result.exit_code != 0:
+                    raise DockerExecError(
+                        "error while running docker exec",
+                        result.retval,
+                        result.exit_code,
+                    )
+
+            # the script was interrupted before running all commands
+            if len(results) != len(cmds):
+                raise DockerExecError(
+                    "error while running docker exec",
+                    retval,
+                )
+        return results
+
+    def _batch_script(self, cmds, marker, stop_on_error=True):
+        lines = []
+        for idx, cmd in enumerate(cmds):
+            lines.extend([
+                "echo '{}:begin:{}'".format(marker, idx),
+                "{",
+                cmd,
+                "} 2>&1",
+                "rc=$?",
+                "echo",
+                "echo '{}:end:{}:'$rc".format(marker, idx),
+            ])
+            if stop_on_error:
+                lines.append('[ "$rc" -eq 0 ] || exit "$rc"')
+        return "\n".join(lines)
+
+    def _parse_batch_output(self, cmds, output, marker):
+        rgx = re.compile(
+            r"{0}:begin:(\d+)\n(.*?){0}:end:\1:(\d+)".format(marker),
+            re.DOTALL,
+        )
+
+        results = []
+        for idx, retval, exit_code in rgx.findall(output):
+            results.append(DockerExecResult(
+                cmd=cmds[int(idx)],
+                exit_code=int(exit_code),
+                retval=retval.strip(),
+            ))
+        return results
+
     @contextmanager
     def _get_client(self, use_swarm=True):
         if use_swarm:
@@ -229,8 +335,5 @@ class Docker(object):
         else:
             cfg = self.config
 
-        client = docker.Client(base_url=cfg.get("base_url"), tls=cfg.get("tls"))
-        try:
+        with self.pool.client(cfg.get("base_url"), cfg.get("tls")) as client:
             yield client
-        finally:
-            client.close()
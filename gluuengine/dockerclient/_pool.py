@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import docker
+from requests.exceptions import ConnectionError
+from requests.exceptions import Timeout
+
+#: Default number of idle clients kept per endpoint
+DEFAULT_MAX_SIZE = 10
+
+#: Default number of seconds before idle client is closed
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class ClientPool(object):
+    """A pool of long-lived :class:`docker.Client` objects.
+
+    Clients are grouped per endpoint (base URL and TLS certificates),
+    hence TLS handshakes and keep-alive HTTP connections are reused
+    across API calls to the same docker engine or swarm master.
+
+    Each client is checked out exclusively, so a client is never shared
+    between threads at the same time.
+
+    :param max_size: Maximum number of idle clients kept per endpoint.
+    :param idle_timeout: Number of seconds before idle client is closed.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        # a mapping of endpoint key and list of ``(client, last_used)``
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the pool from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.max_size = app.config.get(
+            "DOCKER_CLIENT_POOL_SIZE", DEFAULT_MAX_SIZE,
+        )
+        self.idle_timeout = app.config.get(
+            "DOCKER_CLIENT_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT,
+        )
+
+    @staticmethod
+    def make_key(base_url, tls=None):
+        """Creates endpoint key based on base URL and TLS certificates.
+
+        :param base_url: URL of docker engine (or swarm master).
+        :param tls: An instance of :class:`docker.tls.TLSConfig` (if any).
+        :returns: A tuple of endpoint key.
+        """
+        if not tls:
+            return (base_url, None, None, None,)
+        return (
+            base_url,
+            getattr(tls, "cert", None),
+            getattr(tls, "ca_cert", None),
+            getattr(tls, "verify", None),
+        )
+
+    @contextmanager
+    def client(self, base_url, tls=None):
+        """Checks out a client for given endpoint.
+
+        The client is returned to the pool afterwards, unless it has
+        broken connection.
+
+        :param base_url: URL of docker engine (or swarm master).
+        :param tls: An instance of :class:`docker.tls.TLSConfig` (if any).
+        """
+        key = self.make_key(base_url, tls)
+        client = self._acquire(key, base_url, tls)
+        reusable = True
+
+        try:
+            yield client
+        except (ConnectionError, Timeout):
+            # connection is likely broken; don't put it back to pool
+            reusable = False
+            raise
+        finally:
+            if reusable:
+                self._release(key, client)
+            else:
+                client.close()
+
+    def size(self, base_url=None, tls=None):
+        """Counts idle clients.
+
+        :param base_url: URL of docker engine; if omitted, counts idle
+                         clients of all endpoints.
+        :param tls: An instance of :class:`docker.tls.TLSConfig` (if any).
+        :returns: Total number of idle clients.
+        """
+        with self._lock:
+            if base_url is None:
+                return sum(len(items) for items in self._idle.values())
+            return len(self._idle.get(self.make_key(base_url, tls), []))
+
+    def clear(self):
+        """Closes all idle clients.
+        """
+        with self._lock:
+            clients = [
+                client for items in self._idle.values()
+                for client, _ in items
+            ]
+            self._idle.clear()
+
+        for client in clients:
+            client.close()
+
+    def _acquire(self, key, base_url, tls):
+        with self._lock:
+            evicted = self._evict_idle()
+            items = self._idle.get(key)
+            client = items.pop()[0] if items else None
+
+        for stale in evicted:
+            stale.close()
+
+        if client is None:
+            client = docker.Client(base_url=base_url, tls=tls)
+        return client
+
+    def _release(self, key, client):
+        with self._lock:
+            items = self._idle[key]
+            if len(items) < self.max_size:
+                items.append((client, time.time(),))
+                client = None
+
+        # pool is full
+        if client is not None:
+            client.close()
+
+    def _evict_idle(self):
+        # must be called while holding the lock
+        deadline = time.time() - self.idle_timeout
+        evicted = []
+
+        for key, items in list(self._idle.items()):
+            fresh = [item for item in items if item[1] >= deadline]
+            evicted.extend(item[0] for item in items if item[1] < deadline)
+
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+        return evicted
+
+
+#: Pool shared by all :class:`gluuengine.dockerclient.Docker` objects
+client_pool = ClientPool()
@@ -22,3 +22,8 @@ class DockerExecError(Exception):
 
     def __str__(self):
         return repr("{}: {}".format(self.msg, self.cmd_err))
+
+
+class ProbeTimeoutError(Exception):
+    """Raised when a readiness probe doesn't succeed before its deadline.
+    """
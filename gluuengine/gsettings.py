@@ -8,7 +8,11 @@ import os
 import time
 
 from .task import LicenseWatcherTask
+from .task import NodeHealthTask
+from .task import SingletonWatchTask
+from .scheduler import scheduler
 from .utils import as_boolean
+from .utils import claim_runfile
 
 
 bind = ":8080"
@@ -21,14 +25,23 @@ errorlog = '-'
 raw_env = 'API_ENV=prod'  # 'prod|test|dev'
 
 
+# tasks which must run in a single worker; each of them is claimed by
+# the first worker locking its runfile, and claimable again once the
+# worker exits (even if killed)
+_SINGLE_WORKER_TASKS = ("lwatcher.run", "nodehealth.run", "scheduler.run",)
+
+
+def _runfile(app, name):
+    return os.path.join(app.config["DATA_DIR"], name)
+
+
 def on_exit(server):
     app = server.app.load_wsgiapp()
-    runfile = os.path.join(app.config["DATA_DIR"], "lwatcher.run")
-
-    try:
-        os.unlink(runfile)
-    except OSError:
-        pass
+    for name in _SINGLE_WORKER_TASKS:
+        try:
+            os.unlink(_runfile(app, name))
+        except OSError:
+            pass
 
 
 def post_fork(server, worker):
@@ -36,16 +49,28 @@ def post_fork(server, worker):
     # inside crochet/twisted reactor, we cannot use `when_ready` nor `pre_fork`
     # hook because, somehow, reactor seems unitialized in those hooks
     app = server.app.load_wsgiapp()
-    runfile = os.path.join(app.config["DATA_DIR"], "lwatcher.run")
 
     if as_boolean(app.config["ENABLE_LICENSE"]):
-        if not os.path.isfile(runfile):
-            with open(runfile, "w") as fd:
-                fd.write("1")
-
+        if claim_runfile(_runfile(app, "lwatcher.run")):
             app.logger.info("launching task on worker {}".format(worker))
             LicenseWatcherTask(app).perform_job()
 
+    # a single ``docker-machine ls`` poller; other workers read the table
+    # from NODE_HEALTH_PATH
+    if claim_runfile(_runfile(app, "nodehealth.run")):
+        app.logger.info("launching node health task on worker {}".format(worker))
+        NodeHealthTask(app).perform_job()
+
+    # deployment jobs submitted by all workers are run by a single
+    # dispatcher, hence concurrency limits hold engine-wide
+    if claim_runfile(_runfile(app, "scheduler.run")):
+        app.logger.info("launching deployment scheduler on worker {}".format(worker))
+        scheduler.start(app)
+
+    # cached cluster and nodes live in worker's memory
+    if as_boolean(app.config["SINGLETON_CACHE_WATCH"]):
+        SingletonWatchTask(app).perform_job()
+
 
 def pre_fork(server, worker):
     # delay before forking other workers, this will give time for a worker
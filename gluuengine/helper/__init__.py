@@ -9,6 +9,8 @@ from .container_helper import OxtrustContainerHelper  # noqa
 from .container_helper import OxidpContainerHelper  # noqa
 from .container_helper import NginxContainerHelper  # noqa
 from .container_helper import OxasimbaContainerHelper  # noqa
+from .container_helper import container_job  # noqa
 
 from .prometheus_helper import PrometheusHelper  # noqa
 from .node_helper import distribute_cluster_data  # noqa
+from .node_helper import check_nodes_reachable  # noqa
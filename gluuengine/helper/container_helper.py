@@ -11,13 +11,13 @@ import time
 import docker.errors
 from requests.exceptions import SSLError
 from requests.exceptions import ConnectionError
-from crochet import run_in_reactor
 
 from .node_helper import distribute_cluster_data
 # from .prometheus_helper import PrometheusHelper
 from ..database import db
 from ..model import STATE_SUCCESS
 from ..model import STATE_FAILED
+from ..model import STATE_IN_PROGRESS
 from ..model import STATE_DISABLED
 from ..model import STATE_SETUP_FINISHED
 from ..model import STATE_TEARDOWN_FINISHED
@@ -31,6 +31,9 @@ from ..log import create_file_logger
 from ..utils import exc_traceback
 from ..machine import Machine
 from ..dockerclient import Docker
+from ..scheduler import scheduler
+from ..serializer import dump
+from ..serializer import load
 from ..weave import Weave
 
 
@@ -68,12 +71,7 @@ class BaseContainerHelper(object):
         mc = Machine()
 
         with self.app.app_context():
-            try:
-                master_node = db.search_from_table(
-                    "nodes", {"type": "master"},
-                )[0]
-            except IndexError:
-                master_node = self.node
+            master_node = db.get_master_node() or self.node
 
         self.docker = Docker(
             mc.config(self.node.name),
@@ -83,66 +81,47 @@ class BaseContainerHelper(object):
         self.weave = Weave(self.node, self.app)
         # self.prometheus = PrometheusHelper(self.app, logger=self.logger)
 
-    @run_in_reactor
-    def setup(self):
-        self.mp_setup()
-
-    def mp_setup(self):
+    def mp_setup(self, resume=False):
         """Runs the container setup.
+
+        :param resume: Whether to resume failed setup, reusing the container
+                       created by previous attempt (if any).
         """
         try:
-            self.logger.info("{} setup is started".format(self.container.name))
+            self.logger.info("{} setup is {}".format(
+                self.container.name, "resumed" if resume else "started"))
             start = time.time()
 
             # get docker bridge IP as it's where weavedns runs
             bridge_ip, dns_search = self.weave.dns_args()
 
-            cid = self.docker.setup_container(
-                name=self.container.name,
-                image="{}:{}".format(self.container.image.replace("gluu", ""), self.app.config["GLUU_IMAGE_TAG"]),
-                env=[
-                    "constraint:node=={}".format(self.node.name),
-                ],
-                port_bindings=self.port_bindings,
-                volumes=self.volumes,
-                dns=[bridge_ip],
-                dns_search=[dns_search],
-                ulimits=self.ulimits,
-                # hostname=self.container.hostname,
-            )
-
-            # container is not running
-            if not cid:
-                self.logger.error("Failed to start the "
-                                  "{!r} container".format(self.container.name))
-                self.on_setup_error()
-                return
-
-            # container.cid in short format
-            self.container.cid = cid[:12]
-            self.container.hostname = "{}.{}.{}".format(
-                self.container.cid, self.container.type, dns_search.rstrip("."),
-            )
-
-            with self.app.app_context():
-                db.update_to_table(
-                    "containers",
-                    {"name": self.container.name},
-                    self.container,
-                )
-
-            # add DNS record
-            self.weave.dns_add(self.container.cid, self.container.hostname)
+            if resume and self.container.cid:
+                # the container is stopped by ``on_setup_error``
+                self.logger.info("starting container {}".format(self.container.name))
+                self.docker.start_container(self.container.cid)
+            else:
+                if resume:
+                    self.remove_stale_container()
+                if not self.create_container(bridge_ip, dns_search):
+                    self.logger.error("Failed to start the "
+                                      "{!r} container".format(self.container.name))
+                    self.on_setup_error()
+                    return
+
+            # add DNS records
+            dns_entries = [(self.container.cid, self.container.hostname)]
 
             if self.container.type in ("ldap", "oxauth", "oxtrust",):
                 # useful for failover in ox apps
-                self.weave.dns_add(
+                dns_entries.append((
                     self.container.cid,
                     "{}.{}".format(self.container.type, dns_search.rstrip(".")),
-                )
+                ))
 
             if self.container.type == "nginx":
-                self.weave.dns_add(self.container.cid, self.cluster.ox_cluster_hostname)
+                dns_entries.append((self.container.cid, self.cluster.ox_cluster_hostname))
+
+            self.weave.dns_add_many(dns_entries)
 
             setup_obj = self.setup_class(self.container, self.cluster,
                                          self.app, logger=self.logger)
@@ -152,10 +131,10 @@ class BaseContainerHelper(object):
             self.container.state = STATE_SUCCESS
 
             with self.app.app_context():
-                db.update_to_table(
+                db.set_fields(
                     "containers",
                     {"name": self.container.name},
-                    self.container,
+                    {"state": self.container.state},
                 )
 
             # after_setup must be called after container has been marked
@@ -176,10 +155,11 @@ class BaseContainerHelper(object):
         finally:
             # mark containerLog as finished
             with self.app.app_context():
-                container_log = db.get(self.container.name, "container_logs")
-                if container_log:
-                    container_log.state = STATE_SETUP_FINISHED
-                    db.update(container_log.id, container_log, "container_logs")
+                db.set_fields(
+                    "container_logs",
+                    {"id": self.container.name},
+                    {"state": STATE_SETUP_FINISHED},
+                )
 
             # distribute recovery data
             distribute_cluster_data(self.app, self.node)
@@ -188,6 +168,60 @@ class BaseContainerHelper(object):
                 handler.close()
                 self.logger.removeHandler(handler)
 
+    def create_container(self, bridge_ip, dns_search):
+        """Creates and starts the container.
+
+        :param bridge_ip: IP address of weavedns.
+        :param dns_search: DNS search domain.
+        :returns: ``True`` if container is running, otherwise ``False``.
+        """
+        cid = self.docker.setup_container(
+            name=self.container.name,
+            image="{}:{}".format(self.container.image.replace("gluu", ""), self.app.config["GLUU_IMAGE_TAG"]),
+            env=[
+                "constraint:node=={}".format(self.node.name),
+            ],
+            port_bindings=self.port_bindings,
+            volumes=self.volumes,
+            dns=[bridge_ip],
+            dns_search=[dns_search],
+            ulimits=self.ulimits,
+            # hostname=self.container.hostname,
+        )
+
+        # container is not running
+        if not cid:
+            return False
+
+        # container.cid in short format
+        self.container.cid = cid[:12]
+        self.container.hostname = "{}.{}.{}".format(
+            self.container.cid, self.container.type, dns_search.rstrip("."),
+        )
+        # checkpoints of other container are meaningless
+        self.container.setup_steps = []
+
+        with self.app.app_context():
+            db.set_fields(
+                "containers",
+                {"name": self.container.name},
+                {
+                    "cid": self.container.cid,
+                    "hostname": self.container.hostname,
+                    "setup_steps": self.container.setup_steps,
+                },
+            )
+        return True
+
+    def remove_stale_container(self):
+        """Removes container left by failed attempt which didn't get
+        its ID saved.
+        """
+        try:
+            self.docker.remove_container(self.container.name)
+        except docker.errors.NotFound:
+            pass
+
     def on_setup_error(self):
         """Callback that supposed to be called when error occurs in setup
         process.
@@ -212,16 +246,12 @@ class BaseContainerHelper(object):
         self.container.state = STATE_FAILED
 
         with self.app.app_context():
-            db.update_to_table(
+            db.set_fields(
                 "containers",
                 {"name": self.container.name},
-                self.container,
+                {"state": self.container.state},
             )
 
-    @run_in_reactor
-    def teardown(self):
-        self.mp_teardown()
-
     def mp_teardown(self):
         self.logger.info("{} teardown is started".format(self.container.name))
         start = time.time()
@@ -231,8 +261,8 @@ class BaseContainerHelper(object):
         # removing LDAP replication, etc.) on non-deployed containers;
         # also, initiate the teardown only if node is exist in database
         # (node data may be deleted in other thread)
-        if (self.container.state in (STATE_SUCCESS, STATE_DISABLED,)
-                and self.node):
+        if (self.container.state in (STATE_SUCCESS, STATE_DISABLED,) and
+                self.node):
             setup_obj = self.setup_class(
                 self.container, self.cluster, self.app, logger=self.logger,
             )
@@ -261,10 +291,11 @@ class BaseContainerHelper(object):
 
         with self.app.app_context():
             # mark containerLog as finished
-            container_log = db.get(self.container.name, "container_logs")
-            if container_log:
-                container_log.state = STATE_TEARDOWN_FINISHED
-                db.update(container_log.id, container_log, "container_logs")
+            db.set_fields(
+                "container_logs",
+                {"id": self.container.name},
+                {"state": STATE_TEARDOWN_FINISHED},
+            )
 
         # distribute recovery data
         distribute_cluster_data(self.app, self.node)
@@ -357,3 +388,68 @@ class NginxContainerHelper(BaseContainerHelper):
 
 class OxasimbaContainerHelper(BaseContainerHelper):
     setup_class = OxasimbaSetup
+
+
+#: Helper classes by container type
+HELPER_CLASSES = {
+    "ldap": LdapContainerHelper,
+    "oxauth": OxauthContainerHelper,
+    "oxtrust": OxtrustContainerHelper,
+    "oxidp": OxidpContainerHelper,
+    "nginx": NginxContainerHelper,
+    "oxasimba": OxasimbaContainerHelper,
+}
+
+
+def container_job(action, container, logfile):
+    """Builds deployment job of a container.
+
+    :param action: One of ``setup``, ``resume`` (setup steps finished
+                   by previous attempt are skipped), or ``teardown``.
+    :param container: Container object.
+    :param logfile: Name of log file (in ``CONTAINER_LOG_DIR``) of the job.
+    :returns: A ``(name, type_, args, key, group)`` tuple accepted by
+              :meth:`~gluuengine.scheduler.DeploymentScheduler.submit_many`.
+    """
+    # the container is saved within the job, as its document
+    # is removed before teardown
+    return (
+        "{} {}".format(action, container.name),
+        "container",
+        {"action": action, "container": dump(container), "logfile": logfile},
+        container.node_id,
+        container.cluster_id,
+    )
+
+
+def run_container_job(app, args):
+    """Runs deployment job built by :func:`container_job`.
+    """
+    container = load(args["container"])
+    helper_class = HELPER_CLASSES[container.type]
+    logpath = os.path.join(app.config["CONTAINER_LOG_DIR"], args["logfile"])
+    helper = helper_class(container, app, logpath)
+
+    if args["action"] == "teardown":
+        helper.mp_teardown()
+    else:
+        helper.mp_setup(resume=args["action"] == "resume")
+
+
+def recover_container_job(app, args):
+    """Marks container whose setup has been interrupted as ``FAILED``,
+    hence it can be resumed.
+    """
+    if args["action"] == "teardown":
+        return
+
+    with app.app_context():
+        db.set_fields(
+            "containers",
+            {"name": args["container"]["name"], "state": STATE_IN_PROGRESS},
+            {"state": STATE_FAILED},
+        )
+
+
+scheduler.register("container", run_container_job,
+                   recover=recover_container_job)
@@ -7,11 +7,14 @@ import json
 import logging
 import os
 import tempfile
+import threading
 
+import concurrent.futures
 from crochet import run_in_reactor
 
 from ..database import db
 from ..machine import Machine
+from ..machine import node_health
 
 
 @run_in_reactor
@@ -25,9 +28,9 @@ def distribute_shared_database(app, node):
     filepath = app.config["SHARED_DATABASE_URI"]
 
     with app.app_context():
-        clusters = db.all("clusters")
+        cluster = db.get_cluster()
 
-        if not clusters:
+        if not cluster:
             logger.warn("cluster is currently unavailable")
             return
 
@@ -37,7 +40,7 @@ def distribute_shared_database(app, node):
         )
 
         data = {}
-        data["clusters"] = {1: clusters[0].as_dict()}
+        data["clusters"] = {1: cluster.as_dict()}
         data["nodes"] = {1: node.as_dict()}
         data["containers"] = {
             idx: container.as_dict()
@@ -61,3 +64,88 @@ def distribute_shared_database(app, node):
 
 # backward-compat
 distribute_cluster_data = distribute_shared_database
+
+#: Default number of node status checks running concurrently
+DEFAULT_STATUS_WORKERS = 6
+
+
+class StatusExecutor(object):
+    """Thread pool used for checking node status concurrently.
+
+    The pool is created on first use, sized by ``NODE_STATUS_WORKERS``
+    config.
+
+    :param max_workers: Number of status checks running concurrently.
+    """
+
+    def __init__(self, max_workers=DEFAULT_STATUS_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the pool from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.max_workers = app.config.get(
+            "NODE_STATUS_WORKERS", DEFAULT_STATUS_WORKERS)
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                )
+        return self._executor.submit(func, *args)
+
+
+#: Pool shared by resources in current process
+status_executor = StatusExecutor()
+
+
+def _node_running(machine, node_name):
+    running = node_health.is_running(node_name)
+    if running is not None:
+        return running
+
+    try:
+        return machine.status(node_name)
+    except RuntimeError:
+        # docker-machine can't reach the node
+        return False
+
+
+def check_nodes_reachable(target_node, machine=None):
+    """Checks whether target, master, and discovery nodes are reachable.
+
+    Status is taken from the node health table if it is fresh;
+    otherwise status of all nodes are checked concurrently and repeated
+    checks within few seconds are served from
+    :class:`~gluuengine.machine.Machine` cache.
+
+    :param target_node: Node where container will be deployed to
+                        (or removed from).
+    :param machine: An instance of :class:`~gluuengine.machine.Machine`.
+    :returns: A tuple of reachability verdict and error message
+              (if any).
+    """
+    machine = machine or Machine()
+    checks = [
+        ("target", target_node),
+        ("master", db.get_master_node()),
+        ("discovery", db.get_discovery_node()),
+    ]
+
+    futures = {}
+    for _, node in checks:
+        if node and node.name not in futures:
+            futures[node.name] = status_executor.submit(
+                _node_running, machine, node.name,
+            )
+
+    for type_, node in checks:
+        if not node or not futures[node.name].result():
+            return False, "access denied due to {} node " \
+                          "being unreachable".format(type_)
+    return True, ""
@@ -6,11 +6,10 @@
 import logging
 
 from docker import Client
-from jinja2 import Environment
-from jinja2 import PackageLoader
 
 from ..weave import Weave
 from ..database import db
+from ..templating import templates
 
 
 class PrometheusHelper(object):
@@ -18,10 +17,7 @@ class PrometheusHelper(object):
         self.app = app
 
         with self.app.app_context():
-            try:
-                self.cluster = db.all("clusters")[0]
-            except IndexError:
-                self.cluster = None
+            self.cluster = db.get_cluster()
 
             try:
                 self.provider = db.search_from_table(
@@ -33,9 +29,7 @@ class PrometheusHelper(object):
 
         self.target_path = '/etc/gluu/prometheus/prometheus.yml'
         self.docker = Client("unix:///var/run/docker.sock")
-        self.jinja_env = Environment(
-            loader=PackageLoader("gluuengine", "templates")
-        )
+        self.jinja_env = templates.jinja_env
         self.logger = logger or logging.getLogger(
             __name__ + "." + self.__class__.__name__,
         )
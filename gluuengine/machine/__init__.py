@@ -3,4 +3,8 @@
 #
 # All rights reserved.
 
-from .machine import Machine  # noqa
\ No newline at end of file
+from .machine import Machine  # noqa
+from .health import NodeHealthTable  # noqa
+from .health import node_health  # noqa
+from .ssh import SSHMultiplexer  # noqa
+from .ssh import ssh_multiplexer  # noqa
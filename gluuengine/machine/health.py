@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+#: Default number of seconds before health table is considered stale
+DEFAULT_MAX_AGE = 30
+
+
+class NodeHealthTable(object):
+    """Table of nodes health, populated from ``docker-machine ls``
+    output by :class:`~gluuengine.task.NodeHealthTask`.
+
+    The poller runs in a single worker process; if ``path`` is set, the
+    table is saved into a JSON file which is re-read by other processes
+    whenever the file is changed.
+
+    Readers must treat ``None`` as unknown state (i.e. table is stale or
+    node is missing) and fallback to querying docker-machine directly.
+
+    :param max_age: Number of seconds before table is considered stale.
+    :param path: Path to file shared by worker processes (if any).
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE, path=""):
+        self.max_age = max_age
+        self.path = path
+        self.updated_at = None
+        self.logger = logging.getLogger(
+            __name__ + "." + self.__class__.__name__,
+        )
+
+        self._nodes = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the table from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        # table is considered stale after few missed polls
+        self.max_age = app.config.get("NODE_HEALTH_INTERVAL", DEFAULT_MAX_AGE / 3) * 3
+        self.path = app.config.get("NODE_HEALTH_PATH", "")
+
+    def update(self, machines):
+        """Replaces table content.
+
+        :param machines: A list of ``dict`` as returned by
+                         :meth:`gluuengine.machine.Machine.ls`.
+        """
+        nodes = {}
+        for machine in machines:
+            name = machine.get("Name")
+            if not name:
+                continue
+            nodes[name] = {
+                "name": name,
+                "state": machine.get("State", ""),
+                "response_time": machine.get("ResponseTime", ""),
+                "error": machine.get("Error", ""),
+                "docker_version": machine.get("DockerVersion", ""),
+            }
+
+        with self._lock:
+            self._nodes = nodes
+            self.updated_at = time.time()
+            if self.path:
+                self._save()
+
+    def _save(self):
+        # written into a temporary file first, hence readers never see
+        # partially written table
+        try:
+            dirname = os.path.dirname(self.path)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+
+            with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as fd:
+                json.dump({"updated_at": self.updated_at, "nodes": self._nodes}, fd)
+            os.rename(fd.name, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except (IOError, OSError) as exc:
+            self.logger.warn("unable to save node health table; "
+                             "reason={}".format(exc))
+
+    def _reload(self):
+        # picks up table saved by poller in other process
+        if not self.path:
+            return
+
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path) as fd:
+                data = json.load(fd)
+        except (IOError, OSError, ValueError):
+            return
+
+        with self._lock:
+            self._nodes = data.get("nodes", {})
+            self.updated_at = data.get("updated_at")
+            self._mtime = mtime
+
+    @property
+    def fresh(self):
+        """Whether table has been updated within ``max_age`` seconds.
+        """
+        self._reload()
+        updated_at = self.updated_at
+        if updated_at is None:
+            return False
+        return time.time() - updated_at <= self.max_age
+
+    def get(self, node_name):
+        """Gets health of a node.
+
+        :param node_name: Name of the node.
+        :returns: A ``dict`` of node health or ``None``.
+        """
+        if not self.fresh:
+            return None
+
+        with self._lock:
+            health = self._nodes.get(node_name)
+        return dict(health) if health else None
+
+    def is_running(self, node_name):
+        """Checks whether node is running.
+
+        :param node_name: Name of the node.
+        :returns: ``True`` or ``False``, or ``None`` if state is unknown.
+        """
+        health = self.get(node_name)
+        if health is None:
+            return None
+        return health["state"] == "Running"
+
+    def running_nodes(self):
+        """Lists names of running nodes.
+
+        :returns: A list of node names or ``None`` if table is stale.
+        """
+        if not self.fresh:
+            return None
+
+        with self._lock:
+            return [
+                name for name, health in self._nodes.items()
+                if health["state"] == "Running"
+            ]
+
+    def all(self):
+        """Lists health of all nodes.
+
+        :returns: A list of ``dict`` of node health.
+        """
+        self._reload()
+        with self._lock:
+            return [dict(health) for health in self._nodes.values()]
+
+
+#: Health table shared by resources and helpers (and other worker
+#: processes via ``NODE_HEALTH_PATH``)
+node_health = NodeHealthTable()
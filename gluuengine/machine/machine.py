@@ -9,6 +9,8 @@ import os
 
 from docker.tls import TLSConfig
 
+from .ssh import ssh_multiplexer
+from ..cache import TTLCache
 from ..utils import po_run
 from ..registry import REGISTRY_BASE_URL
 
@@ -16,9 +18,24 @@ LS_FIELDS = ["Name", "Active", "ActiveHost", "ActiveSwarm", "DriverName",
              "State", "URL", "Swarm", "Error", "DockerVersion", "ResponseTime"]
 GLUU_GET_DOCKER = 'https://raw.githubusercontent.com/GluuFederation/cluster-tools/master/get_docker.sh'
 
+#: Cache shared by all :class:`Machine` objects
+machine_cache = TTLCache()
+
+
 class Machine(object):
-    def __init__(self, path='docker-machine'):
+    #: Number of seconds before cached config is expired
+    config_ttl = 300
+
+    #: Number of seconds before cached IP address is expired
+    ip_ttl = 60
+
+    #: Number of seconds before cached status is expired
+    status_ttl = 5
+
+    def __init__(self, path='docker-machine', cache=None, ssh_mux=None):
         self.path = path
+        self.cache = machine_cache if cache is None else cache
+        self.ssh_mux = ssh_multiplexer if ssh_mux is None else ssh_mux
 
     def _run(self, cmd_str, raise_error=True):
         cmd = "{} {}".format(self.path, cmd_str)
@@ -49,14 +66,59 @@ class Machine(object):
             }
         return params
 
+    def _cached(self, kind, machine_name, ttl, func, *args):
+        key = (machine_name, kind,) + args
+        value = self.cache.get(key)
+        if value is None:
+            value = func()
+            self.cache.set(key, value, ttl)
+        return value
+
+    def invalidate(self, machine_name):
+        """Removes cached config, IP address and status of a machine,
+        and closes its multiplexed SSH connection (if any).
+
+        :param machine_name: Name of the machine.
+        """
+        params = self.cache.get((machine_name, "ssh_params"))
+        if params:
+            self.ssh_mux.close(params)
+        self.cache.delete_matching(lambda key: key[0] == machine_name)
+
+    def ssh_params(self, machine_name):
+        """Gets SSH connection params of a machine.
+
+        :param machine_name: Name of the machine.
+        :returns: A ``dict`` of connection params or ``None`` if
+                  unavailable.
+        """
+        def _params():
+            try:
+                inspect = self.inspect(machine_name)
+            except (RuntimeError, ValueError):
+                inspect = {}
+            # ``False`` is cached to avoid inspecting the machine repeatedly
+            return self.ssh_mux.params_from_inspect(inspect, machine_name) or False
+        return self._cached("ssh_params", machine_name, self.config_ttl, _params) or None
+
     def config(self, machine_name, docker_friendly=True):
         cmd = 'config {}'.format(machine_name)
-        return self._config(cmd, machine_name, docker_friendly)
+        config = self._cached(
+            "config", machine_name, self.config_ttl,
+            lambda: self._config(cmd, machine_name, docker_friendly),
+            docker_friendly,
+        )
+        return dict(config)
 
     # this method is only for swarm master
     def swarm_config(self, machine_name, docker_friendly=True):
         cmd = 'config --swarm {}'.format(machine_name)
-        return self._config(cmd, machine_name, docker_friendly)
+        config = self._cached(
+            "swarm_config", machine_name, self.config_ttl,
+            lambda: self._config(cmd, machine_name, docker_friendly),
+            docker_friendly,
+        )
+        return dict(config)
 
     def _dicovery(self, discovery):
         cmd = " ".join([
@@ -135,6 +197,7 @@ class Machine(object):
         cmd.append(node.name)
 
         cmd = " ".join(cmd)
+        self.invalidate(node.name)
         self._run(cmd)
         return True
 
@@ -144,9 +207,11 @@ class Machine(object):
         return json.loads(stdout.strip())
 
     def ip(self, machine_name):
-        cmd = 'ip {}'.format(machine_name)
-        stdout, _, _ = self._run(cmd)
-        return stdout.strip()
+        def _ip():
+            cmd = 'ip {}'.format(machine_name)
+            stdout, _, _ = self._run(cmd)
+            return stdout.strip()
+        return self._cached("ip", machine_name, self.ip_ttl, _ip)
         # bellow is a alternate way to suppress exception and provide error msg
         #stdout, stderr, error = self._run(cmd, raise_error=False)
         #if not error:
@@ -156,7 +221,10 @@ class Machine(object):
 
     def kill(self, machine_name):
         cmd = 'kill {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def ls(self):
@@ -172,29 +240,45 @@ class Machine(object):
 
     def provision(self, machine_name):
         cmd = 'provision {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def regenerate_certs(self, machine_name):
         cmd = 'regenerate-certs -f {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def restart(self, machine_name):
         cmd = 'restart {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def rm(self, machine_name, force=False):
         f = '-f' if force else ''
         cmd = 'rm -y {} {}'.format(f, machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def ssh(self, machine_name, cmd=""):
         if cmd:
-            cmd = 'ssh {} {}'.format(machine_name, cmd)
-            stdout, stderr, error = self._run(cmd)
+            params = self.ssh_params(machine_name)
+            if params:
+                stdout, _, _ = self.ssh_mux.run(params, cmd)
+            else:
+                cmd = 'ssh {} {}'.format(machine_name, cmd)
+                stdout, stderr, error = self._run(cmd)
         return stdout.strip()
 
     def _scp(self, source, destination, recursive=False):
@@ -205,35 +289,53 @@ class Machine(object):
 
     def scp(self, source, destination, recursive=False):
         destination_machine_name = destination.split(':')[0]
+        dest_path = ':'.join(destination.split(':')[1:])
+
+        # copy in a single hop if multiplexed SSH is available
+        params = self.ssh_params(destination_machine_name)
+        if params:
+            self.ssh_mux.copy(params, source, dest_path, recursive)
+            return
+
         dest_tmp = '{}:/tmp'.format(destination_machine_name)
         #step one
         self._scp(source, dest_tmp, recursive)
         #step two
         r = '-r' if recursive else ''
-        dest_path = ':'.join(destination.split(':')[1:])
         last_part = os.path.basename(source)
         source_tmp = '/tmp/{}'.format(last_part)
         cmd = 'sudo cp {} {} {}'.format(r, source_tmp, dest_path)
         self.ssh(destination_machine_name, cmd)
 
     def status(self, machine_name):
-        cmd = 'status {}'.format(machine_name)
-        stdout, _, _ = self._run(cmd)
-        return stdout.strip() == 'Running'
+        def _status():
+            cmd = 'status {}'.format(machine_name)
+            stdout, _, _ = self._run(cmd)
+            return stdout.strip() == 'Running'
+        return self._cached("status", machine_name, self.status_ttl, _status)
 
     def start(self, machine_name):
         cmd = 'start {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def stop(self, machine_name):
         cmd = 'stop {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def upgrade(self, machine_name):
         cmd = 'upgrade {}'.format(machine_name)
-        self._run(cmd)
+        try:
+            self._run(cmd)
+        finally:
+            self.invalidate(machine_name)
         return True
 
     def url(self, machine_name):
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import io
+import os
+import tarfile
+from pipes import quote
+from subprocess import Popen
+from subprocess import PIPE
+
+#: Default directory of control sockets
+DEFAULT_CONTROL_DIR = os.environ.get("SSH_CONTROL_DIR", "/tmp/gluuengine-ssh")
+
+#: Default number of seconds before idle master connection is closed
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class SSHMultiplexer(object):
+    """Runs commands on nodes over multiplexed SSH connections.
+
+    The first command to a node opens a master connection
+    (OpenSSH ``ControlMaster``); subsequent commands reuse the channel
+    through a control socket until the master connection is idle for
+    ``idle_timeout`` seconds.
+
+    :param control_dir: Directory of control sockets.
+    :param idle_timeout: Number of seconds before idle master
+                         connection is closed.
+    """
+
+    def __init__(self, control_dir=DEFAULT_CONTROL_DIR,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.control_dir = control_dir
+        self.idle_timeout = idle_timeout
+
+    @staticmethod
+    def params_from_inspect(inspect, machine_name):
+        """Extracts SSH connection params from ``docker-machine inspect``
+        output.
+
+        :param inspect: A ``dict`` of ``docker-machine inspect`` output.
+        :param machine_name: Name of the machine.
+        :returns: A ``dict`` of connection params or ``None`` if the
+                  driver doesn't expose them.
+        """
+        driver = inspect.get("Driver") or {}
+        host = driver.get("IPAddress")
+        if not host:
+            return None
+
+        key = driver.get("SSHKeyPath")
+        if not key and driver.get("StorePath"):
+            # drivers which generate their own key store it
+            # in machine's directory
+            key = os.path.join(driver["StorePath"], "machines",
+                               machine_name, "id_rsa")
+        if not key or not os.path.isfile(key):
+            return None
+
+        return {
+            "host": host,
+            "user": driver.get("SSHUser") or "root",
+            "port": driver.get("SSHPort") or 22,
+            "key": key,
+        }
+
+    def control_path(self, params):
+        """Gets path to control socket of a connection.
+
+        :param params: A ``dict`` of connection params.
+        :returns: Absolute path to control socket.
+        """
+        return os.path.join(
+            self.control_dir,
+            "{user}@{host}:{port}".format(**params),
+        )
+
+    def ssh_args(self, params):
+        """Builds ``ssh`` command arguments (without remote command).
+
+        :param params: A ``dict`` of connection params.
+        :returns: A list of command arguments.
+        """
+        return [
+            "ssh",
+            "-i", params["key"],
+            "-p", str(params["port"]),
+            "-o", "ControlMaster=auto",
+            "-o", "ControlPath={}".format(self.control_path(params)),
+            "-o", "ControlPersist={}".format(self.idle_timeout),
+            "-o", "StrictHostKeyChecking=no",
+            "-o", "UserKnownHostsFile=/dev/null",
+            "-o", "PasswordAuthentication=no",
+            "-o", "LogLevel=quiet",
+            "{user}@{host}".format(**params),
+        ]
+
+    def run(self, params, cmd, data=None):
+        """Runs a command on remote node.
+
+        :param params: A ``dict`` of connection params.
+        :param cmd: Command to run.
+        :param data: Data sent to command's stdin (if any).
+        :returns: A tuple of stdout, stderr, and exit code.
+        """
+        if not os.path.exists(self.control_dir):
+            try:
+                os.makedirs(self.control_dir, 0o700)
+            except OSError:  # pragma: no cover
+                # created by other process
+                pass
+
+        try:
+            p = Popen(self.ssh_args(params) + [cmd],
+                      stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            stdout, stderr = p.communicate(data)
+        except OSError as exc:
+            raise RuntimeError("return code {}: {}".format(exc.errno, exc.strerror))
+
+        if p.returncode:
+            raise RuntimeError("return code {}: {}".format(p.returncode, stderr.strip()))
+        return stdout.strip(), stderr.strip(), p.returncode
+
+    def copy(self, params, source, destination, recursive=False):
+        """Copies local file or directory to remote node in a single
+        connection, streamed through ``sudo``.
+
+        Like ``cp``, if ``destination`` is an existing directory,
+        ``source`` is copied into it.
+
+        :param params: A ``dict`` of connection params.
+        :param source: Path to local file or directory.
+        :param destination: Path in remote node.
+        :param recursive: Whether to copy directory recursively.
+        """
+        name = os.path.basename(source.rstrip("/"))
+        target = 'T={dest}; [ -d "$T" ] && T="$T"/{name}; '.format(
+            dest=quote(destination), name=quote(name),
+        )
+
+        if os.path.isdir(source):
+            if not recursive:
+                raise RuntimeError("{} is a directory".format(source))
+
+            fd = io.BytesIO()
+            with tarfile.open(mode="w", fileobj=fd) as tf:
+                tf.add(source, arcname=".")
+            data = fd.getvalue()
+            script = target + 'mkdir -p "$T" && tar -xf - -C "$T"'
+        else:
+            with open(source, "rb") as fd:
+                data = fd.read()
+            script = target + 'cat > "$T"'
+
+        cmd = "sudo sh -c {}".format(quote(script))
+        return self.run(params, cmd, data=data)
+
+    def close(self, params):
+        """Closes master connection (if any).
+
+        :param params: A ``dict`` of connection params.
+        """
+        if not os.path.exists(self.control_path(params)):
+            return
+
+        args = self.ssh_args(params)
+        args[-1:-1] = ["-O", "exit"]
+        try:
+            Popen(args, stdout=PIPE, stderr=PIPE).communicate()
+        except OSError:  # pragma: no cover
+            pass
+
+
+#: Multiplexer shared by all :class:`~gluuengine.machine.Machine` objects
+ssh_multiplexer = SSHMultiplexer()
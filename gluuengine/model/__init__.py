@@ -27,6 +27,7 @@ from .base import STATE_SUCCESS  # noqa
 from .base import STATE_DISABLED  # noqa
 
 from .log import ContainerLog  # noqa
+from .job import Job  # noqa
 
 from .base import STATE_SETUP_IN_PROGRESS  # noqa
 from .base import STATE_SETUP_FINISHED  # noqa
@@ -3,14 +3,25 @@
 #
 # All rights reserved.
 
+from ..serializer import ModelMeta
+
 
 class BaseModel(object):
     """Base class for model.
 
     This class should not be used directly.
     """
+    __metaclass__ = ModelMeta
+
     resource_fields = {}
 
+    #: Attributes that are never stored in database
+    transient_fields = ("resource_fields",)
+
+    #: Attributes stored in database; when not declared, attributes set
+    #: by the constructor are stored
+    persistent_fields = None
+
     def as_dict(self):
         """Transforms into a ``dict`` of model's resource attributes.
 
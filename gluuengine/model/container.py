@@ -23,6 +23,7 @@ class LdapContainer(BaseModel):
         "state",
         "hostname",
         "cid",
+        "setup_steps",
     ])
 
     def __init__(self):
@@ -37,6 +38,8 @@ class LdapContainer(BaseModel):
         self.state = ""
         self.hostname = ""
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
 
         # Filesystem path to Java truststore
         self.truststore_fn = '/usr/lib/jvm/java-7-openjdk-amd64/jre/lib/security/cacerts'
@@ -100,6 +103,7 @@ class OxauthContainer(BaseModel):
         "state",
         "hostname",
         "cid",
+        "setup_steps",
     ])
 
     def __init__(self):
@@ -112,6 +116,8 @@ class OxauthContainer(BaseModel):
         self.state = ""
         self.hostname = ""
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
 
         self.truststore_fn = '/usr/lib/jvm/java-7-openjdk-amd64/jre/lib/security/cacerts'
         self.ldap_binddn = 'cn=directory manager'
@@ -140,6 +146,7 @@ class OxtrustContainer(BaseModel):
         "state",
         "hostname",
         "cid",
+        "setup_steps",
     ])
 
     def __init__(self):
@@ -153,6 +160,8 @@ class OxtrustContainer(BaseModel):
         self.state = ""
         self.hostname = ""
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
 
         self.ldap_binddn = 'cn=directory manager'
         self.cert_folder = "/etc/certs"
@@ -180,6 +189,7 @@ class OxidpContainer(BaseModel):
         "saml_type",
         "hostname",
         "cid",
+        "setup_steps",
     ])
 
     def __init__(self):
@@ -192,6 +202,8 @@ class OxidpContainer(BaseModel):
         self.state = ""
         self.hostname = ""
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
 
         self.cert_folder = "/etc/certs"
         self.tomcat_home = "/opt/tomcat"
@@ -218,11 +230,14 @@ class NginxContainer(BaseModel):
         "type",
         "state",
         "hostname",
+        "setup_steps",
     ])
 
     def __init__(self):
         self.id = str(uuid.uuid4())
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
         self.name = ""
         self.cluster_id = ""
         self.node_id = ""
@@ -251,6 +266,7 @@ class OxasimbaContainer(BaseModel):
         "saml_type",
         "hostname",
         "cid",
+        "setup_steps",
     ])
 
     def __init__(self):
@@ -262,6 +278,8 @@ class OxasimbaContainer(BaseModel):
         self.state = ""
         self.hostname = ""
         self.cid = ""
+        # names of finished setup steps, used to resume failed setup
+        self.setup_steps = []
 
         self.cert_folder = "/etc/certs"
         self.tomcat_home = "/opt/tomcat"
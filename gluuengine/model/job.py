@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import time
+import uuid
+
+from .base import BaseModel
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_FINISHED = "FINISHED"
+JOB_FAILED = "FAILED"
+
+
+class Job(BaseModel):
+    """A unit of deployment work stored in ``jobs`` collection.
+
+    Jobs are described by data rather than callables, hence they can be
+    submitted by any process and run by the dispatcher process.
+
+    :param name: Human-readable name, e.g. ``setup oxauth_<uuid>``.
+    :param type_: Type of the job; the function which runs the job
+                  is looked up by this type.
+    :param args: A ``dict`` of job's arguments.
+    :param key: Concurrency key (e.g. ID of the node).
+    :param group: Concurrency group (e.g. ID of the cluster).
+    """
+    resource_fields = dict.fromkeys([
+        "id",
+        "name",
+        "type",
+        "key",
+        "group",
+        "state",
+        "error",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ])
+
+    def __init__(self, name="", type_="", args=None, key=None, group=None):
+        self.id = "{}".format(uuid.uuid4())
+        self.name = name
+        self.type = type_
+        self.args = args or {}
+        self.key = key
+        self.group = group
+        self.state = JOB_QUEUED
+        self.error = ""
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.state in (JOB_FINISHED, JOB_FAILED,)
@@ -35,10 +35,20 @@ class ContainerLog(BaseModel):
         except IndexError:
             pass
 
+        container_log = ContainerLog.from_container(container)
+        db.persist(container_log, "container_logs")
+        return container_log
+
+    @staticmethod
+    def from_container(container):
+        """Creates (unsaved) log object of a container.
+
+        :param container: Container object.
+        :returns: An instance of :class:`ContainerLog`.
+        """
         container_log = ContainerLog()
         container_log.id = container.name
         container_log.container_name = container.name
         container_log.setup_log = "{}-setup.log".format(container_log.container_name)
         container_log.teardown_log = "{}-teardown.log".format(container_log.container_name)
-        db.persist(container_log, "container_logs")
         return container_log
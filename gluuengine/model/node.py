@@ -74,6 +74,7 @@ class DiscoveryNode(Node):
         'state_install_consul',
         'state_complete'
     ])
+    resource_fields = dict(Node.resource_fields.items() + state_fields.items())
 
     def __init__(self, fields=None):
         self.id = str(uuid.uuid4())
@@ -82,7 +83,6 @@ class DiscoveryNode(Node):
         self.state_complete = False
         self.type = 'discovery'
         self.populate(fields)
-        self.resource_fields = dict(self.resource_fields.items() + self.state_fields.items())
 
     def populate(self, fields=None):
         fields = fields or {}
@@ -104,6 +104,7 @@ class MasterNode(Node):
         "state_rng_tools",
         "state_pull_images",
     ])
+    resource_fields = dict(Node.resource_fields.items() + state_fields.items())
 
     def __init__(self, fields=None):
         self.id = str(uuid.uuid4())
@@ -120,7 +121,6 @@ class MasterNode(Node):
         self.state_pull_images = False
         self.type = 'master'
         self.populate(fields)
-        self.resource_fields = dict(self.resource_fields.items() + self.state_fields.items())
 
     def populate(self, fields=None):
         fields = fields or {}
@@ -140,6 +140,7 @@ class WorkerNode(Node):
         "state_rng_tools",
         "state_pull_images",
     ])
+    resource_fields = dict(Node.resource_fields.items() + state_fields.items())
 
     def __init__(self, fields=None):
         self.id = str(uuid.uuid4())
@@ -154,7 +155,6 @@ class WorkerNode(Node):
         self.state_pull_images = False
         self.type = 'worker'
         self.populate(fields)
-        self.resource_fields = dict(self.resource_fields.items() + self.state_fields.items())
 
     def populate(self, fields=None):
         fields = fields or {}
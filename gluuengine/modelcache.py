@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import collections
+import copy
+import threading
+
+from .cache import TTLCache
+
+#: Default number of seconds before cached object is expired; bounds
+#: staleness of objects changed by other processes
+DEFAULT_TTL = 30
+
+
+class SingletonCache(object):
+    """Process-wide cache of objects which exist once per cluster and
+    rarely change, i.e. the cluster, master node and discovery node.
+
+    Objects are invalidated by write-through from
+    :class:`~gluuengine.database.Database` whenever their collection is
+    changed in current process, and expired after ``ttl`` seconds to pick up
+    changes made by other processes (unless change streams are watched by
+    :class:`~gluuengine.task.SingletonWatchTask`).
+
+    Callers receive copies, hence modifying returned objects doesn't
+    affect the cache.
+
+    Each collection has a generation number bumped on invalidation;
+    an object loaded while its collection was invalidated is returned
+    but not cached, so a slow reader can't put back a stale object.
+
+    :param ttl: Number of seconds before cached object is expired.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.cache = TTLCache(default_ttl=ttl)
+        self._generations = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the cache from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        self.cache.default_ttl = app.config.get("SINGLETON_CACHE_TTL", DEFAULT_TTL)
+        self.cache.clear()
+
+    def get(self, table_name, name, loader):
+        """Gets cached object or loads it.
+
+        :param table_name: Name of the collection where object is stored.
+        :param name: Name of the object, e.g. ``master``.
+        :param loader: A callable which returns the object (or ``None``).
+        :returns: A copy of the object or ``None``.
+        """
+        key = (table_name, name)
+        missing = object()
+
+        obj = self.cache.get(key, missing)
+        if obj is missing:
+            generation = self._generations[table_name]
+            obj = loader()
+            if obj is None:
+                # missing object is not cached as it may be created
+                # by other process anytime
+                return None
+
+            with self._lock:
+                if generation == self._generations[table_name]:
+                    self.cache.set(key, obj)
+        return copy.deepcopy(obj)
+
+    def invalidate(self, table_name):
+        """Removes cached objects of a collection.
+
+        :param table_name: Name of the collection.
+        """
+        with self._lock:
+            self._generations[table_name] += 1
+            self.cache.delete_matching(lambda key: key[0] == table_name)
+
+    def clear(self):
+        """Removes all cached objects.
+        """
+        with self._lock:
+            for table_name in list(self._generations):
+                self._generations[table_name] += 1
+            self.cache.clear()
+
+
+#: Cache shared by all threads in current process
+singletons = SingletonCache()
@@ -6,3 +6,5 @@
 from .node import DeployDiscoveryNode  # noqa
 from .node import DeployMasterNode  # noqa
 from .node import DeployWorkerNode  # noqa
+from .node import Discovery  # noqa
+from .node import node_job  # noqa
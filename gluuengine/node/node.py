@@ -4,12 +4,15 @@
 # All rights reserved.
 
 import os
-import time
-from crochet import run_in_reactor
 
 from ..database import db
 from ..machine import Machine
+from ..errors import ProbeTimeoutError
 from ..log import create_file_logger
+from ..probe import node_command_ok
+from ..probe import wait_for
+from ..scheduler import scheduler
+from ..weave import invalidate_dns_args
 
 REMOTE_DOCKER_CERT_DIR = "/opt/gluu/docker/certs"
 CERT_FILES = ['ca.pem', 'cert.pem', 'key.pem']
@@ -21,7 +24,18 @@ RECOVERY_CONF = "https://github.com/GluuFederation/cluster-tools/raw/master/reco
 RNG_TOOLS_CONF = "https://raw.githubusercontent.com/GluuFederation/cluster-tools/master/rng_tools"
 
 
+class Discovery(object):
+    """Address of discovery (consul) service of the cluster.
+    """
+    def __init__(self, ip="", port=""):
+        self.ip = ip
+        self.port = port
+
+
 class DeployNode(object):
+    # number of seconds to wait for services in the node to be ready
+    ready_timeout = 120
+
     def __init__(self, node_model_obj, app):
         self.app = app
         self.node = node_model_obj
@@ -30,6 +44,36 @@ class DeployNode(object):
         with self.app.app_context():
             self.provider = db.get(self.node.provider_id, 'providers')
 
+    def mp_deploy(self):
+        """Runs the node deployment. Must be overriden in subclass.
+        """
+        raise NotImplementedError
+
+    def _wait_node(self, cmd, name):
+        """Waits until a command succeeds in the node.
+
+        :param cmd: Command to run over SSH.
+        :param name: Name of the awaited service.
+        :raises: ``RuntimeError`` if the command doesn't succeed
+                 within ``ready_timeout`` seconds.
+        """
+        try:
+            elapsed = wait_for(
+                node_command_ok(self.machine, self.node.name, cmd),
+                timeout=self.ready_timeout,
+                name="{} in {} node".format(name, self.node.name),
+            )
+        except ProbeTimeoutError as exc:
+            raise RuntimeError(str(exc))
+        self.logger.info("{} is ready ({:.1f} seconds)".format(name, elapsed))
+
+    def _wait_docker(self):
+        try:
+            self._wait_node("sudo docker info", "docker")
+        except RuntimeError as e:
+            # subsequent steps report their own errors
+            self.logger.warn(e)
+
     def _rng_tools(self):
         try:
             self.logger.info("installing rng-tools in {} node".format(self.node.name))
@@ -40,7 +84,7 @@ class DeployNode(object):
             self.machine.ssh(self.node.name, ' && '.join(cmd_list))
             self.node.state_rng_tools = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_rng_tools': True})
         except RuntimeError as e:
             self.logger.error('failed to install rng-tools')
             self.logger.error(e)
@@ -55,7 +99,7 @@ class DeployNode(object):
             self.machine.ssh(self.node.name, ' && '.join(cmd_list))
             self.node.state_pull_images = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_pull_images': True})
         except RuntimeError as e:
             self.logger.error('failed to pull images')
             self.logger.error(e)
@@ -71,9 +115,10 @@ class DeployNode(object):
                 "sudo supervisorctl reload",
             ]
             self.machine.ssh(self.node.name, ' && '.join(cmd_list))
+            self._wait_node("sudo supervisorctl status", "supervisord")
             self.node.state_recovery = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_recovery': True})
         except RuntimeError as e:
             self.logger.error('failed to install recovery script')
             self.logger.error(e)
@@ -84,7 +129,7 @@ class DeployNode(object):
             self.machine.ssh(self.node.name, 'sudo curl -L git.io/weave -o /usr/local/bin/weave')
             self.node.state_install_weave = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_install_weave': True})
         except RuntimeError as e:
             self.logger.error('failed to install weave')
             self.logger.error(e)
@@ -95,7 +140,7 @@ class DeployNode(object):
             self.machine.ssh(self.node.name, 'sudo chmod +x /usr/local/bin/weave')
             self.node.state_weave_permission = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_weave_permission': True})
         except RuntimeError as e:
             self.logger.error('failed to set weave permission')
             self.logger.error(e)
@@ -105,14 +150,12 @@ class DeployDiscoveryNode(DeployNode):
     def __init__(self, node_model_obj, app):
         super(DeployDiscoveryNode, self).__init__(node_model_obj, app)
 
-    @run_in_reactor
-    def deploy(self):
+    def mp_deploy(self):
         if not self.node.state_node_create:
             self._node_create()
-            time.sleep(1)
         if self.node.state_node_create and not self.node.state_install_consul:
+            self._wait_docker()
             self._install_consul()
-            time.sleep(1)
         self._is_completed()
 
         for handler in self.logger.handlers:
@@ -125,7 +168,7 @@ class DeployDiscoveryNode(DeployNode):
             self.machine.create(self.node, self.provider, None)
             self.node.state_node_create = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_node_create': True})
         except RuntimeError as e:
             self.logger.error('failed to create node')
             self.logger.error(e)
@@ -136,7 +179,7 @@ class DeployDiscoveryNode(DeployNode):
             self.machine.ssh(self.node.name, 'sudo docker run -d --name=consul -p 8500:8500 -h consul --restart=always -v /opt/gluu/consul/data:/data progrium/consul -server -bootstrap')
             self.node.state_install_consul = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_install_consul': True})
         except RuntimeError as e:
             self.logger.error('failed to install consul')
             self.logger.error(e)
@@ -146,7 +189,7 @@ class DeployDiscoveryNode(DeployNode):
             self.node.state_complete = True
             self.logger.info('node deployment is done')
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_complete': True})
 
 
 class DeployMasterNode(DeployNode):
@@ -154,36 +197,27 @@ class DeployMasterNode(DeployNode):
         super(DeployMasterNode, self).__init__(node_model_obj, app)
         self.discovery = discovery
 
-    @run_in_reactor
-    def deploy(self):
+    def mp_deploy(self):
         if not self.node.state_node_create:
             self._node_create()
-            time.sleep(1)
         if self.node.state_node_create:
+            self._wait_docker()
             if not self.node.state_install_weave:
                 self._install_weave()
-                time.sleep(1)
             if not self.node.state_weave_permission:
                 self._weave_permission()
-                time.sleep(1)
             if not self.node.state_weave_launch:
                 self._weave_launch()
-                time.sleep(1)
             if not self.node.state_docker_cert:
                 self._docker_cert()
-                time.sleep(1)
             if not self.node.state_fswatcher:
                 self._fswatcher()
-                time.sleep(1)
             if not self.node.state_recovery:
                 self._recovery()
-                time.sleep(1)
             if not self.node.state_rng_tools:
                 self._rng_tools()
-                time.sleep(1)
             if not self.node.state_pull_images:
                 self._pull_images()
-                time.sleep(1)
         self._is_completed()
 
         for handler in self.logger.handlers:
@@ -199,7 +233,7 @@ class DeployMasterNode(DeployNode):
             self.node.state_complete = True
             self.logger.info('node deployment is done')
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_complete': True})
 
     def _node_create(self):
         try:
@@ -207,7 +241,7 @@ class DeployMasterNode(DeployNode):
             self.machine.create(self.node, self.provider, self.discovery)
             self.node.state_node_create = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_node_create': True})
         except RuntimeError as e:
             self.logger.error('failed to create node')
             self.logger.error(e)
@@ -216,9 +250,11 @@ class DeployMasterNode(DeployNode):
         try:
             self.logger.info('launching weave')
             self.machine.ssh(self.node.name, 'sudo weave launch')
+            self._wait_node("sudo weave status", "weave")
+            invalidate_dns_args(self.node.name)
             self.node.state_weave_launch = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_weave_launch': True})
         except RuntimeError as e:
             self.logger.error('failed to launch weave')
             self.logger.error(e)
@@ -236,7 +272,7 @@ class DeployMasterNode(DeployNode):
                 )
             self.node.state_docker_cert = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_docker_cert': True})
         except RuntimeError as e:
             self.logger.error('failed to push docker client cert into master node')
             self.logger.error(e)
@@ -257,9 +293,10 @@ class DeployMasterNode(DeployNode):
                 "sudo supervisorctl reload",
             ]
             self.machine.ssh(self.node.name, ' && '.join(cmd_list))
+            self._wait_node("sudo supervisorctl status", "supervisord")
             self.node.state_fswatcher = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_fswatcher': True})
         except RuntimeError as e:
             self.logger.error('failed to install fswatcher script')
             self.logger.error(e)
@@ -270,30 +307,23 @@ class DeployWorkerNode(DeployNode):
         super(DeployWorkerNode, self).__init__(node_model_obj, app)
         self.discovery = discovery
 
-    @run_in_reactor
-    def deploy(self):
+    def mp_deploy(self):
         if not self.node.state_node_create:
             self._node_create()
-            time.sleep(1)
         if self.node.state_node_create:
+            self._wait_docker()
             if not self.node.state_install_weave:
                 self._install_weave()
-                time.sleep(1)
             if not self.node.state_weave_permission:
                 self._weave_permission()
-                time.sleep(1)
             if not self.node.state_weave_launch:
                 self._weave_launch()
-                time.sleep(1)
             if not self.node.state_recovery:
                 self._recovery()
-                time.sleep(1)
             if not self.node.state_rng_tools:
                 self._rng_tools()
-                time.sleep(1)
             if not self.node.state_pull_images:
                 self._pull_images()
-                time.sleep(1)
         self._is_completed()
 
         for handler in self.logger.handlers:
@@ -308,7 +338,7 @@ class DeployWorkerNode(DeployNode):
             self.node.state_complete = True
             self.logger.info('node deployment is done')
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_complete': True})
 
     def _node_create(self):
         try:
@@ -316,7 +346,7 @@ class DeployWorkerNode(DeployNode):
             self.machine.create(self.node, self.provider, self.discovery)
             self.node.state_node_create = True
             with self.app.app_context():
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_node_create': True})
         except RuntimeError as e:
             self.logger.error('failed to create node')
             self.logger.error(e)
@@ -325,11 +355,51 @@ class DeployWorkerNode(DeployNode):
         try:
             self.logger.info('launching weave')
             with self.app.app_context():
-                master = db.search_from_table('nodes', {'type': 'master'})[0]
+                master = db.get_master_node()
                 ip = self.machine.ip(master.name)
                 self.machine.ssh(self.node.name, 'sudo weave launch {}'.format(ip))
+                self._wait_node("sudo weave status", "weave")
+                invalidate_dns_args(self.node.name)
                 self.node.state_weave_launch = True
-                db.update(self.node.id, self.node, 'nodes')
+                db.set_fields('nodes', {'id': self.node.id}, {'state_weave_launch': True})
         except RuntimeError as e:
             self.logger.error('failed to launch weave')
             self.logger.error(e)
+
+
+def node_job(node, discovery=None):
+    """Builds deployment job of a node.
+
+    :param node: Node object.
+    :param discovery: An instance of :class:`Discovery` (not used
+                      by discovery node).
+    :returns: A ``(name, type_, args, key, group)`` tuple accepted by
+              :meth:`~gluuengine.scheduler.DeploymentScheduler.submit_many`.
+    """
+    args = {"node_id": node.id, "discovery": None}
+    if discovery is not None:
+        args["discovery"] = {"ip": discovery.ip, "port": discovery.port}
+    return ("deploy {}".format(node.name), "node", args, node.id, None)
+
+
+def run_node_job(app, args):
+    """Runs deployment job built by :func:`node_job`.
+    """
+    with app.app_context():
+        node = db.get(args["node_id"], "nodes")
+    if not node:
+        raise RuntimeError("node {} is not found".format(args["node_id"]))
+
+    if node.type == "discovery":
+        deployer = DeployDiscoveryNode(node, app)
+    else:
+        discovery = Discovery(args["discovery"]["ip"],
+                              args["discovery"]["port"])
+        if node.type == "master":
+            deployer = DeployMasterNode(node, discovery, app)
+        else:
+            deployer = DeployWorkerNode(node, discovery, app)
+    deployer.mp_deploy()
+
+
+scheduler.register("node", run_node_job)
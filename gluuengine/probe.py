@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import os
+import time
+from pipes import quote
+
+from .errors import DockerExecError
+from .errors import ProbeTimeoutError
+
+#: Default number of seconds before giving up
+DEFAULT_TIMEOUT = 120
+
+#: Default number of seconds between the first and second attempt
+DEFAULT_INITIAL_DELAY = 0.5
+
+#: Default maximum number of seconds between attempts
+DEFAULT_MAX_DELAY = 10
+
+# supervisord program states of programs which aren't serving (yet)
+_SUPERVISOR_NOT_READY_STATES = ("STARTING", "BACKOFF", "STOPPED", "FATAL",)
+
+
+def wait_for(probe, timeout=DEFAULT_TIMEOUT, name="resource",
+             initial_delay=DEFAULT_INITIAL_DELAY,
+             max_delay=DEFAULT_MAX_DELAY):
+    """Polls a readiness probe until it succeeds, doubling the delay
+    between attempts (up to ``max_delay``).
+
+    :param probe: A callable which returns ``True`` when ready.
+    :param timeout: Number of seconds before giving up.
+    :param name: Name of the awaited resource, used in error message.
+    :param initial_delay: Number of seconds before the second attempt.
+    :param max_delay: Maximum number of seconds between attempts.
+    :returns: Number of seconds spent waiting.
+    :raises: :class:`~gluuengine.errors.ProbeTimeoutError` if probe
+             doesn't succeed within ``timeout`` seconds.
+    """
+    start = time.time()
+    deadline = start + timeout
+    delay = initial_delay
+
+    while not probe():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise ProbeTimeoutError(
+                "{} is not ready after {} seconds".format(name, timeout)
+            )
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+    return time.time() - start
+
+
+def _exec_output(docker, container, cmd):
+    # non-zero exit code is a regular outcome of a probe
+    result = docker.exec_batch(container, [cmd], stop_on_error=False)[0]
+    return result.exit_code, result.retval
+
+
+def _program_pids(output):
+    # e.g. ``tomcat    RUNNING   pid 11, uptime 0:00:02``
+    pids = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) > 3 and parts[1] == "RUNNING" and parts[2] == "pid":
+            pids[parts[0]] = parts[3].rstrip(",")
+    return pids
+
+
+def supervisor_pids(docker, container):
+    """Gets PIDs of programs currently run by supervisord.
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :returns: A ``dict`` of program name and its PID.
+    """
+    try:
+        _, output = _exec_output(docker, container, "supervisorctl status")
+    except DockerExecError:
+        return {}
+    return _program_pids(output)
+
+
+def supervisor_running(docker, container, previous_pids=None):
+    """Builds a probe which checks whether supervisord has started
+    its programs.
+
+    As ``supervisorctl reload`` returns before supervisord restarts,
+    programs reported with the PIDs taken before reloading are still
+    the old processes; the probe doesn't pass until they are replaced
+    (or supervisord has been seen refusing connections).
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :param previous_pids: PIDs of programs before reloading supervisord,
+                          as returned by :func:`supervisor_pids`.
+    :returns: A probe callable.
+    """
+    # a list to be modified by inner function
+    restarted = [not previous_pids]
+
+    def probe():
+        try:
+            _, output = _exec_output(docker, container, "supervisorctl status")
+        except DockerExecError:
+            restarted[0] = True
+            return False
+
+        states = [
+            line.split()[1] for line in output.splitlines()
+            if len(line.split()) > 1
+        ]
+        # supervisorctl prints an error (e.g. refused connection)
+        # while supervisord is reloading
+        if not states or "refused" in output or "no such file" in output:
+            restarted[0] = True
+            return False
+        if any(state in _SUPERVISOR_NOT_READY_STATES for state in states):
+            return False
+
+        if not restarted[0]:
+            pids = _program_pids(output)
+            if any(previous_pids.get(name) == pid for name, pid in pids.items()):
+                return False
+            restarted[0] = True
+        return True
+    return probe
+
+
+def port_open(docker, container, port, host="127.0.0.1"):
+    """Builds a probe which checks whether a TCP port accepts connections.
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :param port: Port number.
+    :param host: Host to connect to, from container's point of view.
+    :returns: A probe callable.
+    """
+    cmd = "bash -c {}".format(
+        quote("exec 3<>/dev/tcp/{}/{}".format(host, port))
+    )
+
+    def probe():
+        try:
+            exit_code, _ = _exec_output(docker, container, cmd)
+        except DockerExecError:
+            return False
+        return exit_code == 0
+    return probe
+
+
+def http_ok(docker, container, url):
+    """Builds a probe which checks whether a URL responds with
+    non-error HTTP status.
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :param url: URL requested from inside the container.
+    :returns: A probe callable.
+    """
+    cmd = "curl -k -s -o /dev/null -w '%{{http_code}}' {}".format(quote(url))
+
+    def probe():
+        try:
+            _, output = _exec_output(docker, container, cmd)
+        except DockerExecError:
+            return False
+        return output.isdigit() and 200 <= int(output) < 400
+    return probe
+
+
+def command_output_contains(docker, container, cmd, texts):
+    """Builds a probe which checks whether a command succeeds and its
+    output contains all given texts.
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :param cmd: Command to run.
+    :param texts: A list of expected texts.
+    :returns: A probe callable.
+    """
+    def probe():
+        try:
+            exit_code, output = _exec_output(docker, container, cmd)
+        except DockerExecError:
+            return False
+        return exit_code == 0 and all(text in output for text in texts)
+    return probe
+
+
+def file_exists(docker, container, path):
+    """Builds a probe which checks whether a path exists in container.
+
+    :param docker: An instance of :class:`~gluuengine.dockerclient.Docker`.
+    :param container: ID or name of the container.
+    :param path: Path in the container.
+    :returns: A probe callable.
+    """
+    cmd = "test -e {}".format(quote(path))
+
+    def probe():
+        try:
+            exit_code, _ = _exec_output(docker, container, cmd)
+        except DockerExecError:
+            return False
+        return exit_code == 0
+    return probe
+
+
+def local_file_exists(path):
+    """Builds a probe which checks whether a local path exists.
+
+    :param path: Local path.
+    :returns: A probe callable.
+    """
+    return lambda: os.path.exists(path)
+
+
+def node_command_ok(machine, node_name, cmd):
+    """Builds a probe which checks whether a command succeeds in a node.
+
+    :param machine: An instance of :class:`~gluuengine.machine.Machine`.
+    :param node_name: Name of the node.
+    :param cmd: Command to run over SSH.
+    :returns: A probe callable.
+    """
+    def probe():
+        try:
+            machine.ssh(node_name, cmd)
+        except RuntimeError:
+            return False
+        return True
+    return probe
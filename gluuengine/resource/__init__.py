@@ -16,6 +16,7 @@ from .cluster import ClusterListResource  # noqa
 from .node import NodeResource  # noqa
 from .node import NodeListResource  # noqa
 from .node import CreateNodeResource  # noqa
+from .node import NodeHealthResource  # noqa
 
 from .container import ContainerLogResource  # noqa
 from .container import ContainerLogSetupResource  # noqa
@@ -25,4 +26,10 @@ from .container import ContainerLogListResource  # noqa
 from .container import ContainerListResource  # noqa
 from .container import ContainerResource  # noqa
 from .container import NewContainerResource  # noqa
+from .container import ContainerResumeResource  # noqa
 from .container import ScaleContainerResource # noqa
+
+from .metrics import DatabaseMetricsResource  # noqa
+
+from .job import JobListResource  # noqa
+from .job import JobResource  # noqa
@@ -6,27 +6,23 @@
 import os
 import uuid
 from itertools import cycle
+from itertools import islice
 
 from flask import abort
 from flask import current_app
 from flask import request
 from flask import url_for
 from flask_restful import Resource
-import concurrent.futures
-from crochet import run_in_reactor
 
 from ..database import db
 from ..reqparser import ContainerReq
 from ..model import STATE_SUCCESS
+from ..model import STATE_FAILED
 from ..model import STATE_IN_PROGRESS
 from ..model import STATE_SETUP_IN_PROGRESS
 from ..model import STATE_TEARDOWN_IN_PROGRESS
-from ..helper import LdapContainerHelper
-from ..helper import OxauthContainerHelper
-from ..helper import OxtrustContainerHelper
-# from ..helper import OxidpContainerHelper
-from ..helper import NginxContainerHelper
-from ..helper import OxasimbaContainerHelper
+from ..helper import check_nodes_reachable
+from ..helper import container_job
 from ..model import LdapContainer
 from ..model import OxauthContainer
 from ..model import OxtrustContainer
@@ -35,7 +31,14 @@ from ..model import NginxContainer
 from ..model import OxasimbaContainer
 from ..model import ContainerLog
 from ..machine import Machine
+from ..machine import node_health
+from ..scheduler import scheduler
+from ..scheduler import SchedulerBusy
+from ..serializer import projection
 from ..utils import as_boolean
+from .job import busy_response
+from .job import job_url
+from .pagination import list_response
 
 
 #: List of supported container
@@ -48,6 +51,19 @@ CONTAINER_CHOICES = (
     # "oxasimba",  # disabled for now
 )
 
+#: Fields loaded by list endpoints
+CONTAINER_PROJECTION = projection([
+    LdapContainer,
+    OxauthContainer,
+    OxtrustContainer,
+    NginxContainer,
+    OxasimbaContainer,
+])
+CONTAINER_LOG_PROJECTION = projection(
+    [ContainerLog], extra_fields=("setup_log", "teardown_log",),
+)
+NODE_ID_PROJECTION = projection([], extra_fields=("id", "name",))
+
 
 def get_container(db, container_id):
     try:
@@ -60,42 +76,7 @@ def get_container(db, container_id):
     return container
 
 
-def target_node_reachable(node_name):
-    return Machine().status(node_name)
-
-
-def master_node_reachable():
-    try:
-        node = db.search_from_table(
-            "nodes", {"type": "master"},
-        )[0]
-    except IndexError:
-        return False
-    else:
-        return Machine().status(node.name)
-
-
-def discovery_node_reachable():
-    try:
-        node = db.search_from_table(
-            "nodes", {"type": "discovery"},
-        )[0]
-    except IndexError:
-        return False
-    else:
-        return Machine().status(node.name)
-
-
 class ContainerResource(Resource):
-    helper_classes = {
-        "ldap": LdapContainerHelper,
-        "oxauth": OxauthContainerHelper,
-        "oxtrust": OxtrustContainerHelper,
-        # "oxidp": OxidpContainerHelper,  # disabled for now
-        "nginx": NginxContainerHelper,
-        "oxasimba": OxasimbaContainerHelper,
-    }
-
     def get(self, container_id):
         container = get_container(db, container_id)
 
@@ -104,7 +85,6 @@ class ContainerResource(Resource):
         return container.as_dict()
 
     def delete(self, container_id):
-        app = current_app._get_current_object()
         force_delete = as_boolean(request.args.get("force_rm", False))
 
         # get container object
@@ -123,42 +103,36 @@ class ContainerResource(Resource):
 
         node = db.get(container.node_id, "nodes")
 
-        # reject request if target node is unreachable
-        if not target_node_reachable(node.name):
-            return {
-                "status": 403,
-                "message": "access denied due to target node being unreachable",
-            }, 403
-
-        # reject request if master node is unreachable
-        if not master_node_reachable():
-            return {
-                "status": 403,
-                "message": "access denied due to master node being unreachable",
-            }, 403
+        # reject request if target, master, or discovery node is unreachable;
+        # an unreachable discovery node will get docker connection stuck
+        reachable, message = check_nodes_reachable(node)
+        if not reachable:
+            return {"status": 403, "message": message}, 403
 
-        # reject request if discovery node is unreachable, otherwise docker
-        # connection will be stuck
-        if not discovery_node_reachable():
-            return {
-                "status": 403,
-                "message": "access denied due to discovery node being unreachable",
-            }, 403
+        if not scheduler.can_accept():
+            return busy_response()
 
         # remove container (``container.id`` may empty, hence we're using
         # unique ``container.name`` instead)
         db.delete_from_table("containers", {"name": container.name})
 
         container_log = ContainerLog.create_or_get(container)
+        previous_state = container_log.state
         container_log.state = STATE_TEARDOWN_IN_PROGRESS
-        db.update(container_log.id, container_log, "container_logs")
-        logpath = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                               container_log.teardown_log)
+        db.set_fields("container_logs", {"id": container_log.id},
+                      {"state": container_log.state})
 
         # run the teardown process
-        helper_class = self.helper_classes[container.type]
-        helper = helper_class(container, app, logpath)
-        helper.teardown()
+        try:
+            job = scheduler.submit(*container_job(
+                "teardown", container, container_log.teardown_log,
+            ))
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            db.persist(container, "containers")
+            db.set_fields("container_logs", {"id": container_log.id},
+                          {"state": previous_state})
+            return busy_response()
 
         headers = {
             "X-Container-Teardown-Log": url_for(
@@ -166,35 +140,93 @@ class ContainerResource(Resource):
                 id=container_log.id,
                 _external=True,
             ),
+            "X-Deploy-Job": job_url(job),
         }
         return {}, 204, headers
 
 
+class ContainerResumeResource(Resource):
+    def post(self, container_id):
+        container = get_container(db, container_id)
+        if not container:
+            return {"status": 404, "message": "Container not found"}, 404
+
+        if container.state != STATE_FAILED:
+            return {
+                "status": 403,
+                "message": "only container with FAILED state can be resumed",
+            }, 403
+
+        node = db.get(container.node_id, "nodes")
+
+        # reject request if target, master, or discovery node is unreachable;
+        # an unreachable discovery node will get docker connection stuck
+        reachable, message = check_nodes_reachable(node)
+        if not reachable:
+            return {"status": 403, "message": message}, 403
+
+        if not scheduler.can_accept():
+            return busy_response()
+
+        # only one of concurrent requests resumes the container
+        container.state = STATE_IN_PROGRESS
+        result = db.set_fields(
+            "containers",
+            {"name": container.name, "state": STATE_FAILED},
+            {"state": container.state},
+        )
+        if not result.matched_count:
+            return {
+                "status": 403,
+                "message": "only container with FAILED state can be resumed",
+            }, 403
+
+        # setup log of previous attempt is appended
+        container_log = ContainerLog.create_or_get(container)
+        previous_state = container_log.state
+        container_log.state = STATE_SETUP_IN_PROGRESS
+        db.set_fields("container_logs", {"id": container_log.id},
+                      {"state": container_log.state})
+
+        # continue the setup process from last finished step
+        try:
+            job = scheduler.submit(*container_job(
+                "resume", container, container_log.setup_log,
+            ))
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            db.set_fields("containers", {"name": container.name},
+                          {"state": STATE_FAILED})
+            db.set_fields("container_logs", {"id": container_log.id},
+                          {"state": previous_state})
+            return busy_response()
+
+        headers = {
+            "X-Container-Setup-Log": url_for(
+                "containerlog_setup",
+                id=container_log.id,
+                _external=True,
+            ),
+            "X-Deploy-Job": job_url(job),
+            "Location": url_for("container", container_id=container.name),
+        }
+        return container.as_dict(), 202, headers
+
+
 class ContainerListResource(Resource):
     def get(self, container_type=""):
         if not container_type:
-            containers = db.all("containers")
-            return [container.as_dict() for container in containers]
+            return list_response("containers", projection=CONTAINER_PROJECTION)
 
         if container_type not in CONTAINER_CHOICES:
             abort(404)
 
-        containers = db.search_from_table(
-            "containers", {"type": container_type},
+        return list_response(
+            "containers", {"type": container_type}, CONTAINER_PROJECTION,
         )
-        return [container.as_dict() for container in containers]
 
 
 class NewContainerResource(Resource):
-    helper_classes = {
-        "ldap": LdapContainerHelper,
-        "oxauth": OxauthContainerHelper,
-        "oxtrust": OxtrustContainerHelper,
-        # "oxidp": OxidpContainerHelper,  # disabled for now
-        "nginx": NginxContainerHelper,
-        "oxasimba": OxasimbaContainerHelper,
-    }
-
     container_classes = {
         "ldap": LdapContainer,
         "oxauth": OxauthContainer,
@@ -221,9 +253,8 @@ class NewContainerResource(Resource):
                 "params": errors,
             }, 400
 
-        try:
-            cluster = db.all("clusters")[0]
-        except IndexError:
+        cluster = db.get_cluster()
+        if not cluster:
             return {
                 "status": 403,
                 "message": "container deployment requires a cluster",
@@ -231,27 +262,11 @@ class NewContainerResource(Resource):
 
         node = data["context"]["node"]
 
-        # reject request if target node is unreachable
-        if not target_node_reachable(node.name):
-            return {
-                "status": 403,
-                "message": "access denied due to target node being unreachable",
-            }, 403
-
-        # reject request if master node is unreachable
-        if not master_node_reachable():
-            return {
-                "status": 403,
-                "message": "access denied due to master node being unreachable",
-            }, 403
-
-        # reject request if discovery node is unreachable, otherwise docker
-        # connection will be stuck
-        if not discovery_node_reachable():
-            return {
-                "status": 403,
-                "message": "access denied due to discovery node being unreachable",
-            }, 403
+        # reject request if target, master, or discovery node is unreachable;
+        # an unreachable discovery node will get docker connection stuck
+        reachable, message = check_nodes_reachable(node)
+        if not reachable:
+            return {"status": 403, "message": message}, 403
 
         # only allow 1 oxtrust per cluster
         if container_type == "oxtrust" and cluster.count_containers(type_="oxtrust"):
@@ -285,6 +300,9 @@ class NewContainerResource(Resource):
                            "to specified node",
             }, 403
 
+        if not scheduler.can_accept():
+            return busy_response()
+
         # pre-populate the container object
         container_class = self.container_classes[container_type]
         container = container_class()
@@ -299,14 +317,19 @@ class NewContainerResource(Resource):
         # log related setup
         container_log = ContainerLog.create_or_get(container)
         container_log.state = STATE_SETUP_IN_PROGRESS
-        db.update(container_log.id, container_log, "container_logs")
-        logpath = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                               container_log.setup_log)
+        db.set_fields("container_logs", {"id": container_log.id},
+                      {"state": container_log.state})
 
         # run the setup process
-        helper_class = self.helper_classes[container_type]
-        helper = helper_class(container, app, logpath)
-        helper.setup()
+        try:
+            job = scheduler.submit(*container_job(
+                "setup", container, container_log.setup_log,
+            ))
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            db.delete_from_table("containers", {"name": container.name})
+            db.delete_from_table("container_logs", {"id": container_log.id})
+            return busy_response()
 
         headers = {
             "X-Container-Setup-Log": url_for(
@@ -314,29 +337,46 @@ class NewContainerResource(Resource):
                 id=container_log.id,
                 _external=True,
             ),
+            "X-Deploy-Job": job_url(job),
             "Location": url_for("container", container_id=container.name),
         }
         return container.as_dict(), 202, headers
 
 
-def format_container_log_response(container_log):
+def list_container_log_files():
+    """Lists names of files in container log directory.
+
+    :returns: A ``set`` of filenames.
+    """
+    app = current_app._get_current_object()
+    try:
+        return set(os.listdir(app.config["CONTAINER_LOG_DIR"]))
+    except OSError:
+        return set()
+
+
+def format_container_log_response(container_log, log_files=None):
     app = current_app._get_current_object()
 
-    setup_log = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                             container_log.setup_log)
-    teardown_log = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                                container_log.teardown_log)
+    def log_exists(filename):
+        # ``log_files`` is passed by list endpoint to avoid
+        # checking files one by one
+        if log_files is not None:
+            return filename in log_files
+        return os.path.exists(
+            os.path.join(app.config["CONTAINER_LOG_DIR"], filename)
+        )
 
     resp = container_log.as_dict()
 
-    if os.path.exists(setup_log):
+    if log_exists(container_log.setup_log):
         resp["setup_log_url"] = url_for(
             "containerlog_setup",
             id=container_log.id,
             _external=True,
         )
 
-    if os.path.exists(teardown_log):
+    if log_exists(container_log.teardown_log):
         resp["teardown_log_url"] = url_for(
             "containerlog_teardown",
             id=container_log.id,
@@ -420,11 +460,15 @@ class ContainerLogTeardownResource(Resource):
 
 class ContainerLogListResource(Resource):
     def get(self):
-        container_logs = db.all("container_logs")
-        return [
-            format_container_log_response(container_log)
-            for container_log in container_logs
-        ]
+        # a single directory listing instead of checking each log file
+        log_files = list_container_log_files()
+        return list_response(
+            "container_logs",
+            projection=CONTAINER_LOG_PROJECTION,
+            formatter=lambda container_log: format_container_log_response(
+                container_log, log_files,
+            ),
+        )
 
 
 class ScaleContainerResource(Resource):
@@ -433,64 +477,63 @@ class ScaleContainerResource(Resource):
         # "oxidp",  # disabled for now
     )
 
-    helper_classes = {
-        "oxauth": OxauthContainerHelper,
-        # "oxidp": OxidpContainerHelper,  # disabled for now
-    }
-
     container_classes = {
         "oxauth": OxauthContainer,
         # "oxidp": OxidpContainer,  # disabled for now
     }
 
     def get_running_nodes(self):
-        m = Machine()
-        running_nodes = m.list('running')
+        running_nodes = node_health.running_nodes()
+        if running_nodes is None:
+            running_nodes = Machine().list('running')
 
-        try:
-            dcv_node = db.search_from_table("nodes", {"type": "discovery"})[0]
+        dcv_node = db.get_discovery_node()
+        if dcv_node and dcv_node.name in running_nodes:
             running_nodes.remove(dcv_node.name)
-        except IndexError:
-            pass
         return running_nodes
 
     def make_node_id_pool(self, nodes):
         running_nodes = self.get_running_nodes()
         running_nodes_ids = [node.id for node in nodes if node.name in running_nodes]
+
+        # nodes with fewer containers in deployment (by any process) come
+        # first, hence concurrent scale requests don't pile up on the
+        # same node
+        running_nodes_ids.sort(key=lambda node_id: db.count_from_table(
+            "containers", {"node_id": node_id, "state": STATE_IN_PROGRESS},
+        ))
+
         #make a circular id list of running nodes
         return cycle(running_nodes_ids)
 
-    def setup_obj_generator(self, app, container_type, number, cluster_id, node_id_pool):
-        with app.app_context():
-            for i in xrange(number):
-                container_class = self.container_classes[container_type]
-                container = container_class()
-                container.cluster_id = cluster_id
-                container.node_id = node_id_pool.next()
-                container.name = "{}_{}".format(container.image, uuid.uuid4())
-                container.state = STATE_IN_PROGRESS
-                db.persist(container, "containers")
-
-                # log related setup
-                container_log = ContainerLog.create_or_get(container)
-                container_log.state = STATE_SETUP_IN_PROGRESS
-                db.update(container_log.id, container_log, "container_logs")
-                logpath = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                                       container_log.setup_log)
-
-                # make the setup obj
-                helper_class = self.helper_classes[container_type]
-                helper = helper_class(container, app, logpath)
-                yield helper
-
-    @run_in_reactor
-    def scaleosorus(self, setup_obj_generator):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            for setup_obj in setup_obj_generator:
-                executor.submit(setup_obj.mp_setup)
+    def prepare_containers(self, container_type, number, cluster_id, node_id_pool):
+        """Creates container and container log objects and saves them
+        in a single batch per collection.
+
+        :returns: A list of tuple of container and container log objects.
+        """
+        container_class = self.container_classes[container_type]
+        containers = []
+        container_logs = []
+
+        for node_id in islice(node_id_pool, number):
+            container = container_class()
+            container.cluster_id = cluster_id
+            container.node_id = node_id
+            container.name = "{}_{}".format(container.image, uuid.uuid4())
+            container.state = STATE_IN_PROGRESS
+            containers.append(container)
+
+            # log related setup
+            container_log = ContainerLog.from_container(container)
+            container_log.state = STATE_SETUP_IN_PROGRESS
+            container_logs.append(container_log)
+
+        db.bulk_persist(containers, "containers")
+        db.bulk_persist(container_logs, "container_logs")
+        return zip(containers, container_logs)
 
     def post(self, container_type, number):
-        app = current_app._get_current_object()
         #validate container type
         if container_type not in self.SCALE_ENABLE_CONTAINERS:
             abort(404)
@@ -501,16 +544,19 @@ class ScaleContainerResource(Resource):
                 "message": "cannot deploy 0 or lower number of container",
             }, 403
 
-        try:
-            cluster = db.all("clusters")[0]
-        except IndexError:
+        cluster = db.get_cluster()
+        if not cluster:
             return {
                 "status": 403,
                 "message": "container deployment requires a cluster",
             }, 403
 
         #get id list of running nodes
-        nodes = db.search_from_table('nodes', {"$or": [{"type": "master"}, {"type": "worker"}]})
+        nodes = db.search_from_table(
+            'nodes',
+            {"$or": [{"type": "master"}, {"type": "worker"}]},
+            NODE_ID_PROJECTION,
+        )
         if not nodes:
             return {
                 "status": 403,
@@ -519,38 +565,98 @@ class ScaleContainerResource(Resource):
 
         node_id_pool = self.make_node_id_pool(nodes)
 
-        #make a list of container setup object
-        sg = self.setup_obj_generator(app, container_type, number, cluster.id, node_id_pool)
+        if not scheduler.can_accept(number):
+            return busy_response()
 
-        self.scaleosorus(sg)
+        # save all containers and their logs up front
+        prepared = self.prepare_containers(container_type, number,
+                                           cluster.id, node_id_pool)
+        if not prepared:
+            return {
+                "status": 403,
+                "message": "container deployment requires running nodes",
+            }, 403
+
+        # containers are set up in deployment scheduler; at most
+        # ``DEPLOY_NODE_CONCURRENCY`` setups run per node (and
+        # ``DEPLOY_CLUSTER_CONCURRENCY`` per cluster) while the rest wait
+        # in queue, as simultaneous setups saturate nodes' CPU
+        try:
+            jobs = scheduler.submit_many([
+                container_job("setup", container, container_log.setup_log)
+                for container, container_log in prepared
+            ])
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            db.bulk_delete("containers", [
+                {"name": container.name} for container, _ in prepared
+            ])
+            db.bulk_delete("container_logs", [
+                {"id": container_log.id} for _, container_log in prepared
+            ])
+            return busy_response()
 
         return {
             "status": 202,
             "message": 'deploying {} {}'.format(number, container_type),
+            "jobs": [job.id for job in jobs],
         }, 202
 
-    @run_in_reactor
-    def delscaleosorus(self, delete_obj_generator):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            for delete_obj in delete_obj_generator:
-                executor.submit(delete_obj.mp_teardown)
-
-    def delete_obj_genarator(self, app, containers):
-        with app.app_context():
-            for container in containers:
-                db.delete_from_table("containers", {"name": container.name})
-                container_log = ContainerLog.create_or_get(container)
-                container_log.state = STATE_TEARDOWN_IN_PROGRESS
-                db.update(container_log.id, container_log, "container_logs")
-                logpath = os.path.join(app.config["CONTAINER_LOG_DIR"],
-                                       container_log.teardown_log)
-                helper_class = self.helper_classes[container.type]
-                helper = helper_class(container, app, logpath)
-                yield helper
+    def prepare_delete(self, containers):
+        """Removes containers and marks their logs as teardown in progress,
+        in a single batch per collection.
+
+        :returns: A list of tuple of container and container log objects,
+                  and a ``dict`` of container log ID and its previous
+                  state (``None`` if the log is newly created).
+        """
+        names = [container.name for container in containers]
+        db.bulk_delete("containers", [{"name": name} for name in names])
+
+        existing_logs = {
+            container_log.container_name: container_log
+            for container_log in db.search_from_table(
+                "container_logs", {"container_name": {"$in": names}},
+            )
+        }
 
-    def delete(self, container_type, number):
-        app = current_app._get_current_object()
+        container_logs = []
+        previous_states = {}
+        for container in containers:
+            container_log = existing_logs.get(container.name)
+            if container_log:
+                previous_states[container_log.id] = container_log.state
+            else:
+                container_log = ContainerLog.from_container(container)
+                previous_states[container_log.id] = None
+            container_log.state = STATE_TEARDOWN_IN_PROGRESS
+            container_logs.append(container_log)
+
+        db.bulk_update(container_logs, "container_logs")
+        return zip(containers, container_logs), previous_states
+
+    def cancel_delete(self, prepared, previous_states):
+        """Restores containers and their logs changed by
+        :meth:`prepare_delete`, in a single batch per collection.
+        """
+        db.bulk_persist([container for container, _ in prepared], "containers")
+
+        restored_logs = []
+        new_logs = []
+        for _, container_log in prepared:
+            state = previous_states[container_log.id]
+            if state is None:
+                new_logs.append(container_log)
+                continue
+            container_log.state = state
+            restored_logs.append(container_log)
+
+        db.bulk_update(restored_logs, "container_logs")
+        db.bulk_delete("container_logs", [
+            {"id": container_log.id} for container_log in new_logs
+        ])
 
+    def delete(self, container_type, number):
         #validate container type
         if container_type not in self.SCALE_ENABLE_CONTAINERS:
             abort(404)
@@ -574,7 +680,11 @@ class ScaleContainerResource(Resource):
         containers = db.search_from_table('containers', {'$and': [{'type': container_type}, {'state': STATE_SUCCESS}]})
 
         #select and arrange containers
-        nodes = db.search_from_table('nodes', {"$or": [{"type": "master"}, {"type": "worker"}]})
+        nodes = db.search_from_table(
+            'nodes',
+            {"$or": [{"type": "master"}, {"type": "worker"}]},
+            NODE_ID_PROJECTION,
+        )
         node_id_pool = self.make_node_id_pool(nodes)
 
         containers_reorder = []
@@ -587,12 +697,22 @@ class ScaleContainerResource(Resource):
             if len(containers_reorder) == number:
                 break
 
-        #get a genatator of delete_object
-        dg = self.delete_obj_genarator(app, containers_reorder)
-        #start backgroung delete oparation
-        self.delscaleosorus(dg)
+        if not scheduler.can_accept(number):
+            return busy_response()
+
+        prepared, previous_states = self.prepare_delete(containers_reorder)
+        try:
+            jobs = scheduler.submit_many([
+                container_job("teardown", container, container_log.teardown_log)
+                for container, container_log in prepared
+            ])
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            self.cancel_delete(prepared, previous_states)
+            return busy_response()
 
         return {
             "status": 202,
             "message": 'deleting {} {}'.format(number, container_type),
+            "jobs": [job.id for job in jobs],
         }, 202
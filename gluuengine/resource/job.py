@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+from flask import url_for
+from flask_restful import Resource
+
+from ..scheduler import scheduler
+
+#: Number of seconds clients are asked to wait when deployment queue is full
+RETRY_AFTER = 30
+
+
+def busy_response():
+    """Response of a request rejected due to full deployment queue.
+    """
+    return {
+        "status": 429,
+        "message": "deployment queue is full; please retry later",
+    }, 429, {"Retry-After": str(RETRY_AFTER)}
+
+
+def job_url(job):
+    return url_for("job", job_id=job.id, _external=True)
+
+
+class JobListResource(Resource):
+    def get(self):
+        # jobs are shared by all processes via database
+        return {
+            "stats": scheduler.stats(),
+            "jobs": [job.as_dict() for job in scheduler.jobs()],
+        }
+
+
+class JobResource(Resource):
+    def get(self, job_id):
+        job = scheduler.get(job_id)
+        if not job:
+            return {"status": 404, "message": "Job not found"}, 404
+        return job.as_dict()
@@ -157,14 +157,14 @@ class LicenseKeyResource(Resource):
 
                 for container in containers:
                     container.state = STATE_SUCCESS
-                    db.update(container.id, container, "containers")
+                    db.set_fields("containers", {"id": container.id},
+                                  {"state": container.state})
                     mc.ssh(
                         worker_node.name,
                         "docker restart {}".format(container.cid),
                     )
-                    weave.dns_add(container.cid, container.hostname)
-                    weave.dns_add(
-                        container.cid,
-                        "{}.weave.local".format("oxauth"),
-                    )
+                    weave.dns_add_many([
+                        (container.cid, container.hostname),
+                        (container.cid, "{}.weave.local".format("oxauth")),
+                    ])
                 distribute_cluster_data(app, worker_node)
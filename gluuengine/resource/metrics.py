@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+from flask_restful import Resource
+
+from ..dbmonitor import db_metrics
+
+
+class DatabaseMetricsResource(Resource):
+    def get(self):
+        # metrics are collected per worker process
+        return db_metrics.as_dict()
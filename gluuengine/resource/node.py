@@ -12,20 +12,25 @@ from ..reqparser import NodeReq
 from ..model import DiscoveryNode
 from ..model import MasterNode
 from ..model import WorkerNode
-from ..node import DeployDiscoveryNode
-from ..node import DeployMasterNode
-from ..node import DeployWorkerNode
+from ..node import Discovery
+from ..node import node_job
 from ..machine import Machine
+from ..machine import node_health
 from ..database import db
+from ..scheduler import scheduler
+from ..scheduler import SchedulerBusy
+from ..serializer import projection
 from ..utils import as_boolean
+from .job import busy_response
+from .job import job_url
+from .pagination import list_response
 
 # TODO: put it in config
 NODE_TYPES = ('master', 'worker', 'discovery',)
 DISCOVERY_PORT = '8500'
 
-
-class Discovery(object):
-    pass
+#: Fields loaded by list endpoint
+NODE_PROJECTION = projection([DiscoveryNode, MasterNode, WorkerNode])
 
 
 #TODO this is very ugly code now
@@ -42,12 +47,7 @@ class CreateNodeResource(Resource):
                 "message": "Node type is not supported",
             }, 404
 
-        try:
-            dcv_node = db.search_from_table(
-                "nodes", {"type": "discovery"}
-            )[0]
-        except IndexError:
-            dcv_node = None
+        dcv_node = db.get_discovery_node()
 
         if node_type == 'discovery' and dcv_node:
             return {
@@ -83,6 +83,9 @@ class CreateNodeResource(Resource):
                 "params": errors,
             }, 400
 
+        if not scheduler.can_accept():
+            return busy_response()
+
         if node_type != 'discovery':
             discovery = Discovery()
             discovery.ip = self.machine.ip(dcv_node.name)
@@ -91,14 +94,12 @@ class CreateNodeResource(Resource):
         if node_type == 'discovery':
             node = DiscoveryNode(data)
             db.persist(node, 'nodes')
-            ddn = DeployDiscoveryNode(node, app)
-            ddn.deploy()
+            job_spec = node_job(node)
 
         if node_type == 'master':
             node = MasterNode(data)
             db.persist(node, 'nodes')
-            dmn = DeployMasterNode(node, discovery, app)
-            dmn.deploy()
+            job_spec = node_job(node, discovery)
 
         if node_type == 'worker':
             if as_boolean(app.config["ENABLE_LICENSE"]):
@@ -135,19 +136,39 @@ class CreateNodeResource(Resource):
 
             node = WorkerNode(data)
             db.persist(node, 'nodes')
-            dwn = DeployWorkerNode(node, discovery, app)
-            dwn.deploy()
+            job_spec = node_job(node, discovery)
+
+        try:
+            job = scheduler.submit(*job_spec)
+        except SchedulerBusy:
+            # queue is filled by other requests in the meantime
+            db.delete(node.id, 'nodes')
+            return busy_response()
 
         headers = {
             "Location": url_for("node", node_name=node.name),
+            "X-Deploy-Job": job_url(job),
         }
         return node.as_dict(), 202, headers
 
 
 class NodeListResource(Resource):
     def get(self):
-        nodes = db.all("nodes")
-        return [node.as_dict() for node in nodes]
+        return list_response("nodes", projection=NODE_PROJECTION)
+
+
+class NodeHealthResource(Resource):
+    def get(self):
+        # refresh stale table, e.g. when health poller is not running
+        if not node_health.fresh:
+            try:
+                node_health.update(Machine().ls())
+            except RuntimeError as exc:
+                return {
+                    "status": 500,
+                    "message": str(exc),
+                }, 500
+        return sorted(node_health.all(), key=lambda health: health["name"])
 
 
 class NodeResource(Resource):
@@ -190,7 +211,10 @@ class NodeResource(Resource):
                 "message": "master node still running"
             }, 403
 
-        running = self.machine.is_running(node.name)
+        running = node_health.is_running(node.name)
+        if running is None:
+            running = self.machine.is_running(node.name)
+
         if running:
             try:
                 self.machine.rm(node.name)
@@ -207,8 +231,6 @@ class NodeResource(Resource):
         return {}, 204
 
     def put(self, node_name):
-        app = current_app._get_current_object()
-
         nodes = db.search_from_table('nodes', {'name': node_name})
         if nodes:
             node = nodes[0]
@@ -218,27 +240,21 @@ class NodeResource(Resource):
                 "message": "node not found"
             }, 404
 
-        try:
-            dcv_node = db.search_from_table(
-                "nodes", {"type": "master"}
-            )[0]
-        except IndexError:
-            dcv_node = None
+        dcv_node = db.get_master_node()
 
+        discovery = None
         if node.type != 'discovery':
             discovery = Discovery()
             discovery.ip = self.machine.ip(dcv_node.name)
             discovery.port = DISCOVERY_PORT
 
-        if node.type == 'discovery':
-            dn = DeployDiscoveryNode(node, app)
-        if node.type == 'master':
-            dn = DeployMasterNode(node, discovery, app)
-        if node.type == 'worker':
-            dn = DeployWorkerNode(node, discovery, app)
+        try:
+            job = scheduler.submit(*node_job(node, discovery))
+        except SchedulerBusy:
+            return busy_response()
 
-        dn.deploy()
         headers = {
             "Location": url_for("node", node_name=node.name),
+            "X-Deploy-Job": job_url(job),
         }
         return node.as_dict(), 202, headers
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import base64
+
+from flask import current_app
+from flask import json
+from flask import request
+from flask import Response
+from flask import stream_with_context
+
+from ..database import db
+
+#: Mimetype of streamed (newline-delimited JSON) responses
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+#: Name of response header which carries continuation token
+NEXT_PAGE_HEADER = "X-Next-Page-Token"
+
+
+def encode_page_token(last_id):
+    """Encodes ``id`` of last object in a page into continuation token.
+
+    :param last_id: ``id`` of last object in a page.
+    :returns: An opaque continuation token.
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}))
+
+
+def decode_page_token(token):
+    """Decodes continuation token.
+
+    :param token: Continuation token generated by
+                  :func:`encode_page_token`.
+    :returns: ``id`` of last object in previous page.
+    :raises: ``ValueError`` if token is invalid.
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(str(token)))["after"]
+    except (TypeError, ValueError, KeyError):
+        raise ValueError("invalid page token")
+
+
+def wants_stream():
+    """Checks whether client asks for streamed response, either by
+    ``?stream=1`` or ``Accept: application/x-ndjson``.
+    """
+    if request.args.get("stream") in ("1", "true",):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def list_response(table_name, condition=None, projection=None,
+                  formatter=None):
+    """Builds response of list endpoints.
+
+    By default all objects are returned. If ``?limit=N`` is given, at most
+    ``N`` objects are returned and continuation token of next page
+    (if any) is sent in ``X-Next-Page-Token`` header; the token is passed
+    back as ``?after=<token>``. Streamed clients receive newline-delimited
+    JSON rows straight from database cursor.
+
+    :param table_name: Name of the collection.
+    :param condition: Query condition.
+    :param projection: Query projection (if any).
+    :param formatter: A callable to transform each object into ``dict``
+                      (by default uses ``as_dict``).
+    """
+    formatter = formatter or (lambda obj: obj.as_dict())
+
+    if wants_stream():
+        def generate():
+            for obj in db.iter_from_table(table_name, condition, projection):
+                yield json.dumps(formatter(obj)) + "\n"
+        return Response(stream_with_context(generate()),
+                        mimetype=NDJSON_MIMETYPE)
+
+    if "limit" not in request.args:
+        return [
+            formatter(obj) for obj in
+            db.search_from_table(table_name, condition or {}, projection)
+        ]
+
+    max_limit = current_app.config["PAGINATION_MAX_LIMIT"]
+    try:
+        limit = int(request.args["limit"])
+        if not 0 < limit <= max_limit:
+            raise ValueError
+    except ValueError:
+        return {
+            "status": 400,
+            "message": "limit must be a number between 1 and {}".format(max_limit),
+        }, 400
+
+    after = None
+    if request.args.get("after"):
+        try:
+            after = decode_page_token(request.args["after"])
+        except ValueError as exc:
+            return {"status": 400, "message": str(exc)}, 400
+
+    items, last_id = db.paginate(table_name, condition, projection,
+                                 limit=limit, after=after)
+
+    headers = {}
+    if last_id is not None:
+        headers[NEXT_PAGE_HEADER] = encode_page_token(last_id)
+    return [formatter(obj) for obj in items], 200, headers
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import logging
+import threading
+import time
+
+from .database import db
+from .model import Job
+from .model import STATE_IN_PROGRESS
+from .model.job import JOB_QUEUED
+from .model.job import JOB_RUNNING
+from .model.job import JOB_FINISHED
+from .model.job import JOB_FAILED
+
+#: Default number of jobs running concurrently
+DEFAULT_MAX_WORKERS = 6
+
+#: Default number of jobs waiting for a worker
+DEFAULT_QUEUE_SIZE = 50
+
+#: Default number of jobs running concurrently against a single node
+DEFAULT_KEY_LIMIT = 2
+
+#: Default number of jobs running concurrently within a group
+#: (e.g. container setups of a cluster)
+DEFAULT_GROUP_LIMIT = 4
+
+#: Default number of finished jobs kept for inspection
+DEFAULT_HISTORY_SIZE = 100
+
+#: Default interval (in seconds) of polling queued jobs
+DEFAULT_POLL_INTERVAL = 1
+
+#: Container fields matching concurrency key and group of jobs
+_CONTAINER_FIELDS = {"key": "node_id", "group": "cluster_id"}
+
+
+def _setup_target(job):
+    # name of container set up (or resumed) by the job, if any
+    if job.type == "container" and job.args["action"] != "teardown":
+        return job.args["container"]["name"]
+
+
+class SchedulerBusy(Exception):
+    """Raised when the queue can't take more jobs.
+    """
+
+
+class DeploymentScheduler(object):
+    """Runs long-running deployment jobs (node deployment, container setup
+    and teardown) in a bounded pool of worker threads.
+
+    Jobs are stored in ``jobs`` collection, hence any process may submit
+    and inspect them, while a single dispatcher process (the one claiming
+    ``scheduler.run`` runfile) runs them. A job is described by its type and
+    arguments; the function which runs jobs of each type is registered
+    by :meth:`register`.
+
+    Submitting more jobs than ``queue_size`` allows raises
+    :class:`SchedulerBusy` so callers can push back on clients.
+    Jobs of the same key are started only if less than ``key_limit``
+    deployments are in progress against it (see :meth:`in_flight`), hence
+    a single node isn't hammered by concurrent deployments while jobs of
+    other nodes keep going. Likewise, jobs of the same group are capped by
+    ``group_limit``; waiting jobs are started as soon as a slot is freed,
+    i.e. deployments proceed in waves.
+
+    :param max_workers: Number of jobs running concurrently.
+    :param queue_size: Number of jobs waiting for a worker.
+    :param key_limit: Number of jobs running concurrently per key.
+    :param group_limit: Number of jobs running concurrently per group.
+    :param history_size: Number of finished jobs kept for inspection.
+    :param poll_interval: Interval (in seconds) of polling queued jobs.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE,
+                 key_limit=DEFAULT_KEY_LIMIT,
+                 group_limit=DEFAULT_GROUP_LIMIT,
+                 history_size=DEFAULT_HISTORY_SIZE,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.key_limit = key_limit
+        self.group_limit = group_limit
+        self.history_size = history_size
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.app = None
+        self._handlers = {}
+        self._recovers = {}
+        self._active = 0
+        self._dispatcher = None
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def init_app(self, app):
+        """Configures the scheduler from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        with self._cond:
+            self.max_workers = app.config.get(
+                "DEPLOY_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+            self.queue_size = app.config.get(
+                "DEPLOY_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+            self.key_limit = app.config.get(
+                "DEPLOY_NODE_CONCURRENCY", DEFAULT_KEY_LIMIT)
+            self.group_limit = app.config.get(
+                "DEPLOY_CLUSTER_CONCURRENCY", DEFAULT_GROUP_LIMIT)
+            self.history_size = app.config.get(
+                "DEPLOY_JOB_HISTORY", DEFAULT_HISTORY_SIZE)
+            self.poll_interval = app.config.get(
+                "DEPLOY_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+
+    def register(self, type_, func, recover=None):
+        """Registers functions of a job type.
+
+        :param type_: Type of the job.
+        :param func: A callable which runs the job; it receives the app
+                     and job's arguments.
+        :param recover: A callable (if any) which cleans up after a job
+                        interrupted by a dead dispatcher; it receives
+                        the app and job's arguments.
+        """
+        self._handlers[type_] = func
+        if recover is not None:
+            self._recovers[type_] = recover
+
+    def can_accept(self, number=1):
+        """Checks whether queue has room for given number of jobs.
+
+        Must be called within app context.
+
+        :param number: Number of jobs.
+        """
+        return self._queued() + number <= self.queue_size
+
+    def submit(self, name, type_, args=None, key=None, group=None):
+        """Queues a job.
+
+        Must be called within app context.
+
+        :param name: Human-readable name of the job.
+        :param type_: Type of the job.
+        :param args: A ``dict`` of job's arguments.
+        :param key: Concurrency key of the job (if any).
+        :param group: Concurrency group of the job (if any).
+        :returns: An instance of :class:`~gluuengine.model.Job`.
+        :raises: :class:`SchedulerBusy` if the queue is full.
+        """
+        return self.submit_many([(name, type_, args, key, group)])[0]
+
+    def submit_many(self, specs):
+        """Queues jobs; either all or none of them are queued.
+
+        Must be called within app context.
+
+        :param specs: A list of ``(name, type_, args, key, group)`` tuple.
+        :returns: A list of :class:`~gluuengine.model.Job`.
+        :raises: :class:`SchedulerBusy` if the queue is full.
+        """
+        jobs = [Job(*spec) for spec in specs]
+
+        queued = self._queued()
+        if queued + len(jobs) > self.queue_size:
+            raise SchedulerBusy(
+                "deployment queue is full ({} jobs waiting)".format(queued)
+            )
+
+        db.bulk_persist(jobs, "jobs")
+
+        # dispatcher in current process (if any) needn't wait for next poll
+        with self._cond:
+            self._cond.notify_all()
+        return jobs
+
+    def get(self, job_id):
+        """Gets a job.
+
+        Must be called within app context.
+
+        :param job_id: ID of the job.
+        :returns: An instance of :class:`~gluuengine.model.Job` or ``None``.
+        """
+        return db.get(job_id, "jobs")
+
+    def jobs(self):
+        """Lists known jobs (queued, running, and recently finished),
+        oldest first.
+
+        Must be called within app context.
+
+        :returns: A list of :class:`~gluuengine.model.Job`.
+        """
+        return sorted(db.all("jobs"), key=lambda job: job.created_at)
+
+    def in_flight(self, field, value):
+        """Counts deployments in progress against a node or a cluster,
+        including those started by other processes.
+
+        Must be called within app context.
+
+        :param field: ``key`` (ID of the node) or ``group``
+                      (ID of the cluster).
+        :param value: ID of the node or cluster.
+        :returns: Number of deployments in progress.
+        """
+        jobs = db.search_from_table("jobs", {
+            field: value, "state": {"$in": [JOB_QUEUED, JOB_RUNNING]},
+        })
+
+        # container setups are counted from containers collection,
+        # except those still waiting in queue
+        queued = [
+            _setup_target(job) for job in jobs
+            if job.state == JOB_QUEUED and _setup_target(job)
+        ]
+        count = db.count_from_table("containers", {
+            _CONTAINER_FIELDS[field]: value,
+            "state": STATE_IN_PROGRESS,
+            "name": {"$nin": queued},
+        })
+
+        # other deployments, i.e. node deployments and container teardowns
+        count += sum(
+            1 for job in jobs
+            if job.state == JOB_RUNNING and not _setup_target(job)
+        )
+        return count
+
+    def stats(self):
+        """Gets current load of the scheduler.
+
+        Must be called within app context.
+
+        :returns: A ``dict`` of queue and workers stats.
+        """
+        return {
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "node_concurrency": self.key_limit,
+            "cluster_concurrency": self.group_limit,
+            "queued": self._queued(),
+            "running": db.count_from_table("jobs", {"state": JOB_RUNNING}),
+        }
+
+    def start(self, app):
+        """Starts dispatching queued jobs in current process.
+
+        Only a single process may run the dispatcher; jobs left running
+        by previous dispatcher are marked as failed.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        with self._cond:
+            if self._dispatcher is not None:
+                return
+            self.app = app
+            self._stopped = False
+
+            with self.app.app_context():
+                self._recover()
+
+            self._dispatcher = threading.Thread(target=self._dispatch)
+            self._dispatcher.daemon = True
+            self._dispatcher.start()
+
+    def stop(self):
+        """Stops dispatching queued jobs; running jobs are not interrupted.
+        """
+        with self._cond:
+            dispatcher, self._dispatcher = self._dispatcher, None
+            self._stopped = True
+            self._cond.notify_all()
+
+        if dispatcher is not None:
+            dispatcher.join()
+
+    def _queued(self):
+        return db.count_from_table("jobs", {"state": JOB_QUEUED})
+
+    def _recover(self):
+        for job in db.search_from_table("jobs", {"state": JOB_RUNNING}):
+            self.logger.warn("job {} ({}) was interrupted".format(job.id, job.name))
+            recover = self._recovers.get(job.type)
+            if recover is not None:
+                try:
+                    recover(self.app, job.args)
+                except Exception:
+                    self.logger.exception("unable to recover job {}".format(job.id))
+            self._finish(job, JOB_FAILED, "interrupted")
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if self._active < self.max_workers:
+                    try:
+                        with self.app.app_context():
+                            self._start_jobs()
+                    except Exception:
+                        self.logger.exception("unable to dispatch jobs")
+
+                # jobs submitted by other processes are picked up
+                # on next poll
+                self._cond.wait(self.poll_interval)
+
+    def _has_slot(self, job):
+        if job.key is not None and \
+                self.in_flight("key", job.key) >= self.key_limit:
+            return False
+        if job.group is not None and \
+                self.in_flight("group", job.group) >= self.group_limit:
+            return False
+        return True
+
+    def _start_jobs(self):
+        # the oldest jobs whose key and group have free slot; jobs of busy
+        # nodes don't block jobs of other nodes
+        pending = sorted(db.search_from_table("jobs", {"state": JOB_QUEUED}),
+                         key=lambda job: job.created_at)
+
+        for job in pending:
+            if self._active >= self.max_workers:
+                return
+            if not self._has_slot(job):
+                continue
+
+            # only a queued job is started, hence a job is never run twice
+            job.state = JOB_RUNNING
+            job.started_at = time.time()
+            result = db.set_fields("jobs", {"id": job.id, "state": JOB_QUEUED}, {
+                "state": job.state, "started_at": job.started_at,
+            })
+            if not result.matched_count:
+                continue
+
+            self._active += 1
+            worker = threading.Thread(target=self._work, args=(job,))
+            worker.daemon = True
+            worker.start()
+
+    def _work(self, job):
+        try:
+            self._handlers[job.type](self.app, job.args)
+            state = JOB_FINISHED
+            error = ""
+        except Exception as exc:
+            self.logger.exception("job {} ({}) failed".format(job.id, job.name))
+            state = JOB_FAILED
+            error = str(exc)
+
+        with self._cond:
+            try:
+                with self.app.app_context():
+                    self._finish(job, state, error)
+                    self._trim_history()
+            except Exception:
+                self.logger.exception("unable to save job {}".format(job.id))
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _finish(self, job, state, error=""):
+        job.state = state
+        job.error = error
+        job.finished_at = time.time()
+        db.set_fields("jobs", {"id": job.id}, {
+            "state": job.state,
+            "error": job.error,
+            "finished_at": job.finished_at,
+        })
+
+    def _trim_history(self):
+        finished = sorted(
+            db.search_from_table("jobs", {"state": {"$in": [JOB_FINISHED, JOB_FAILED]}}),
+            key=lambda job: job.finished_at,
+        )
+        db.bulk_delete("jobs", [
+            {"id": job.id}
+            for job in finished[:max(len(finished) - self.history_size, 0)]
+        ])
+
+
+#: Scheduler shared by resources; jobs are run by the dispatcher process
+scheduler = DeploymentScheduler()
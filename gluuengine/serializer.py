@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import copy
+import threading
+
+from werkzeug.utils import import_string
+
+#: Key of the document that stores dotted path of model's class;
+#: compatible with documents written by ``jsonpickle``
+CLASS_KEY = "py/object"
+
+# a mapping of dotted class path and the class
+_registry = {}
+
+# a mapping of class and its default (persistent) attributes
+_defaults = {}
+_defaults_lock = threading.Lock()
+
+
+def class_path(cls):
+    """Gets dotted path of a class.
+
+    :param cls: Model class.
+    :returns: Dotted path, e.g. ``gluuengine.model.node.MasterNode``.
+    """
+    return "{}.{}".format(cls.__module__, cls.__name__)
+
+
+def register(cls):
+    """Adds model class to registry.
+
+    :param cls: Model class.
+    :returns: The class itself.
+    """
+    _registry[class_path(cls)] = cls
+    return cls
+
+
+def get_class(path):
+    """Gets model class from registry.
+
+    :param path: Dotted path of the class.
+    :returns: Model class.
+    """
+    cls = _registry.get(path)
+    if cls is None:
+        # model module hasn't been imported yet
+        cls = register(import_string(path))
+    return cls
+
+
+class ModelMeta(type):
+    """Metaclass which registers every model class upon definition.
+    """
+    def __init__(cls, name, bases, attrs):
+        super(ModelMeta, cls).__init__(name, bases, attrs)
+        register(cls)
+
+
+def encode_value(value):
+    """Converts attribute value into its document form.
+
+    :param value: Attribute value (may contain model objects).
+    :returns: Value ready to be stored in database.
+    """
+    if isinstance(value, dict):
+        return {k: encode_value(v) for k, v in value.iteritems()}
+    if isinstance(value, (list, tuple, set)):
+        return [encode_value(v) for v in value]
+    if isinstance(type(value), ModelMeta):
+        return dump(value)
+    return value
+
+
+def _transient_fields(cls):
+    return getattr(cls, "transient_fields", ())
+
+
+def _get_defaults(cls):
+    defaults = _defaults.get(cls)
+    if defaults is None:
+        # instantiating some models is expensive (e.g. generating keys),
+        # hence the defaults are computed once per class
+        declared = getattr(cls, "persistent_fields", None)
+        transient = _transient_fields(cls)
+        defaults = {
+            k: v for k, v in cls().__dict__.iteritems()
+            if k not in transient and (declared is None or k in declared)
+        }
+        for k in declared or ():
+            defaults.setdefault(k, None)
+        with _defaults_lock:
+            _defaults[cls] = defaults
+    return defaults
+
+
+def persistent_fields(cls):
+    """Gets names of model's attributes stored in database.
+
+    These are ``persistent_fields`` declared by the model, or attributes
+    set by its constructor otherwise. Attributes set elsewhere (ad-hoc)
+    are neither stored nor loaded.
+
+    :param cls: Model class.
+    :returns: A ``dict`` of field names and their defaults.
+    """
+    return _get_defaults(cls)
+
+
+def dump(obj):
+    """Converts model object into a document of its persistent fields.
+
+    :param obj: Model object.
+    :returns: A ``dict`` ready to be stored in database.
+    """
+    fields = persistent_fields(type(obj))
+    data = {
+        k: encode_value(v) for k, v in obj.__dict__.iteritems()
+        if k in fields
+    }
+    data[CLASS_KEY] = class_path(type(obj))
+    return data
+
+
+def load(data):
+    """Converts document into model object.
+
+    Attributes missing from the document (e.g. attributes introduced
+    after the document was stored) are set to the class's defaults;
+    stored attributes which aren't persistent fields of the class
+    are ignored.
+
+    :param data: A ``dict`` of document.
+    :returns: Model object.
+    """
+    cls = get_class(data[CLASS_KEY])
+    fields = persistent_fields(cls)
+
+    state = {
+        k: copy.deepcopy(v) if isinstance(v, (dict, list)) else v
+        for k, v in fields.iteritems()
+    }
+    for k, v in data.iteritems():
+        if k not in fields:
+            continue
+        state[k] = load(v) if isinstance(v, dict) and CLASS_KEY in v else v
+
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+
+def projection(classes, extra_fields=()):
+    """Builds a query projection of models' resource fields.
+
+    :param classes: A list of model classes stored in the collection.
+    :param extra_fields: Additional fields to include.
+    :returns: A ``dict`` suitable for ``projection`` argument of a query.
+    """
+    fields = set(extra_fields)
+    for cls in classes:
+        fields.update(cls.resource_fields)
+
+    spec = dict.fromkeys(fields, True)
+    spec[CLASS_KEY] = True
+    spec["_id"] = False
+    return spec
+
+
+class ModelView(object):
+    """Read-only view of a partially loaded document.
+
+    Only projected attributes are available; projected attributes missing
+    from the document are set to the class's defaults.
+
+    :param data: A ``dict`` of projected document.
+    :param fields: Names of projected fields.
+    """
+    __slots__ = ("model_class", "_state",)
+
+    def __init__(self, data, fields):
+        cls = get_class(data[CLASS_KEY])
+        defaults = _get_defaults(cls)
+
+        state = {
+            k: copy.deepcopy(defaults[k]) for k in fields
+            if k in defaults
+        }
+        for k, v in data.iteritems():
+            if k in (CLASS_KEY, "_id",):
+                continue
+            state[k] = load(v) if isinstance(v, dict) and CLASS_KEY in v else v
+
+        object.__setattr__(self, "model_class", cls)
+        object.__setattr__(self, "_state", state)
+
+    def __getattr__(self, name):
+        try:
+            return self._state[name]
+        except KeyError:
+            raise AttributeError(
+                "{!r} is not loaded in view of {}".format(
+                    name, self.model_class.__name__,
+                )
+            )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("cannot modify read-only view")
+
+    def as_dict(self):
+        """Transforms into a ``dict`` of model's resource attributes.
+
+        :returns: A ``dict`` of model's resource attributes.
+        """
+        fields = self.model_class.resource_fields
+        return {
+            k: v for k, v in self._state.iteritems()
+            if k in fields
+        }
@@ -18,6 +18,8 @@ class Config(object):
 
     DATA_DIR = os.environ.get("DATA_DIR", "/var/lib/gluuengine")
 
+    # ``mongodb://`` or ``sqlite://`` (embedded database for single-host
+    # deployment, e.g. ``sqlite:////var/lib/gluuengine/db/gluuengine.db``)
     DATABASE_URI = os.environ.get(
         "DATABASE_URI",
         "mongodb://mongo:27017/gluuengine",
@@ -61,6 +63,74 @@ class Config(object):
     GLUU_IMAGE_TAG = os.environ.get("GLUU_IMAGE_TAG", "latest")
     ENABLE_LICENSE = True
 
+    # maximum number of idle docker API clients kept per endpoint
+    DOCKER_CLIENT_POOL_SIZE = 10
+    # idle docker API clients are closed after given seconds
+    DOCKER_CLIENT_IDLE_TIMEOUT = 300
+
+    # compiled jinja templates shared by all worker processes
+    JINJA_BYTECODE_CACHE_DIR = os.path.join(DATA_DIR, "cache", "jinja")
+
+    # interval (in seconds) of polling nodes health via docker-machine
+    NODE_HEALTH_INTERVAL = 10
+    # node health table written by the (single) poller and read by
+    # all gunicorn workers
+    NODE_HEALTH_PATH = os.path.join(DATA_DIR, "node_health.json")
+
+    # number of node status checks (docker-machine calls) running
+    # concurrently per process
+    NODE_STATUS_WORKERS = 6
+
+    # create missing database indexes when app is created
+    DATABASE_ENSURE_INDEXES = True
+
+    # maximum number of MongoDB connections per process; each gunicorn
+    # worker runs ``workers`` request threads plus reactor threads
+    DATABASE_MAX_POOL_SIZE = 50
+    # milliseconds a thread waits for a free connection before failing
+    DATABASE_WAIT_QUEUE_TIMEOUT_MS = 10000
+    # milliseconds to wait for an available MongoDB server
+    DATABASE_SERVER_SELECTION_TIMEOUT_MS = 10000
+    DATABASE_CONNECT_TIMEOUT_MS = 5000
+    DATABASE_SOCKET_TIMEOUT_MS = None
+    # read preference of list endpoints, e.g. ``secondaryPreferred``
+    DATABASE_LIST_READ_PREFERENCE = "primary"
+    # queries taking longer than given milliseconds are reported as slow
+    DATABASE_SLOW_QUERY_MS = 100
+
+    # maximum number of objects per page in list endpoints
+    PAGINATION_MAX_LIMIT = 500
+
+    # cluster, master and discovery nodes are cached for given seconds
+    SINGLETON_CACHE_TTL = 30
+    # invalidate cached cluster and nodes via MongoDB change streams
+    # (requires replica set); when disabled, changes made by other
+    # gunicorn workers are seen after SINGLETON_CACHE_TTL seconds at most
+    SINGLETON_CACHE_WATCH = False
+
+    # number of deployment jobs (node deployment, container setup and
+    # teardown) running concurrently; jobs are stored in database and
+    # run by a single dispatcher process
+    DEPLOY_MAX_WORKERS = 6
+    # number of deployment jobs waiting for a worker; requests are
+    # rejected with 429 when the queue is full
+    DEPLOY_QUEUE_SIZE = 50
+    # number of deployment jobs running concurrently against a single node
+    DEPLOY_NODE_CONCURRENCY = 2
+    # number of container setups and teardowns running concurrently
+    # in the cluster; the rest wait in queue
+    DEPLOY_CLUSTER_CONCURRENCY = 4
+    # number of finished deployment jobs listed by ``/jobs``
+    DEPLOY_JOB_HISTORY = 100
+    # interval (in seconds) of polling jobs submitted by other processes
+    DEPLOY_POLL_INTERVAL = 1
+    # start the dispatcher in the first process serving a request, unless
+    # other process (e.g. gunicorn worker launched with ``gsettings.py``)
+    # has claimed it already
+    DEPLOY_DISPATCHER_AUTOSTART = True
+    # number of independent setup steps of a container running concurrently
+    SETUP_STEP_WORKERS = 3
+
 
 class ProdConfig(Config):
     """Production configuration.
@@ -79,6 +149,9 @@ class DevConfig(Config):
 class TestConfig(Config):
     TESTING = True
     DEBUG = True
-    DATABASE_URI = os.environ.get("DATABASE_URI", "mongodb://mongo:27017/gluuengine-test")
+    DATABASE_URI = os.environ.get("DATABASE_URI", "sqlite:///:memory:")
     MONGO_URI = DATABASE_URI
     ENABLE_LICENSE = False
+    DATABASE_ENSURE_INDEXES = False
+    NODE_HEALTH_PATH = ""
+    DEPLOY_DISPATCHER_AUTOSTART = False
@@ -3,48 +3,54 @@
 #
 # All rights reserved.
 
-import codecs
 import os.path
 import shutil
 import tempfile
+import threading
 import time
 import uuid
-
-from jinja2 import Environment
-from jinja2 import PackageLoader
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from ..database import db
 from ..log import create_file_logger
 from ..errors import DockerExecError
+from ..errors import ProbeTimeoutError
 from ..machine import Machine
+from ..probe import http_ok
+from ..probe import local_file_exists
+from ..probe import supervisor_pids
+from ..probe import supervisor_running
+from ..probe import wait_for
+from ..templating import templates
 from ..dockerclient import Docker
 from ..weave import Weave
+from .steps import DEFAULT_MAX_WORKERS
+from .steps import run_steps
 
 
 class BaseSetup(object):
-    supervisor_reload_delay = 10
+    # number of seconds to wait for supervisord programs after reload
+    supervisor_ready_timeout = 120
 
     def __init__(self, container, cluster, app, logger=None):
         self.logger = logger or create_file_logger()
         self.app = app
         self.build_dir = tempfile.mkdtemp()
         self.container = container
+        # render bundles are per thread as setup steps may run concurrently
+        self._local = threading.local()
+        self._weave = None
+        self.step_timings = {}
         with self.app.app_context():
             self.node = db.get(self.container.node_id, "nodes")
         self.cluster = cluster
-        self.jinja_env = Environment(
-            loader=PackageLoader("gluuengine", "templates")
-        )
+        self.jinja_env = templates.jinja_env
         self.template_dir = self.app.config["TEMPLATES_DIR"]
         self.machine = Machine()
 
         with self.app.app_context():
-            try:
-                master_node = db.search_from_table(
-                    "nodes", {"type": "master"},
-                )[0]
-            except IndexError:  # pragma: no cover
-                master_node = self.node
+            master_node = db.get_master_node() or self.node
 
         self.docker = Docker(
             self.machine.config(self.node.name),
@@ -56,6 +62,52 @@ class BaseSetup(object):
         """
         raise NotImplementedError("setup method must be overriden")
 
+    def run_steps(self, steps):
+        """Runs setup steps; independent steps run concurrently.
+
+        Steps checkpointed by previous (failed) attempt are skipped.
+
+        :param steps: A list of :class:`~gluuengine.setup.steps.Step`.
+        """
+        start = time.time()
+        self.step_timings = run_steps(
+            steps,
+            max_workers=self.app.config.get("SETUP_STEP_WORKERS", DEFAULT_MAX_WORKERS),
+            logger=self.logger,
+            done=self.container.setup_steps,
+            on_finished=self.checkpoint,
+        )
+        self.logger.info("{} setup steps are finished ({:.2f} seconds); {}".format(
+            len(steps), time.time() - start,
+            ", ".join("{}={:.2f}s".format(name, elapsed)
+                      for name, elapsed in self.step_timings.items()),
+        ))
+
+    def checkpoint(self, step):
+        """Saves finished setup step, so failed setup can be resumed
+        from where it stopped.
+
+        :param step: An instance of :class:`~gluuengine.setup.steps.Step`.
+        """
+        if not step.checkpoint or step.name in self.container.setup_steps:
+            return
+
+        self.container.setup_steps.append(step.name)
+        with self.app.app_context():
+            db.set_fields(
+                "containers",
+                {"name": self.container.name},
+                {"setup_steps": self.container.setup_steps},
+            )
+
+    @property
+    def _bundle(self):
+        return getattr(self._local, "bundle", None)
+
+    @_bundle.setter
+    def _bundle(self, bundle):
+        self._local.bundle = bundle
+
     def after_setup(self):
         """Callback executed after ``setup`` taking place.
         """
@@ -70,25 +122,66 @@ class BaseSetup(object):
         except OSError:  # pragma: no cover
             pass
 
-    def render_template(self, src, dest, ctx=None):
+    def render_template(self, src, dest, ctx=None, mode=None):
         """Renders non-jinja template.
 
         :param src: Relative path to template.
+        :param dest: Destination path in container.
         :param ctx: Context that will be populated into template.
-        :returns: String of rendered template.
+        :param mode: Permission bits of rendered file (if any).
         """
         ctx = ctx or {}
         file_basename = os.path.basename(src)
-        local = os.path.join(self.build_dir, file_basename)
 
-        with codecs.open(src, "r", encoding="utf-8") as fp:
-            rendered_content = fp.read() % ctx
-
-        with codecs.open(local, "w", encoding="utf-8") as fp:
-            fp.write(rendered_content)
+        rendered_content = templates.read_template(src) % ctx
 
         self.logger.debug("rendering {}".format(file_basename))
-        self.docker.copy_to_container(self.container.cid, local, dest)
+        self.put_file(dest, rendered_content, mode)
+
+    @contextmanager
+    def render_bundle(self):
+        """Collects files written via :meth:`put_file` and uploads them
+        into the container as a single archive when the block exits.
+
+        Nested bundles are merged into the outermost one; bundles of
+        concurrent setup steps are kept separately.
+        """
+        if self._bundle is not None:
+            yield
+            return
+
+        self._bundle = OrderedDict()
+        try:
+            yield
+            files = [
+                (dest, content, mode)
+                for dest, (content, mode) in self._bundle.items()
+            ]
+        finally:
+            self._bundle = None
+        self._put_files(files)
+
+    def put_file(self, dest, content, mode=None):
+        """Writes file content into the container. If a render bundle
+        is active, the file is added to the bundle instead.
+
+        :param dest: Destination path in container.
+        :param content: File content.
+        :param mode: Permission bits of the file (if any).
+        """
+        if self._bundle is not None:
+            self._bundle[dest] = (content, mode)
+            return
+        self._put_files([(dest, content, mode)])
+
+    def _put_files(self, files):
+        if not files:
+            return
+
+        manifest = self.docker.put_files(self.container.cid, files)
+        self.logger.debug("copied {} into {}".format(
+            ", ".join(manifest), self.container.name,
+        ))
 
     def gen_cert(self, suffix, password, user, group, hostname):
         """Generates certificates.
@@ -112,7 +205,6 @@ class BaseSetup(object):
             "-passout", "pass:'{}'".format(password), "2048",
         ])
         keypass_cmd = '''sh -c "{}"'''.format(keypass_cmd)
-        self.docker.exec_cmd(self.container.cid, keypass_cmd)
 
         # command to create key file
         key_cmd = " ".join([
@@ -122,7 +214,6 @@ class BaseSetup(object):
             "-out", key,
         ])
         key_cmd = '''sh -c "{}"'''.format(key_cmd)
-        self.docker.exec_cmd(self.container.cid, key_cmd)
 
         # command to create csr file
         csr_cmd = " ".join([
@@ -139,7 +230,6 @@ class BaseSetup(object):
             )
         ])
         csr_cmd = '''sh -c "{}"'''.format(csr_cmd)
-        self.docker.exec_cmd(self.container.cid, csr_cmd)
 
         # command to create crt file
         crt_cmd = " ".join([
@@ -150,25 +240,18 @@ class BaseSetup(object):
             "-out", crt,
         ])
         crt_cmd = '''sh -c "{}"'''.format(crt_cmd)
-        self.docker.exec_cmd(self.container.cid, crt_cmd)
 
-        self.logger.debug("changing access to {} certificates".format(suffix))
-        self.docker.exec_cmd(
-            self.container.cid,
+        self.docker.exec_batch(self.container.cid, [
+            keypass_cmd,
+            key_cmd,
+            csr_cmd,
+            crt_cmd,
+            # changing access to certificates
             "chown {}:{} {}".format(user, group, key_with_password),
-        )
-        self.docker.exec_cmd(
-            self.container.cid,
             "chmod 700 {}".format(key_with_password),
-        )
-        self.docker.exec_cmd(
-            self.container.cid,
             "chown {}:{} {}".format(user, group, key),
-        )
-        self.docker.exec_cmd(
-            self.container.cid,
             "chmod 700 {}".format(key),
-        )
+        ])
 
     def change_cert_access(self, user, group):
         """Modifies ownership of certificates located under predefined path.
@@ -177,14 +260,10 @@ class BaseSetup(object):
         :param group: Group who owns the certificates.
         """
         self.logger.debug("changing access to {}".format(self.container.cert_folder))
-        self.docker.exec_cmd(
-            self.container.cid,
+        self.docker.exec_batch(self.container.cid, [
             "chown -R {}:{} {}".format(user, group, self.container.cert_folder),
-        )
-        self.docker.exec_cmd(
-            self.container.cid,
             "chmod -R 500 {}".format(self.container.cert_folder),
-        )
+        ])
 
     def get_template_path(self, path):
         """Gets absolute path to non-jinja template.
@@ -215,32 +294,42 @@ class BaseSetup(object):
         template = self.jinja_env.get_template(src)
         return template.render(**ctx)
 
-    def copy_rendered_jinja_template(self, src, dest, ctx=None):
+    def copy_rendered_jinja_template(self, src, dest, ctx=None, mode=None):
         """Copies rendered template to minion.
 
         :param src: Relative path to template.
         :param dest: Destination path in minion.
         :param ctx: Context that will be populated into template.
+        :param mode: Permission bits of rendered file (if any).
         """
         rendered_content = self.render_jinja_template(src, ctx)
         file_basename = os.path.basename(src)
-        local = os.path.join(self.build_dir, file_basename)
-
-        with codecs.open(local, "w", encoding="utf-8") as fp:
-            fp.write(rendered_content)
 
         self.logger.debug("rendering {}".format(file_basename))
-        self.docker.copy_to_container(self.container.cid, local, dest)
+        self.put_file(dest, rendered_content, mode)
 
     def reload_supervisor(self):
-        """Reloads supervisor.
+        """Reloads supervisor and waits until its programs are ready.
         """
-        self.logger.info(
-            "reloading supervisord; this may take "
-            "{} seconds or more".format(self.supervisor_reload_delay)
-        )
+        # programs are known to be restarted once their PIDs are changed
+        pids = supervisor_pids(self.docker, self.container.cid)
+
+        self.logger.info("reloading supervisord")
         self.docker.exec_cmd(self.container.cid, "supervisorctl reload")
-        time.sleep(self.supervisor_reload_delay)
+
+        elapsed = wait_for(
+            supervisor_running(self.docker, self.container.cid, pids),
+            timeout=self.supervisor_ready_timeout,
+            name="supervisord programs in {}".format(self.container.name),
+        )
+        self.logger.info("supervisord programs are running "
+                         "({:.1f} seconds)".format(elapsed))
+        self.wait_ready()
+
+    def wait_ready(self):
+        """Waits until container's services are ready after supervisord
+        is reloaded. Subclass may override this method.
+        """
 
     def ldap_failover_hostname(self):
         return self.ldap_host
@@ -263,14 +352,21 @@ class BaseSetup(object):
             return self.cluster.external_ldap_inum_appliance
         return self.cluster.inum_appliance
 
+    @property
+    def weave(self):
+        """Weave object of current node, shared by all setup steps.
+        """
+        if self._weave is None:
+            self._weave = Weave(self.node, self.app)
+        return self._weave
+
     @property
     def ldap_host(self):
         # get hostname for ldap failover
         if self.cluster.external_ldap:
             hostname = self.cluster.external_ldap_host
         else:
-            weave = Weave(self.node, self.app)
-            _, dns_search = weave.dns_args()
+            _, dns_search = self.weave.dns_args()
             hostname = "ldap.{}".format(dns_search.rstrip("."))
         return hostname
 
@@ -298,6 +394,30 @@ class BaseSetup(object):
 
 
 class OxSetup(BaseSetup):
+    # URL (requested from inside the container) which responds once
+    # tomcat has deployed the app
+    tomcat_ready_url = ""
+
+    # number of seconds to wait for tomcat
+    tomcat_ready_timeout = 300
+
+    def wait_ready(self):
+        """Waits until tomcat serves the app.
+        """
+        if not self.tomcat_ready_url:
+            return
+
+        try:
+            elapsed = wait_for(
+                http_ok(self.docker, self.container.cid, self.tomcat_ready_url),
+                timeout=self.tomcat_ready_timeout,
+                name="tomcat in {}".format(self.container.name),
+            )
+            self.logger.info("tomcat is ready ({:.1f} seconds)".format(elapsed))
+        except ProbeTimeoutError as exc:
+            # tomcat keeps deploying in the background
+            self.logger.warn(exc)
+
     def write_salt_file(self):
         """Copies salt file.
         """
@@ -307,13 +427,8 @@ class OxSetup(BaseSetup):
             salt = self.cluster.passkey
 
         self.logger.debug("writing salt file")
-
-        local_dest = os.path.join(self.build_dir, "salt")
-        with codecs.open(local_dest, "w", encoding="utf-8") as fp:
-            fp.write("encodeSalt = {}".format(salt))
-
-        remote_dest = os.path.join(self.container.tomcat_conf_dir, "salt")
-        self.docker.copy_to_container(self.container.cid, local_dest, remote_dest)
+        dest = os.path.join(self.container.tomcat_conf_dir, "salt")
+        self.put_file(dest, u"encodeSalt = {}".format(salt))
 
     def gen_keystore(self, suffix, keystore_fn, keystore_pw, in_key,
                      in_cert, user, group, hostname):
@@ -340,7 +455,6 @@ class OxSetup(BaseSetup):
             '-name', hostname,
             '-passout', 'pass:%s' % keystore_pw,
         ])
-        self.docker.exec_cmd(self.container.cid, export_cmd)
 
         # Import p12 to keystore
         import_cmd = " ".join([
@@ -354,17 +468,34 @@ class OxSetup(BaseSetup):
             '-keyalg', 'RSA',
             '-noprompt',
         ])
-        self.docker.exec_cmd(self.container.cid, import_cmd)
 
-        self.logger.debug("changing access to keystore file")
-        self.docker.exec_cmd(
-            self.container.cid, "chown {}:{} {}".format(user, group, pkcs_fn)
-        )
-        self.docker.exec_cmd(self.container.cid, "chmod 700 {}".format(pkcs_fn))
-        self.docker.exec_cmd(
-            self.container.cid, "chown {}:{} {}".format(user, group, keystore_fn)
+        self.docker.exec_batch(self.container.cid, [
+            export_cmd,
+            import_cmd,
+            # changing access to keystore file
+            "chown {}:{} {}".format(user, group, pkcs_fn),
+            "chmod 700 {}".format(pkcs_fn),
+            "chown {}:{} {}".format(user, group, keystore_fn),
+            "chmod 700 {}".format(keystore_fn),
+        ])
+
+    def gen_shib_keystore(self, hostname):
+        """Generates shibIDP certificate and keystore.
+
+        :param hostname: Name of the certificate.
+        """
+        self.gen_cert("shibIDP", self.cluster.decrypted_admin_pw,
+                      "tomcat", "tomcat", hostname)
+        self.gen_keystore(
+            "shibIDP",
+            self.cluster.shib_jks_fn,
+            self.cluster.decrypted_admin_pw,
+            "{}/shibIDP.key".format(self.container.cert_folder),
+            "{}/shibIDP.crt".format(self.container.cert_folder),
+            "tomcat",
+            "tomcat",
+            hostname,
         )
-        self.docker.exec_cmd(self.container.cid, "chmod 700 {}".format(keystore_fn))
 
     def render_ldap_props_template(self):
         """Copies rendered jinja template for LDAP connection.
@@ -385,14 +516,11 @@ class OxSetup(BaseSetup):
     def configure_vhost(self):
         """Configures Apache2 virtual host.
         """
-        a2enmod_cmd = "a2enmod ssl headers proxy proxy_http proxy_ajp"
-        self.docker.exec_cmd(self.container.cid, a2enmod_cmd)
-
-        a2dissite_cmd = "a2dissite 000-default"
-        self.docker.exec_cmd(self.container.cid, a2dissite_cmd)
-
-        a2ensite_cmd = "a2ensite gluu_httpd"
-        self.docker.exec_cmd(self.container.cid, a2ensite_cmd)
+        self.docker.exec_batch(self.container.cid, [
+            "a2enmod ssl headers proxy proxy_http proxy_ajp",
+            "a2dissite 000-default",
+            "a2ensite gluu_httpd",
+        ])
 
     def import_nginx_cert(self):
         """Imports SSL certificate from nginx container.
@@ -402,10 +530,12 @@ class OxSetup(BaseSetup):
         # imports nginx cert into oxtrust cacerts to avoid
         # "peer not authenticated" error
         ssl_cert = os.path.join(self.app.config["SSL_CERT_DIR"], "nginx.crt")
+
+        # the cert is saved by nginx setup
+        wait_for(local_file_exists(ssl_cert), timeout=30, name="nginx cert")
         self.docker.copy_to_container(self.container.cid, ssl_cert, "/etc/certs/nginx.crt")
 
         der_cmd = "openssl x509 -outform der -in /etc/certs/nginx.crt -out /etc/certs/nginx.der"
-        self.docker.exec_cmd(self.container.cid, der_cmd)
 
         import_cmd = " ".join([
             "keytool -importcert -trustcacerts",
@@ -416,8 +546,16 @@ class OxSetup(BaseSetup):
         ])
         import_cmd = '''sh -c "{}"'''.format(import_cmd)
 
-        try:
-            self.docker.exec_cmd(self.container.cid, import_cmd)
-        except DockerExecError as exc:  # pragma: no cover
-            if exc.exit_code == 1:
-                self.logger.warn("certificate already imported")
+        der_result, import_result = self.docker.exec_batch(
+            self.container.cid, [der_cmd, import_cmd], stop_on_error=False,
+        )
+
+        if der_result.exit_code != 0:
+            raise DockerExecError(
+                "error while running docker exec",
+                der_result.retval,
+                der_result.exit_code,
+            )
+
+        if import_result.exit_code == 1:  # pragma: no cover
+            self.logger.warn("certificate already imported")
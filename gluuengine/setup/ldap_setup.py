@@ -6,19 +6,64 @@
 import codecs
 import json
 import os.path
-import time
+import re
+from functools import partial
 from glob import iglob
 from random import randint
 
 from .base import BaseSetup
 from .oxidp_setup import OxidpSetup
+from .steps import Step
+from ..errors import DockerExecError
+from ..errors import ProbeTimeoutError
+from ..probe import command_output_contains
+from ..probe import file_exists
+from ..probe import port_open
+from ..probe import wait_for
 from ..utils import generate_base64_contents
 from ..utils import get_sys_random_chars
 from ..model import STATE_SUCCESS
 
+#: LDAP result code returned when adding an entry which already exists
+LDAP_ENTRY_ALREADY_EXISTS = 68
+
+
+def _raise_for_results(results, tolerated):
+    """Raises :class:`DockerExecError` for the first failed command
+    whose output is not accepted by ``tolerated``.
+
+    :param results: A list of :class:`DockerExecResult`.
+    :param tolerated: A callable which receives output of failed command
+                      and returns whether the failure can be ignored.
+    """
+    for result in results:
+        if result.exit_code != 0 and not tolerated(result.retval):
+            raise DockerExecError(
+                "error while running docker exec",
+                result.retval,
+                result.exit_code,
+            )
+
+
+def _already_exists(output):
+    return "already exists" in output
+
+
+def _entries_already_exist(output):
+    codes = re.findall(r"Result Code:\s*(\d+)", output)
+    return bool(codes) and all(
+        int(code) == LDAP_ENTRY_ALREADY_EXISTS for code in codes
+    )
+
 
 class LdapSetup(BaseSetup):
-    supervisor_reload_delay = 30
+    supervisor_ready_timeout = 300
+
+    # number of seconds to wait for replication to be enabled or disabled
+    replication_ready_timeout = 120
+
+    #: Base DNs replicated between OpenDJ servers
+    base_dns = ("o=gluu", "o=site",)
 
     @property
     def ldif_files(self):  # pragma: no cover
@@ -45,16 +90,8 @@ class LdapSetup(BaseSetup):
         method will remove this password file.
         """
         self.logger.debug("writing temporary LDAP password")
-
-        local_dest = os.path.join(self.build_dir, ".pw")
-        with codecs.open(local_dest, "w", encoding="utf-8") as fp:
-            fp.write(self.cluster.decrypted_admin_pw)
-
-        self.docker.exec_cmd(
-            self.container.cid,
-            "mkdir -p {}".format(os.path.dirname(self.container.ldap_pass_fn)),
-        )
-        self.docker.copy_to_container(self.container.cid, local_dest, self.container.ldap_pass_fn)
+        self.put_file(self.container.ldap_pass_fn,
+                      self.cluster.decrypted_admin_pw, mode=0o600)
 
     def delete_ldap_pw(self):
         """Removes temporary LDAP password.
@@ -95,13 +132,21 @@ class LdapSetup(BaseSetup):
         }
         self.render_template(src, dest, ctx)
 
-        setup_cmd = " ".join([
-            self.container.ldap_setup_command,
-            '--no-prompt', '--cli', '--doNotStart', '--acceptLicense',
-            '--propertiesFilePath', dest,
-        ])
-        self.docker.exec_cmd(self.container.cid, setup_cmd)
-        self.docker.exec_cmd(self.container.cid, self.container.ldap_ds_java_prop_command)
+        cmds = []
+
+        # the setup tool refuses to configure an existing instance
+        config_fn = os.path.join(self.container.ldap_base_folder,
+                                 "config", "config.ldif")
+        if file_exists(self.docker, self.container.cid, config_fn)():
+            self.logger.info("opendj has been configured by previous attempt")
+        else:
+            cmds.append(" ".join([
+                self.container.ldap_setup_command,
+                '--no-prompt', '--cli', '--doNotStart', '--acceptLicense',
+                '--propertiesFilePath', dest,
+            ]))
+        cmds.append(self.container.ldap_ds_java_prop_command)
+        self.docker.exec_batch(self.container.cid, cmds)
 
     def configure_opendj(self):
         """Configures OpenDJ.
@@ -120,6 +165,7 @@ class LdapSetup(BaseSetup):
             "set-password-policy-prop --policy-name 'Default Password Policy' --set default-password-storage-scheme:'Salted SHA-512'",
         ]
 
+        dsconfig_cmds = []
         for changes in config_changes:
             dsconfig_cmd = " ".join([
                 self.container.ldap_dsconfig_command,
@@ -133,7 +179,12 @@ class LdapSetup(BaseSetup):
             ])
 
             dsconfig_cmd = '''sh -c "{}"'''.format(dsconfig_cmd)
-            self.docker.exec_cmd(self.container.cid, dsconfig_cmd)
+            dsconfig_cmds.append(dsconfig_cmd)
+
+        results = self.docker.exec_batch(self.container.cid, dsconfig_cmds,
+                                         stop_on_error=False)
+        # backend created by previous (interrupted) attempt is kept
+        _raise_for_results(results, _already_exists)
 
     def index_opendj(self, backend):
         """Creates required index in OpenDJ server.
@@ -147,6 +198,7 @@ class LdapSetup(BaseSetup):
             self.logger.warn("unable to read JSON string from opendj_index.json")
             index_json = []
 
+        index_cmds = []
         for attr_map in index_json:
             attr_name = attr_map['attribute']
 
@@ -169,7 +221,12 @@ class LdapSetup(BaseSetup):
                         '-j', self.container.ldap_pass_fn,
                         '--trustAll', '--noPropertiesFile', '--no-prompt',
                     ])
-                    self.docker.exec_cmd(self.container.cid, index_cmd)
+                    index_cmds.append(index_cmd)
+
+        results = self.docker.exec_batch(self.container.cid, index_cmds,
+                                         stop_on_error=False)
+        # index created by previous (interrupted) attempt is kept
+        _raise_for_results(results, _already_exists)
 
     def import_ldif(self):
         """Renders and imports predefined ldif files.
@@ -193,14 +250,18 @@ class LdapSetup(BaseSetup):
         }
 
         ldifFolder = '%s/ldif' % self.container.ldap_base_folder
-        self.docker.exec_cmd(self.container.cid, "mkdir -p {}".format(ldifFolder))
+        ldif_dests = []
 
         # render templates
-        for ldif_file in self.ldif_files:
-            src = ldif_file
-            file_basename = os.path.basename(src)
-            dest = os.path.join(ldifFolder, file_basename)
-            self.render_template(src, dest, ctx)
+        with self.render_bundle():
+            for ldif_file in self.ldif_files:
+                src = ldif_file
+                file_basename = os.path.basename(src)
+                dest = os.path.join(ldifFolder, file_basename)
+                self.render_template(src, dest, ctx)
+                ldif_dests.append(dest)
+
+        for dest in ldif_dests:
             backend_id = "userRoot"
             self._run_import_ldif(dest, backend_id)
 
@@ -217,11 +278,6 @@ class LdapSetup(BaseSetup):
         openDjTruststoreFn = '%s/config/truststore' % self.container.ldap_base_folder
         openDjPin = "`cat {}`".format(openDjPinFn)
 
-        self.docker.exec_cmd(
-            self.container.cid,
-            "touch {}".format(self.container.opendj_cert_fn),
-        )
-
         # Export public OpenDJ certificate
         self.logger.debug("exporting OpenDJ certificate")
         cmd = ' '.join([
@@ -233,11 +289,24 @@ class LdapSetup(BaseSetup):
             '-rfc',
         ])
         cmd = '''sh -c "{}"'''.format(cmd)
-        self.docker.exec_cmd(self.container.cid, cmd)
+        self.docker.exec_batch(self.container.cid, [
+            "touch {}".format(self.container.opendj_cert_fn),
+            cmd,
+        ])
 
     def import_opendj_cert(self):
         # Import OpenDJ certificate into java truststore
         self.logger.debug("importing OpenDJ certificate into Java truststore")
+
+        # certificate imported by previous attempt is replaced
+        delete_cmd = ' '.join([
+            "/usr/bin/keytool", "-delete",
+            "-alias", self.container.hostname,
+            "-keystore", self.container.truststore_fn,
+            "-storepass", "changeit",
+        ])
+        delete_cmd = '''sh -c "{} || true"'''.format(delete_cmd)
+
         cmd = ' '.join([
             "/usr/bin/keytool", "-import", "-trustcacerts",
             "-alias", self.container.hostname,
@@ -246,7 +315,44 @@ class LdapSetup(BaseSetup):
             "-storepass", "changeit", "-noprompt",
         ])
         cmd = '''sh -c "{}"'''.format(cmd)
-        self.docker.exec_cmd(self.container.cid, cmd)
+        self.docker.exec_batch(self.container.cid, [delete_cmd, cmd])
+
+    def wait_ready(self):
+        """Waits until OpenDJ accepts connections on its admin port.
+        """
+        elapsed = wait_for(
+            port_open(self.docker, self.container.cid,
+                      self.container.ldap_admin_port),
+            timeout=self.supervisor_ready_timeout,
+            name="opendj admin port in {}".format(self.container.name),
+        )
+        self.logger.info("opendj is ready ({:.1f} seconds)".format(elapsed))
+
+    def replication_status_cmd(self):
+        """Builds command which prints replication status of current
+        OpenDJ server.
+        """
+        return " ".join([
+            "{}/bin/dsreplication".format(self.container.ldap_base_folder),
+            "status",
+            "--hostname", self.container.hostname,
+            "--port", self.container.ldap_admin_port,
+            "--adminUID", "admin",
+            "--adminPasswordFile", self.container.ldap_pass_fn,
+            "-X", "-n",
+        ])
+
+    def replication_enabled(self, base_dns):
+        """Builds a probe which checks whether replication of given
+        base DNs is enabled in current OpenDJ server.
+
+        :param base_dns: A list of base DNs.
+        :returns: A probe callable.
+        """
+        return command_output_contains(
+            self.docker, self.container.cid,
+            self.replication_status_cmd(), base_dns,
+        )
 
     def replicate_from(self, peer):
         """Setups a replication between two OpenDJ servers.
@@ -262,35 +368,16 @@ class LdapSetup(BaseSetup):
         # creates temporary password file
         setup_obj.write_ldap_pw()
 
-        base_dns = ("o=gluu", "o=site",)
-
         self.logger.info("initializing and enabling replication between {} and {}".format(
             peer.hostname, self.container.hostname,
         ))
-        for base_dn in base_dns:
-            enable_cmd = " ".join([
-                "/opt/opendj/bin/dsreplication", "enable",
-                "--host1", peer.hostname,
-                "--port1", peer.ldap_admin_port,
-                "--bindDN1", "'{}'".format(self.cluster.ldap_binddn),
-                "--bindPasswordFile1", self.container.ldap_pass_fn,
-                "--replicationPort1", peer.ldap_replication_port,
-                "--host2", self.container.hostname,
-                "--port2", self.container.ldap_admin_port,
-                "--bindDN2", "'{}'".format(self.cluster.ldap_binddn),
-                "--bindPasswordFile2", self.container.ldap_pass_fn,
-                "--replicationPort2", self.container.ldap_replication_port,
-                "--adminUID", "admin",
-                "--adminPasswordFile", self.container.ldap_pass_fn,
-                "--baseDN", "'{}'".format(base_dn),
-                "--secureReplication1", "--secureReplication2",
-                "-X", "-n", "-Q",
-            ])
-            self.docker.exec_cmd(self.container.cid, enable_cmd)
-
-            # wait before initializing the replication to ensure it
-            # has been enabled
-            time.sleep(10)
+        for base_dn in self.base_dns:
+            # dsreplication refuses to enable an existing replication
+            if self.replication_enabled([base_dn])():
+                self.logger.info("replication of {} has been enabled "
+                                 "by previous attempt".format(base_dn))
+            else:
+                self._enable_replication(peer, base_dn)
 
             init_cmd = " ".join([
                 "/opt/opendj/bin/dsreplication", "initialize",
@@ -303,12 +390,45 @@ class LdapSetup(BaseSetup):
                 "--portDestination", self.container.ldap_admin_port,
                 "-X", "-n", "-Q",
             ])
+            # returns once the data has been copied
             self.docker.exec_cmd(self.container.cid, init_cmd)
-            time.sleep(5)
 
         # cleanups temporary password file
         setup_obj.delete_ldap_pw()
 
+    def _enable_replication(self, peer, base_dn):
+        """Enables replication of given base DN between two OpenDJ servers.
+
+        :param peer: OpenDJ server where the data will be replicated from.
+        :param base_dn: Base DN to replicate.
+        """
+        enable_cmd = " ".join([
+            "/opt/opendj/bin/dsreplication", "enable",
+            "--host1", peer.hostname,
+            "--port1", peer.ldap_admin_port,
+            "--bindDN1", "'{}'".format(self.cluster.ldap_binddn),
+            "--bindPasswordFile1", self.container.ldap_pass_fn,
+            "--replicationPort1", peer.ldap_replication_port,
+            "--host2", self.container.hostname,
+            "--port2", self.container.ldap_admin_port,
+            "--bindDN2", "'{}'".format(self.cluster.ldap_binddn),
+            "--bindPasswordFile2", self.container.ldap_pass_fn,
+            "--replicationPort2", self.container.ldap_replication_port,
+            "--adminUID", "admin",
+            "--adminPasswordFile", self.container.ldap_pass_fn,
+            "--baseDN", "'{}'".format(base_dn),
+            "--secureReplication1", "--secureReplication2",
+            "-X", "-n", "-Q",
+        ])
+        self.docker.exec_cmd(self.container.cid, enable_cmd)
+
+        # ensure replication has been enabled before initializing it
+        wait_for(
+            self.replication_enabled([base_dn]),
+            timeout=self.replication_ready_timeout,
+            name="replication of {} in {}".format(base_dn, self.container.name),
+        )
+
     def add_auto_startup_entry(self):
         """Adds supervisor program for auto-startup.
         """
@@ -317,20 +437,10 @@ class LdapSetup(BaseSetup):
         dest = "/etc/supervisor/conf.d/opendj.conf"
         self.copy_rendered_jinja_template(src, dest)
 
-    def setup(self):
-        """Runs the actual setup.
+    def populate_data(self):
+        """Replicates data from existing ldap container (if any),
+        otherwise imports initial data from ldif files.
         """
-        self.write_ldap_pw()
-        self.add_ldap_schema()
-        self.import_custom_schema()
-        self.setup_opendj()
-        self.add_auto_startup_entry()
-        self.reload_supervisor()
-        self.configure_opendj()
-
-        self.index_opendj("site")
-        self.index_opendj("userRoot")
-
         try:
             with self.app.app_context():
                 peer = self.cluster.get_containers(type_="ldap")[0]
@@ -344,9 +454,41 @@ class LdapSetup(BaseSetup):
             self.import_base64_scim_config()
             self.import_base64_config()
 
-        self.export_opendj_cert()
-        self.import_opendj_cert()
-        self.delete_ldap_pw()
+    def setup(self):
+        """Runs the actual setup.
+        """
+        def render_files():
+            with self.render_bundle():
+                self.write_ldap_pw()
+                self.add_ldap_schema()
+                self.import_custom_schema()
+
+        self.run_steps([
+            Step("render_files", render_files),
+            Step("add_auto_startup_entry", self.add_auto_startup_entry),
+            Step("setup_opendj", self.setup_opendj,
+                 requires=["render_files"]),
+            Step("reload_supervisor", self.reload_supervisor,
+                 requires=["setup_opendj", "add_auto_startup_entry"],
+                 # services are (re)started on every attempt
+                 checkpoint=False),
+            Step("configure_opendj", self.configure_opendj,
+                 requires=["reload_supervisor"]),
+            # indexes are built one backend at a time
+            Step("index_site", partial(self.index_opendj, "site"),
+                 requires=["configure_opendj"]),
+            Step("index_userRoot", partial(self.index_opendj, "userRoot"),
+                 requires=["index_site"]),
+            Step("populate_data", self.populate_data,
+                 requires=["index_userRoot"]),
+            # truststore is available once OpenDJ is installed
+            Step("export_opendj_cert", self.export_opendj_cert,
+                 requires=["setup_opendj"]),
+            Step("import_opendj_cert", self.import_opendj_cert,
+                 requires=["export_opendj_cert"]),
+            Step("delete_ldap_pw", self.delete_ldap_pw,
+                 requires=["populate_data", "import_opendj_cert"]),
+        ])
         return True
 
     def notify_ox(self):
@@ -379,8 +521,17 @@ class LdapSetup(BaseSetup):
             ldap_num = len(self.cluster.get_containers(type_="ldap"))
             if ldap_num > 0:
                 self.disable_replication()
-                # wait for process to run in the background
-                time.sleep(5)
+
+                # replication agreement is removed in the background
+                enabled = self.replication_enabled(self.base_dns[:1])
+                try:
+                    wait_for(
+                        lambda: not enabled(),
+                        timeout=self.replication_ready_timeout,
+                        name="disabled replication in {}".format(self.container.name),
+                    )
+                except ProbeTimeoutError as exc:
+                    self.logger.warn(exc)
 
         # remove password file
         self.delete_ldap_pw()
@@ -398,7 +549,8 @@ class LdapSetup(BaseSetup):
             basename = os.path.basename(file_)
             dest = "{}/{}".format(self.container.schema_folder, basename)
             self.logger.debug("copying {}".format(basename))
-            self.docker.copy_to_container(self.container.cid, file_, dest)
+            with codecs.open(file_, "r", encoding="utf-8") as fp:
+                self.put_file(dest, fp.read())
 
     def disable_replication(self):
         """Disable replication setup for current container.
@@ -453,7 +605,7 @@ class LdapSetup(BaseSetup):
         default_key_expiration = 365
 
         # create JKS with dummy key
-        cmd = " ".join([
+        create_cmd = " ".join([
             'keytool', '-genkey',
             '-alias', 'dummy',
             '-keystore', jks_path,
@@ -461,11 +613,10 @@ class LdapSetup(BaseSetup):
             '-keypass', jks_pwd,
             '-dname', "'{}'".format(default_openid_jks_dn_name),
         ])
-        cmd = '''sh -c "{}"'''.format(cmd)
-        self.docker.exec_cmd(self.container.cid, cmd)
+        create_cmd = '''sh -c "{}"'''.format(create_cmd)
 
         # Delete dummy key from JKS
-        cmd = " ".join([
+        delete_cmd = " ".join([
             'keytool', '-delete',
             '-alias', 'dummy',
             '-keystore', jks_path,
@@ -473,8 +624,7 @@ class LdapSetup(BaseSetup):
             '-keypass', jks_pwd,
             '-dname', "'{}'".format(default_openid_jks_dn_name),
         ])
-        cmd = '''sh -c "{}"'''.format(cmd)
-        self.docker.exec_cmd(self.container.cid, cmd)
+        delete_cmd = '''sh -c "{}"'''.format(delete_cmd)
 
         def extra_jar_abspath(jar):
             return "/opt/gluu/lib/{}".format(jar)
@@ -491,7 +641,7 @@ class LdapSetup(BaseSetup):
             "oxauth-server.jar",
         ])
 
-        cmd = " ".join([
+        keygen_cmd = " ".join([
             "java", "-Dlog4j.defaultInitOverride=true",
             "-cp", ":".join(jars),
             "org.xdi.oxauth.util.KeyGenerator",
@@ -501,8 +651,10 @@ class LdapSetup(BaseSetup):
             "-dnname", "'{}'".format(default_openid_jks_dn_name),
             "-expiration", "{}".format(default_key_expiration),
         ])
-        resp = self.docker.exec_cmd(self.container.cid, cmd)
-        return resp.retval
+        results = self.docker.exec_batch(
+            self.container.cid, [create_cmd, delete_cmd, keygen_cmd],
+        )
+        return results[-1].retval
 
     def render_oxauth_config(self):
         """Renders oxAuth configuration.
@@ -665,4 +817,8 @@ class LdapSetup(BaseSetup):
             ])
 
         self.logger.debug("importing {}".format(file_basename))
-        self.docker.exec_cmd(self.container.cid, import_cmd)
+        results = self.docker.exec_batch(self.container.cid, [import_cmd],
+                                         stop_on_error=False)
+        # entries added by previous (interrupted) attempt are kept;
+        # import-ldif replaces the whole backend hence it can be re-run
+        _raise_for_results(results, _entries_already_exist)
@@ -42,11 +42,9 @@ class NginxSetup(BaseSetup):
         """Enables virtual host.
         """
         rm_cmd = "rm /etc/nginx/sites-enabled/default"
-        self.docker.exec_cmd(self.container.cid, rm_cmd)
-
         symlink_cmd = "ln -sf /etc/nginx/sites-available/gluu_https.conf " \
                       "/etc/nginx/sites-enabled/gluu_https.conf"
-        self.docker.exec_cmd(self.container.cid, symlink_cmd)
+        self.docker.exec_batch(self.container.cid, [rm_cmd, symlink_cmd])
 
     def add_auto_startup_entry(self):
         """Adds supervisor program for auto-startup.
@@ -4,12 +4,14 @@
 # All rights reserved.
 
 import os.path
-import time
 from glob import iglob
 
 from blinker import signal
 
 from .base import OxSetup
+from ..probe import file_exists
+from ..probe import wait_for
+from ..templating import templates
 
 
 class OxasimbaSetup(OxSetup):  # pragma: no cover
@@ -17,16 +19,18 @@ class OxasimbaSetup(OxSetup):  # pragma: no cover
         hostname = self.container.hostname
 
         # render config templates
-        self.copy_selector_template()
-        self.render_ldap_props_template()
-        self.render_server_xml_template()
-        self.render_httpd_conf()
+        with self.render_bundle():
+            self.copy_selector_template()
+            self.render_ldap_props_template()
+            self.render_server_xml_template()
+            self.render_httpd_conf()
         self.configure_vhost()
 
         # customize asimba and rebuild
         self.unpack_jar()
-        self.copy_props_template()
-        self.render_config_template()
+        with self.render_bundle():
+            self.copy_props_template()
+            self.render_config_template()
 
         self.gen_cert("asimba", self.cluster.decrypted_admin_pw,
                       "tomcat", "tomcat", hostname)
@@ -52,15 +56,16 @@ class OxasimbaSetup(OxSetup):  # pragma: no cover
         return True
 
     def add_auto_startup_entry(self):
-        self.logger.debug("adding tomcat config for supervisord")
-        src = "_shared/tomcat.conf"
-        dest = "/etc/supervisor/conf.d/tomcat.conf"
-        self.copy_rendered_jinja_template(src, dest)
+        with self.render_bundle():
+            self.logger.debug("adding tomcat config for supervisord")
+            src = "_shared/tomcat.conf"
+            dest = "/etc/supervisor/conf.d/tomcat.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
-        self.logger.debug("adding httpd config for supervisord")
-        src = "_shared/httpd.conf"
-        dest = "/etc/supervisor/conf.d/httpd.conf"
-        self.copy_rendered_jinja_template(src, dest)
+            self.logger.debug("adding httpd config for supervisord")
+            src = "_shared/httpd.conf"
+            dest = "/etc/supervisor/conf.d/httpd.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
     def render_server_xml_template(self):
         src = "oxasimba/server.xml"
@@ -87,17 +92,18 @@ class OxasimbaSetup(OxSetup):  # pragma: no cover
         unpack_cmd = "unzip -qq /opt/tomcat/webapps/oxasimba.war " \
                      "-d /tmp/asimba"
         self.docker.exec_cmd(self.container.cid, unpack_cmd)
-        time.sleep(5)
+        wait_for(file_exists(self.docker, self.container.cid, "/tmp/asimba/WEB-INF"),
+                 timeout=30, name="unpacked oxasimba.war")
 
     def copy_selector_template(self):
         src = self.get_template_path("oxasimba/asimba-selector.xml")
         dest = "{}/asimba-selector.xml".format(self.container.tomcat_conf_dir)
-        self.docker.copy_to_container(self.container.cid, src, dest)
+        self.put_file(dest, templates.read_template(src))
 
     def copy_props_template(self):
         src = self.get_template_path("oxasimba/asimba.properties")
         dest = "/tmp/asimba/WEB-INF/asimba.properties"
-        self.docker.copy_to_container(self.container.cid, src, dest)
+        self.put_file(dest, templates.read_template(src))
 
     def render_config_template(self):
         src = self.get_template_path("oxasimba/asimba.xml")
@@ -116,19 +122,16 @@ class OxasimbaSetup(OxSetup):  # pragma: no cover
         # rebuild jar
         jar_cmd = "/usr/bin/jar cmf /tmp/asimba/META-INF/MANIFEST.MF " \
                   "/tmp/asimba.war -C /tmp/asimba ."
-        self.docker.exec_cmd(self.container.cid, jar_cmd)
 
-        # remove oxasimba.war
-        rm_cmd = "rm /opt/tomcat/webapps/oxasimba.war"
-        self.docker.exec_cmd(self.container.cid, rm_cmd)
-
-        # install reconfigured asimba.jar
-        mv_cmd = "mv /tmp/asimba.war /opt/tomcat/webapps/asimba.war"
-        self.docker.exec_cmd(self.container.cid, mv_cmd)
-
-        # remove temporary asimba
-        rm_cmd = "rm -rf /tmp/asimba"
-        self.docker.exec_cmd(self.container.cid, rm_cmd)
+        self.docker.exec_batch(self.container.cid, [
+            jar_cmd,
+            # remove oxasimba.war
+            "rm /opt/tomcat/webapps/oxasimba.war",
+            # install reconfigured asimba.jar
+            "mv /tmp/asimba.war /opt/tomcat/webapps/asimba.war",
+            # remove temporary asimba
+            "rm -rf /tmp/asimba",
+        ])
 
     def pull_idp_metadata(self):
         files = iglob("{}/metadata/*-idp-metadata.xml".format(
@@ -4,13 +4,17 @@
 # All rights reserved.
 
 import os.path
+from functools import partial
 
 from blinker import signal
 
 from .base import OxSetup
+from .steps import Step
 
 
 class OxauthSetup(OxSetup):
+    tomcat_ready_url = "https://localhost:8443/oxauth/.well-known/openid-configuration"
+
     def render_server_xml_template(self):
         """Copies rendered Tomcat's server.xml into the container.
         """
@@ -25,47 +29,45 @@ class OxauthSetup(OxSetup):
     def add_auto_startup_entry(self):
         """Adds supervisor program for auto-startup.
         """
-        self.logger.debug("adding tomcat config for supervisord")
-        src = "_shared/tomcat.conf"
-        dest = "/etc/supervisor/conf.d/tomcat.conf"
-        self.copy_rendered_jinja_template(src, dest)
+        with self.render_bundle():
+            self.logger.debug("adding tomcat config for supervisord")
+            src = "_shared/tomcat.conf"
+            dest = "/etc/supervisor/conf.d/tomcat.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
-        self.logger.debug("adding httpd config for supervisord")
-        src = "_shared/httpd.conf"
-        dest = "/etc/supervisor/conf.d/httpd.conf"
-        self.copy_rendered_jinja_template(src, dest)
+            self.logger.debug("adding httpd config for supervisord")
+            src = "_shared/httpd.conf"
+            dest = "/etc/supervisor/conf.d/httpd.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
     def setup(self):
         hostname = self.container.hostname
 
-        # render config templates
-        self.render_ldap_props_template()
-        self.render_server_xml_template()
-        self.render_oxauth_context()
-
-        self.write_salt_file()
-        self.render_httpd_conf()
-        self.configure_vhost()
-
-        self.gen_cert("shibIDP", self.cluster.decrypted_admin_pw,
-                      "tomcat", "tomcat", hostname)
-        self.get_web_cert()
-
-        self.gen_keystore(
-            "shibIDP",
-            self.cluster.shib_jks_fn,
-            self.cluster.decrypted_admin_pw,
-            "{}/shibIDP.key".format(self.container.cert_folder),
-            "{}/shibIDP.crt".format(self.container.cert_folder),
-            "tomcat",
-            "tomcat",
-            hostname,
-        )
-
-        self.pull_oxauth_override()
-        self.add_auto_startup_entry()
-        self.change_cert_access("tomcat", "tomcat")
-        self.reload_supervisor()
+        def render_templates():
+            with self.render_bundle():
+                self.render_ldap_props_template()
+                self.render_server_xml_template()
+                self.render_oxauth_context()
+                self.write_salt_file()
+                self.render_httpd_conf()
+
+        self.run_steps([
+            Step("render_templates", render_templates),
+            Step("configure_vhost", self.configure_vhost,
+                 requires=["render_templates"]),
+            Step("gen_shib_keystore", partial(self.gen_shib_keystore, hostname)),
+            Step("get_web_cert", self.get_web_cert),
+            Step("pull_oxauth_override", self.pull_oxauth_override),
+            Step("add_auto_startup_entry", self.add_auto_startup_entry),
+            Step("change_cert_access",
+                 partial(self.change_cert_access, "tomcat", "tomcat"),
+                 requires=["gen_shib_keystore", "get_web_cert"]),
+            Step("reload_supervisor", self.reload_supervisor,
+                 requires=["configure_vhost", "change_cert_access",
+                           "pull_oxauth_override", "add_auto_startup_entry"],
+                 # services are (re)started on every attempt
+                 checkpoint=False),
+        ])
         return True
 
     def teardown(self):
@@ -6,10 +6,12 @@
 import os
 import shutil
 import tempfile
+from functools import partial
 
 from blinker import signal
 
 from .base import OxSetup
+from .steps import Step
 from ..errors import DockerExecError
 
 
@@ -19,36 +21,35 @@ class OxidpSetup(OxSetup):
         """
         hostname = self.container.hostname
 
-        # render config templates
-        self.render_server_xml_template()
-        self.render_ldap_props_template()
-        self.write_salt_file()
-        self.render_httpd_conf()
-        self.configure_vhost()
-
-        self.gen_cert("shibIDP", self.cluster.decrypted_admin_pw,
-                      "tomcat", "tomcat", hostname)
-        self.get_web_cert()
-
-        # IDP keystore
-        self.gen_keystore(
-            "shibIDP",
-            self.cluster.shib_jks_fn,
-            self.cluster.decrypted_admin_pw,
-            "{}/shibIDP.key".format(self.container.cert_folder),
-            "{}/shibIDP.crt".format(self.container.cert_folder),
-            "tomcat",
-            "tomcat",
-            hostname,
-        )
-
-        self.import_ldap_certs()
-        self.pull_shib_config()
-        self.pull_shib_certkey()
-
-        self.add_auto_startup_entry()
-        self.change_cert_access("tomcat", "tomcat")
-        self.reload_supervisor()
+        def render_templates():
+            with self.render_bundle():
+                self.render_server_xml_template()
+                self.render_ldap_props_template()
+                self.write_salt_file()
+                self.render_httpd_conf()
+
+        self.run_steps([
+            Step("render_templates", render_templates),
+            Step("configure_vhost", self.configure_vhost,
+                 requires=["render_templates"]),
+            Step("gen_shib_keystore", partial(self.gen_shib_keystore, hostname)),
+            Step("get_web_cert", self.get_web_cert),
+            Step("import_ldap_certs", self.import_ldap_certs),
+            Step("pull_shib_config", self.pull_shib_config),
+            # cert and key pulled from oxtrust replace the generated ones
+            Step("pull_shib_certkey", self.pull_shib_certkey,
+                 requires=["gen_shib_keystore"]),
+            Step("add_auto_startup_entry", self.add_auto_startup_entry),
+            Step("change_cert_access",
+                 partial(self.change_cert_access, "tomcat", "tomcat"),
+                 requires=["get_web_cert", "import_ldap_certs",
+                           "pull_shib_certkey"]),
+            Step("reload_supervisor", self.reload_supervisor,
+                 requires=["configure_vhost", "change_cert_access",
+                           "pull_shib_config", "add_auto_startup_entry"],
+                 # services are (re)started on every attempt
+                 checkpoint=False),
+        ])
         return True
 
     def after_setup(self):
@@ -82,7 +83,6 @@ class OxidpSetup(OxSetup):
                        "sed -ne '/-BEGIN CERTIFICATE-/,/-END CERTIFICATE-/p' " \
                        "> /etc/certs/{0}.crt".format(host, port)
             cert_cmd = '''sh -c "{}"'''.format(cert_cmd)
-            self.docker.exec_cmd(self.container.cid, cert_cmd)
 
             import_cmd = " ".join([
                 "keytool -importcert -trustcacerts",
@@ -93,11 +93,18 @@ class OxidpSetup(OxSetup):
             ])
             import_cmd = '''sh -c "{}"'''.format(import_cmd)
 
-            try:
-                self.docker.exec_cmd(self.container.cid, import_cmd)
-            except DockerExecError as exc:
-                if exc.exit_code == 1:
-                    pass
+            # import error is ignored, as in most cases
+            # the certificate has been imported
+            cert_result, _ = self.docker.exec_batch(
+                self.container.cid, [cert_cmd, import_cmd],
+                stop_on_error=False,
+            )
+            if cert_result.exit_code != 0:
+                raise DockerExecError(
+                    "error while running docker exec",
+                    cert_result.retval,
+                    cert_result.exit_code,
+                )
 
         if self.cluster.external_ldap:
             import_certs(self.cluster.external_ldap_host,
@@ -174,25 +181,26 @@ class OxidpSetup(OxSetup):
     def add_auto_startup_entry(self):
         """Adds supervisor program for auto-startup.
         """
-        self.logger.debug("adding tomcat config for supervisord")
-        src = "_shared/tomcat.conf"
-        dest = "/etc/supervisor/conf.d/tomcat.conf"
-        self.copy_rendered_jinja_template(src, dest)
-
-        self.logger.debug("adding httpd config for supervisord")
-        src = "_shared/httpd.conf"
-        dest = "/etc/supervisor/conf.d/httpd.conf"
-        self.copy_rendered_jinja_template(src, dest)
-
-        self.logger.debug("adding memcached config for supervisord")
-        src = "oxidp/memcached.conf"
-        dest = "/etc/supervisor/conf.d/memcached.conf"
-        self.copy_rendered_jinja_template(src, dest)
-
-        self.logger.debug("adding nutcracker config for supervisord")
-        src = "oxidp/nutcracker.conf"
-        dest = "/etc/supervisor/conf.d/nutcracker.conf"
-        self.copy_rendered_jinja_template(src, dest)
+        with self.render_bundle():
+            self.logger.debug("adding tomcat config for supervisord")
+            src = "_shared/tomcat.conf"
+            dest = "/etc/supervisor/conf.d/tomcat.conf"
+            self.copy_rendered_jinja_template(src, dest)
+
+            self.logger.debug("adding httpd config for supervisord")
+            src = "_shared/httpd.conf"
+            dest = "/etc/supervisor/conf.d/httpd.conf"
+            self.copy_rendered_jinja_template(src, dest)
+
+            self.logger.debug("adding memcached config for supervisord")
+            src = "oxidp/memcached.conf"
+            dest = "/etc/supervisor/conf.d/memcached.conf"
+            self.copy_rendered_jinja_template(src, dest)
+
+            self.logger.debug("adding nutcracker config for supervisord")
+            src = "oxidp/nutcracker.conf"
+            dest = "/etc/supervisor/conf.d/nutcracker.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
     def render_server_xml_template(self):
         """Copies rendered Tomcat's server.xml into the container.
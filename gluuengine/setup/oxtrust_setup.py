@@ -5,54 +5,55 @@
 
 import tempfile
 import os
+from functools import partial
 
 from blinker import signal
 
 from .base import OxSetup
+from .steps import Step
 
 
 class OxtrustSetup(OxSetup):
+    tomcat_ready_url = "https://localhost:8443/identity/"
+
     def render_check_ssl_template(self):
         """Renders check_ssl script into the container.
         """
         src = self.get_template_path("oxtrust/check_ssl")
         dest = "/usr/bin/{}".format(os.path.basename(src))
         ctx = {"ox_cluster_hostname": self.cluster.ox_cluster_hostname}
-        self.render_template(src, dest, ctx)
-        self.docker.exec_cmd(self.container.cid, "chmod +x {}".format(dest))
+        self.render_template(src, dest, ctx, mode=0o755)
 
     def setup(self):
         """Runs the actual setup.
         """
         hostname = self.cluster.ox_cluster_hostname.split(":")[0]
 
-        self.render_ldap_props_template()
-        self.render_server_xml_template()
-        self.write_salt_file()
-        self.render_httpd_conf()
-        self.configure_vhost()
-        self.render_check_ssl_template()
-
-        self.gen_cert("shibIDP", self.cluster.decrypted_admin_pw,
-                      "tomcat", "tomcat", hostname)
-        self.get_web_cert()
-
-        # IDP keystore
-        self.gen_keystore(
-            "shibIDP",
-            self.cluster.shib_jks_fn,
-            self.cluster.decrypted_admin_pw,
-            "{}/shibIDP.key".format(self.container.cert_folder),
-            "{}/shibIDP.crt".format(self.container.cert_folder),
-            "tomcat",
-            "tomcat",
-            hostname,
-        )
-
-        self.pull_oxtrust_override()
-        self.add_auto_startup_entry()
-        self.change_cert_access("tomcat", "tomcat")
-        self.reload_supervisor()
+        def render_templates():
+            with self.render_bundle():
+                self.render_ldap_props_template()
+                self.render_server_xml_template()
+                self.write_salt_file()
+                self.render_httpd_conf()
+                self.render_check_ssl_template()
+
+        self.run_steps([
+            Step("render_templates", render_templates),
+            Step("configure_vhost", self.configure_vhost,
+                 requires=["render_templates"]),
+            Step("gen_shib_keystore", partial(self.gen_shib_keystore, hostname)),
+            Step("get_web_cert", self.get_web_cert),
+            Step("pull_oxtrust_override", self.pull_oxtrust_override),
+            Step("add_auto_startup_entry", self.add_auto_startup_entry),
+            Step("change_cert_access",
+                 partial(self.change_cert_access, "tomcat", "tomcat"),
+                 requires=["gen_shib_keystore", "get_web_cert"]),
+            Step("reload_supervisor", self.reload_supervisor,
+                 requires=["configure_vhost", "change_cert_access",
+                           "pull_oxtrust_override", "add_auto_startup_entry"],
+                 # services are (re)started on every attempt
+                 checkpoint=False),
+        ])
         return True
 
     def teardown(self):
@@ -91,15 +92,16 @@ class OxtrustSetup(OxSetup):
     def add_auto_startup_entry(self):
         """Adds supervisor program for auto-startup.
         """
-        self.logger.debug("adding tomcat config for supervisord")
-        src = "_shared/tomcat.conf"
-        dest = "/etc/supervisor/conf.d/tomcat.conf"
-        self.copy_rendered_jinja_template(src, dest)
-
-        self.logger.debug("adding httpd config for supervisord")
-        src = "_shared/httpd.conf"
-        dest = "/etc/supervisor/conf.d/httpd.conf"
-        self.copy_rendered_jinja_template(src, dest)
+        with self.render_bundle():
+            self.logger.debug("adding tomcat config for supervisord")
+            src = "_shared/tomcat.conf"
+            dest = "/etc/supervisor/conf.d/tomcat.conf"
+            self.copy_rendered_jinja_template(src, dest)
+
+            self.logger.debug("adding httpd config for supervisord")
+            src = "_shared/httpd.conf"
+            dest = "/etc/supervisor/conf.d/httpd.conf"
+            self.copy_rendered_jinja_template(src, dest)
 
     def restart_tomcat(self):
         """Restarts Tomcat via supervisorctl.
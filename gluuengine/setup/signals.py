@@ -3,8 +3,6 @@
 #
 # All rights reserved.
 
-import time
-
 from blinker import signal
 
 from .oxtrust_setup import OxtrustSetup
@@ -17,9 +15,6 @@ def notify_oxtrust(ngx):
         try:
             oxtrust = ngx.node.get_containers(type_="oxtrust")[0]
             setup_obj = OxtrustSetup(oxtrust, ngx.cluster, ngx.app, ngx.logger)
-
-            # wait before telling oxtrust to find nginx container
-            time.sleep(2)
             setup_obj.discover_nginx()
         except IndexError:
             pass
@@ -29,9 +24,6 @@ def notify_oxidp(ngx):
     with ngx.app.app_context():
         for oxidp in ngx.cluster.get_containers(type_="oxidp"):
             setup_obj = OxidpSetup(oxidp, ngx.cluster, ngx.app, ngx.logger)
-
-            # wait before telling oxidp to find nginx container
-            time.sleep(2)
             setup_obj.discover_nginx()
 
 
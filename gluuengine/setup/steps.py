@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import time
+from collections import OrderedDict
+
+import concurrent.futures
+
+#: Default number of steps running concurrently
+DEFAULT_MAX_WORKERS = 3
+
+
+class Step(object):
+    """A unit of container setup.
+
+    Finished steps are checkpointed, hence a failed setup can be resumed
+    without running them again. A step interrupted halfway is run again
+    on resume, so it must be safe to re-run. Steps which must be run
+    on every attempt (e.g. starting services) are not checkpointed.
+
+    :param name: Unique name of the step.
+    :param func: A callable (without arguments) running the step.
+    :param requires: Names of steps which must be finished beforehand.
+    :param checkpoint: Whether the step is skipped when resuming after
+                       it has finished.
+    """
+
+    def __init__(self, name, func, requires=(), checkpoint=True):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.checkpoint = checkpoint
+
+    def __repr__(self):
+        return "<Step {}>".format(self.name)
+
+
+def sort_steps(steps):
+    """Orders steps so that each step comes after its requirements,
+    keeping declaration order where possible.
+
+    :param steps: A list of :class:`Step`.
+    :returns: A list of :class:`Step`.
+    :raises: ``ValueError`` if a requirement is unknown or steps
+             depend on each other in a cycle.
+    """
+    pending = OrderedDict((step.name, step) for step in steps)
+    if len(pending) != len(steps):
+        raise ValueError("step names must be unique")
+
+    for step in steps:
+        for name in step.requires:
+            if name not in pending:
+                raise ValueError("{} requires unknown step {}".format(step.name, name))
+
+    ordered = []
+    done = set()
+    while pending:
+        ready = [
+            step for step in pending.values()
+            if all(name in done for name in step.requires)
+        ]
+        if not ready:
+            raise ValueError("steps {} depend on each other".format(
+                ", ".join(pending)))
+        for step in ready:
+            ordered.append(step)
+            done.add(step.name)
+            del pending[step.name]
+    return ordered
+
+
+def run_steps(steps, max_workers=DEFAULT_MAX_WORKERS, logger=None,
+              done=(), on_finished=None):
+    """Runs steps in dependency order, running independent steps
+    concurrently.
+
+    If a step fails, no further step is started; running steps are waited
+    for and the first error is re-raised.
+
+    :param steps: A list of :class:`Step`.
+    :param max_workers: Number of steps running concurrently.
+    :param logger: Logger which receives timing of each step (if any).
+    :param done: Names of steps finished by previous attempt; checkpointed
+                 steps among them are skipped.
+    :param on_finished: A callable receiving each finished :class:`Step`;
+                        called from the calling thread.
+    :returns: An ``OrderedDict`` of step name and its elapsed seconds,
+              in order of completion.
+    """
+    # validates the graph before running anything
+    pending = sort_steps(steps)
+
+    skipped = set(step.name for step in pending
+                  if step.checkpoint and step.name in done)
+    pending = [step for step in pending if step.name not in skipped]
+    if skipped and logger:
+        logger.info("skipping finished steps {}".format(
+            ", ".join(sorted(skipped))))
+
+    timings = OrderedDict()
+    running = {}
+    error = None
+
+    def timed(step):
+        start = time.time()
+        step.func()
+        return time.time() - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if error is None:
+                for step in [s for s in pending
+                             if all(name in timings or name in skipped
+                                    for name in s.requires)]:
+                    pending.remove(step)
+                    running[executor.submit(timed, step)] = step
+
+            if not running:
+                break
+
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    timings[step.name] = future.result()
+                except Exception:
+                    if error is None:
+                        error = future
+                    continue
+                if logger:
+                    logger.debug("step {} is finished ({:.2f} seconds)".format(
+                        step.name, timings[step.name]))
+                if on_finished:
+                    on_finished(step)
+
+            if error is not None and not running:
+                # re-raises the original exception
+                error.result()
+    return timings
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+
+from pymongo.errors import DuplicateKeyError
+from pymongo.errors import OperationFailure
+from pymongo.results import UpdateResult
+
+#: URI scheme of SQLite database, e.g. ``sqlite:////var/lib/gluuengine/db/gluuengine.db``
+#: (absolute path) or ``sqlite:///:memory:``
+SQLITE_SCHEME = "sqlite://"
+
+# name of collection and field must be safe to be put in SQL statements
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+_COMPARISON_OPERATORS = {
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$ne": "IS NOT",
+}
+
+
+def is_sqlite_uri(uri):
+    """Checks whether URI points to SQLite database.
+
+    :param uri: Database URI.
+    """
+    return uri.startswith(SQLITE_SCHEME)
+
+
+def path_from_uri(uri):
+    """Gets path to SQLite database file from URI.
+
+    :param uri: SQLite database URI.
+    :returns: Path to database file or ``:memory:``.
+    """
+    return uri[len(SQLITE_SCHEME) + 1:] or ":memory:"
+
+
+def _safe_name(name):
+    if not _NAME_RE.match(name):
+        raise OperationFailure("invalid name {!r}".format(name))
+    return name
+
+
+def _field_expr(field):
+    return "json_extract(doc, '$.{}')".format(_safe_name(field))
+
+
+def _sql_value(value):
+    # booleans are stored as JSON true/false which are extracted as 1/0
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def translate(condition):
+    """Translates MongoDB-style query condition into SQL ``WHERE`` clause.
+
+    Supported operators are ``$and``, ``$or``, ``$in``, ``$nin``,
+    ``$gt``, ``$gte``, ``$lt``, ``$lte``, and ``$ne``.
+
+    :param condition: A ``dict`` of query condition.
+    :returns: A tuple of SQL clause and its parameters.
+    """
+    clauses = []
+    params = []
+
+    for key, value in sorted((condition or {}).items()):
+        if key in ("$and", "$or",):
+            parts = [translate(item) for item in value]
+            if not parts:
+                clauses.append("1" if key == "$and" else "0")
+                continue
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(p[0] for p in parts) + ")")
+            for part in parts:
+                params.extend(part[1])
+            continue
+
+        expr = _field_expr(key)
+
+        if not isinstance(value, dict):
+            if value is None:
+                clauses.append("{} IS NULL".format(expr))
+            else:
+                clauses.append("{} = ?".format(expr))
+                params.append(_sql_value(value))
+            continue
+
+        for op, operand in sorted(value.items()):
+            if op in ("$in", "$nin",):
+                if not operand:
+                    clauses.append("0" if op == "$in" else "1")
+                    continue
+                clauses.append("{} {} ({})".format(
+                    expr,
+                    "IN" if op == "$in" else "NOT IN",
+                    ", ".join("?" * len(operand)),
+                ))
+                params.extend(_sql_value(item) for item in operand)
+            elif op in _COMPARISON_OPERATORS:
+                clauses.append("{} {} ?".format(expr, _COMPARISON_OPERATORS[op]))
+                params.append(_sql_value(operand))
+            else:
+                raise OperationFailure(
+                    "unsupported query operator {}".format(op)
+                )
+
+    if not clauses:
+        return "1", []
+    return " AND ".join(clauses), params
+
+
+def _apply_projection(doc, projection):
+    if not projection:
+        return doc
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        data = {k: doc[k] for k in included if k in doc}
+        if projection.get("_id", True) and "_id" in doc:
+            data["_id"] = doc["_id"]
+        return data
+    return {k: v for k, v in doc.items() if projection.get(k, True)}
+
+
+class SQLiteCursor(object):
+    """Lazy query result of :class:`SQLiteCollection`, mimicking
+    ``pymongo.cursor.Cursor``.
+    """
+
+    def __init__(self, collection, condition=None, projection=None):
+        self.collection = collection
+        self.condition = condition
+        self.projection = projection
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort.append((key, direction))
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def __iter__(self):
+        where, params = translate(self.condition)
+        sql = "SELECT doc FROM {} WHERE {}".format(self.collection.table, where)
+        if self._sort:
+            sql += " ORDER BY " + ", ".join(
+                "{} {}".format(_field_expr(key), "DESC" if direction < 0 else "ASC")
+                for key, direction in self._sort
+            )
+        if self._limit:
+            sql += " LIMIT {:d}".format(self._limit)
+
+        for row in self.collection.database.execute(sql, params):
+            yield _apply_projection(json.loads(row[0]), self.projection)
+
+
+class SQLiteCollection(object):
+    """A collection stored as SQLite table of JSON documents, exposing
+    the subset of ``pymongo.collection.Collection`` API used by
+    :class:`~gluuengine.database.Database`.
+    """
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = _safe_name(name)
+        self.table = '"{}"'.format(self.name)
+
+    def with_options(self, **kwargs):
+        # read preference and alike are meaningless for embedded database
+        return self
+
+    def find(self, condition=None, projection=None):
+        return SQLiteCursor(self, condition, projection)
+
+    def find_one(self, condition=None, projection=None):
+        for doc in self.find(condition, projection).limit(1):
+            return doc
+
+    def count(self, condition=None):
+        where, params = translate(condition)
+        sql = "SELECT COUNT(*) FROM {} WHERE {}".format(self.table, where)
+        return self.database.execute(sql, params)[0][0]
+
+    def _first_pk(self, condition):
+        where, params = translate(condition)
+        sql = "SELECT pk, doc FROM {} WHERE {} LIMIT 1".format(self.table, where)
+        rows = self.database.execute(sql, params)
+        return rows[0] if rows else None
+
+    def _insert(self, doc):
+        doc = dict(doc)
+        doc.setdefault("_id", doc.get("id") or uuid.uuid4().hex)
+        try:
+            self.database.execute(
+                "INSERT INTO {} (pk, doc) VALUES (?, ?)".format(self.table),
+                [doc["_id"], json.dumps(doc)],
+            )
+        except sqlite3.IntegrityError as exc:
+            raise DuplicateKeyError(str(exc))
+
+    def _replace(self, condition, doc, upsert=False):
+        row = self._first_pk(condition)
+        if row is None:
+            if upsert:
+                self._insert(doc)
+            return int(upsert)
+
+        doc = dict(doc)
+        doc["_id"] = row[0]
+        self.database.execute(
+            "UPDATE {} SET doc = ? WHERE pk = ?".format(self.table),
+            [json.dumps(doc), row[0]],
+        )
+        return 1
+
+    def _delete(self, condition):
+        row = self._first_pk(condition)
+        if row is None:
+            return 0
+        self.database.execute(
+            "DELETE FROM {} WHERE pk = ?".format(self.table), [row[0]],
+        )
+        return 1
+
+    def insert_one(self, doc):
+        with self.database.lock:
+            self._insert(doc)
+
+    def update(self, condition, doc, upsert=False):
+        with self.database.lock:
+            return {"n": self._replace(condition, doc, upsert)}
+
+    def update_one(self, condition, update):
+        if set(update) != {"$set"}:
+            raise OperationFailure("only $set update is supported")
+
+        with self.database.lock:
+            row = self._first_pk(condition)
+            if row is None:
+                return UpdateResult({"n": 0, "nModified": 0}, True)
+
+            doc = json.loads(row[1])
+            updated = dict(doc, **update["$set"])
+            if updated == doc:
+                # like MongoDB, unchanged document isn't counted as modified
+                return UpdateResult({"n": 1, "nModified": 0}, True)
+
+            self.database.execute(
+                "UPDATE {} SET doc = ? WHERE pk = ?".format(self.table),
+                [json.dumps(updated), row[0]],
+            )
+            return UpdateResult({"n": 1, "nModified": 1}, True)
+
+    def delete_one(self, condition):
+        with self.database.lock:
+            self._delete(condition)
+
+    def bulk_write(self, requests, ordered=True):
+        # requests are ``pymongo.operations`` objects
+        with self.database.transaction():
+            for request in requests:
+                name = type(request).__name__
+                if name == "InsertOne":
+                    self._insert(request._doc)
+                elif name == "ReplaceOne":
+                    self._replace(request._filter, request._doc, request._upsert)
+                elif name == "DeleteOne":
+                    self._delete(request._filter)
+                else:
+                    raise OperationFailure(
+                        "unsupported bulk operation {}".format(name)
+                    )
+
+    def create_index(self, keys, **kwargs):
+        fields = [_safe_name(key) for key, _ in keys]
+        index_name = '"ix_{}_{}"'.format(self.name, "_".join(fields))
+        with self.database.lock:
+            self.database.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    index_name, self.table,
+                    ", ".join(_field_expr(field) for field in fields),
+                )
+            )
+
+    def aggregate(self, pipeline):
+        raise OperationFailure("aggregation is not supported by SQLite backend")
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("change streams are not supported by SQLite backend")
+
+
+class SQLiteDatabase(object):
+    """Embedded database storing each collection as SQLite table
+    of JSON documents.
+
+    The connection is shared by all threads; statements are serialized
+    by a lock.
+
+    :param path: Path to database file or ``:memory:``.
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            dirname = os.path.dirname(path)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+
+        self.path = path
+        self.lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._tables = set()
+
+        # allow concurrent readers from other gunicorn workers
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+
+    def __getitem__(self, name):
+        collection = SQLiteCollection(self, name)
+        if name not in self._tables:
+            with self.lock:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS {} "
+                    "(pk TEXT PRIMARY KEY, doc TEXT NOT NULL)".format(collection.table)
+                )
+                self._tables.add(name)
+        return collection
+
+    def execute(self, sql, params=()):
+        """Executes SQL statement.
+
+        :param sql: SQL statement.
+        :param params: Parameters of the statement.
+        :returns: A list of fetched rows.
+        """
+        # rows are fetched while holding the lock as the connection
+        # is shared by all threads
+        with self.lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def transaction(self):
+        return _Transaction(self)
+
+
+class _Transaction(object):
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        self.database.lock.acquire()
+        self.database.execute("BEGIN")
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.database.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.database.lock.release()
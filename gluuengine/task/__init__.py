@@ -4,3 +4,5 @@
 # All rights reserved.
 
 from .licensewatcher import LicenseWatcherTask  # noqa
+from .nodehealth import NodeHealthTask  # noqa
+from .singletonwatch import SingletonWatchTask  # noqa
@@ -110,7 +110,7 @@ class LicenseWatcherTask(object):
                 self.logger.info("license key has been updated")
                 break
 
-        with self.app.app_context():
+        with self.app.app_context(), db.unit_of_work():
             worker_nodes = license_key.get_workers()
 
             # cache the expiration state
@@ -146,7 +146,8 @@ class LicenseWatcherTask(object):
         with self.app.app_context():
             for container in containers:
                 container.state = STATE_DISABLED
-                db.update(container.id, container, "containers")
+                db.set_fields("containers", {"id": container.id},
+                              {"state": container.state})
 
                 self.machine.ssh(
                     node.name, "sudo docker stop {}".format(container.cid),
@@ -168,12 +169,15 @@ class LicenseWatcherTask(object):
 
             for container in containers:
                 container.state = STATE_SUCCESS
-                db.update(container.id, container, "containers")
+                db.set_fields("containers", {"id": container.id},
+                              {"state": container.state})
 
                 self.machine.ssh(
                     node.name, "sudo docker restart {}".format(container.cid),
                 )
-                weave.dns_add(container.cid, container.hostname)
-                weave.dns_add(container.cid, "{}.weave.local".format(type_))
+                weave.dns_add_many([
+                    (container.cid, container.hostname),
+                    (container.cid, "{}.weave.local".format(type_)),
+                ])
                 self.logger.info("{} container {} has been "
                                  "enabled".format(type_, container.id))
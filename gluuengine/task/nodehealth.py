@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import logging
+
+from crochet import run_in_reactor
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+
+from ..machine import Machine
+from ..machine import node_health
+
+# Default interval when running periodic task (in seconds)
+TASK_INTERVAL = 10
+
+
+class NodeHealthTask(object):
+    def __init__(self, app, table=None):
+        self.logger = logging.getLogger(
+            __name__ + "." + self.__class__.__name__,
+        )
+        self.app = app
+        self.machine = Machine()
+        self.table = node_health if table is None else table
+        self.interval = app.config.get("NODE_HEALTH_INTERVAL", TASK_INTERVAL)
+
+    @run_in_reactor
+    def perform_job(self):
+        """An entrypoint of this task class.
+        """
+        # callback to handle error
+        def on_error(failure):
+            self.logger.error(failure.getTraceback())
+
+        # table is considered stale after few missed polls
+        self.table.max_age = self.interval * 3
+
+        # ``docker-machine ls`` is blocking, hence it runs in a thread
+        # to keep the reactor responsive
+        lc = LoopingCall(deferToThread, self.poll)
+        deferred = lc.start(self.interval, now=True)
+        deferred.addErrback(on_error)
+
+    def poll(self):
+        """Refreshes health table using a single ``docker-machine ls`` call.
+        """
+        try:
+            machines = self.machine.ls()
+        except RuntimeError as exc:
+            self.logger.warn("unable to list nodes; reason={}".format(exc))
+            return
+        self.table.update(machines)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import logging
+import threading
+
+from pymongo.errors import PyMongoError
+
+from ..database import db
+from ..modelcache import singletons
+
+#: Collections whose changes invalidate cached singletons
+WATCHED_TABLES = ("clusters", "nodes",)
+
+
+class SingletonWatchTask(object):
+    """Invalidates cached cluster and nodes as soon as other processes
+    change them, using MongoDB change streams.
+
+    Change streams require replica set deployment; if unavailable, cached
+    objects are refreshed after ``SINGLETON_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self, app, cache=None):
+        self.logger = logging.getLogger(
+            __name__ + "." + self.__class__.__name__,
+        )
+        self.app = app
+        self.cache = singletons if cache is None else cache
+
+    def perform_job(self):
+        """An entrypoint of this task class.
+        """
+        # change streams block forever, hence each of them runs
+        # in its own thread instead of reactor's threadpool
+        for table_name in WATCHED_TABLES:
+            thread = threading.Thread(target=self.watch, args=(table_name,))
+            thread.daemon = True
+            thread.start()
+
+    def watch(self, table_name):
+        """Invalidates cached objects on every change of a collection.
+
+        :param table_name: Name of the collection.
+        """
+        try:
+            with self.app.app_context():
+                with db.db[table_name].watch() as stream:
+                    for _ in stream:
+                        self.cache.invalidate(table_name)
+        except (PyMongoError, AttributeError) as exc:
+            # ``AttributeError`` is raised by pymongo lacking change streams
+            self.logger.warn(
+                "unable to watch changes of {}; cached objects expire "
+                "after TTL instead; reason={}".format(table_name, exc)
+            )
+            self.cache.invalidate(table_name)
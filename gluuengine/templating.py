@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import codecs
+import logging
+import os
+import threading
+
+from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
+from jinja2 import PackageLoader
+
+
+class TemplateCache(object):
+    """Process-wide cache of templates.
+
+    Jinja templates are compiled once per process by a shared
+    :class:`jinja2.Environment`; compiled bytecode is stored in
+    ``JINJA_BYTECODE_CACHE_DIR`` (if any), hence other worker processes
+    don't need to compile the same templates again.
+
+    Non-jinja (``%``-style) templates are kept in memory and reloaded
+    only when their modification time changes.
+    """
+
+    def __init__(self):
+        self.bytecode_cache_dir = None
+        self.logger = logging.getLogger(
+            __name__ + "." + self.__class__.__name__,
+        )
+
+        self._env = None
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the cache from Flask app's config.
+
+        :param app: An instance of :class:`flask.Flask`.
+        """
+        with self._lock:
+            self.bytecode_cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+            self._env = None
+
+    @property
+    def jinja_env(self):
+        """Shared jinja environment.
+        """
+        with self._lock:
+            if self._env is None:
+                self._env = Environment(
+                    loader=PackageLoader("gluuengine", "templates"),
+                    bytecode_cache=self._make_bytecode_cache(),
+                )
+            return self._env
+
+    def read_template(self, path):
+        """Reads content of non-jinja template.
+
+        :param path: Absolute path to template.
+        :returns: Unicode string of template's content.
+        """
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            cached = self._sources.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with codecs.open(path, "r", encoding="utf-8") as fp:
+            content = fp.read()
+
+        with self._lock:
+            self._sources[path] = (mtime, content)
+        return content
+
+    def clear(self):
+        """Removes all cached templates (including compiled bytecode).
+        """
+        with self._lock:
+            self._sources.clear()
+            if self._env is not None:
+                self._env.cache.clear()
+                if self._env.bytecode_cache is not None:
+                    self._env.bytecode_cache.clear()
+
+    def _make_bytecode_cache(self):
+        if not self.bytecode_cache_dir:
+            return None
+
+        try:
+            if not os.path.exists(self.bytecode_cache_dir):
+                os.makedirs(self.bytecode_cache_dir)
+        except OSError as exc:
+            self.logger.warn("unable to use jinja bytecode cache "
+                             "directory; reason={}".format(exc))
+            return None
+        return FileSystemBytecodeCache(self.bytecode_cache_dir)
+
+
+#: Templates shared by all setup and helper objects
+templates = TemplateCache()
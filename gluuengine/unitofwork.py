@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015 Gluu
+#
+# All rights reserved.
+
+import json
+
+
+def query_key(kind, *args):
+    """Builds a hashable key of a query.
+
+    :param kind: Kind of the query, e.g. ``get`` or ``search``.
+    :param args: Query arguments (e.g. condition).
+    :returns: A string of query key.
+    """
+    return json.dumps([kind] + list(args), sort_keys=True, default=str)
+
+
+class UnitOfWork(object):
+    """Identity map of model objects loaded within a unit of work
+    (e.g. a request or a task run).
+
+    Repeated queries return the same model objects instead of hitting
+    database again; each model object (identified by its ``id``) is loaded
+    once per unit of work. Any write to a collection discards
+    the collection's entries.
+    """
+
+    def __init__(self):
+        # a mapping of collection name and ``{id: object}``
+        self._objects = {}
+
+        # a mapping of collection name and ``{query_key: [id, ...]}``
+        self._queries = {}
+
+    def get_query(self, table_name, key):
+        """Gets model objects of a query loaded earlier.
+
+        :param table_name: Name of the collection.
+        :param key: Query key (see :func:`query_key`).
+        :returns: A list of model objects or ``None`` if query hasn't
+                  been executed yet.
+        """
+        ids = self._queries.get(table_name, {}).get(key)
+        if ids is None:
+            return None
+
+        objects = self._objects.get(table_name, {})
+        return [objects[id_] for id_ in ids]
+
+    def set_query(self, table_name, key, objs):
+        """Stores model objects of a query.
+
+        Objects already in identity map take precedence over the newly
+        loaded ones, hence each ``id`` maps to a single object.
+
+        :param table_name: Name of the collection.
+        :param key: Query key (see :func:`query_key`).
+        :param objs: A list of loaded model objects.
+        :returns: A list of model objects from identity map.
+        """
+        objects = self._objects.setdefault(table_name, {})
+        result = [objects.setdefault(obj.id, obj) for obj in objs]
+        self._queries.setdefault(table_name, {})[key] = [obj.id for obj in result]
+        return result
+
+    def invalidate(self, table_name):
+        """Discards entries of a collection.
+
+        :param table_name: Name of the collection.
+        """
+        self._objects.pop(table_name, None)
+        self._queries.pop(table_name, None)
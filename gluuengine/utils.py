@@ -4,14 +4,17 @@
 # All rights reserved.
 
 import base64
+import errno
+import fcntl
 import hashlib
+import io
 import json
 import os
 import random
 import string
 import sys
 import tarfile
-import tempfile
+import time
 import traceback
 import uuid
 from subprocess import Popen
@@ -179,6 +182,41 @@ def po_run(cmd_str, raise_error=True):
         raise RuntimeError("return code {}: {}".format(exc.errno, exc.strerror))
 
 
+#: runfiles claimed by current process; kept open to hold their locks
+_claimed_runfiles = {}
+
+
+def claim_runfile(path):
+    """Claims a task which must run in a single process, e.g. a single
+    gunicorn worker.
+
+    The runfile is locked as long as the claiming process is alive, hence
+    runfile left by a killed process doesn't prevent others from claiming
+    the task.
+
+    :param path: Path to the runfile.
+    :returns: ``True`` if the task is claimed by current process,
+              otherwise ``False``.
+    """
+    if path in _claimed_runfiles:
+        return True
+
+    f = open(path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError as exc:
+        f.close()
+        if exc.errno in (errno.EAGAIN, errno.EACCES):
+            return False
+        raise
+
+    f.truncate(0)
+    f.write(str(os.getpid()))
+    f.flush()
+    _claimed_runfiles[path] = f
+    return True
+
+
 def as_boolean(val, default=False):
     truthy = set(('t', 'T', 'true', 'True', 'TRUE', '1', 1, True))
     falsy = set(('f', 'F', 'false', 'False', 'FALSE', '0', 0, 0.0, False))
@@ -190,13 +228,68 @@ def as_boolean(val, default=False):
     return default
 
 
-def make_tarfile(src):
+def make_tarfile(src, arcname=None, mode=None, uid=None, gid=None):
+    """Creates in-memory tar archive of a file or directory.
+
+    :param src: Path to local file or directory.
+    :param arcname: Path of ``src`` inside the archive; defaults to
+                    basename of ``src``.
+    :param mode: Permission bits for archived files; if omitted,
+                 permission bits of local files are used.
+    :param uid: Owner ID of archived files (if any).
+    :param gid: Group ID of archived files (if any).
+    :returns: A file-like object of tar archive.
+    """
     abspath = os.path.abspath(src)
     recursive = os.path.isdir(abspath)
 
-    fd = tempfile.NamedTemporaryFile()
+    def _set_attrs(tarinfo):
+        if uid is not None:
+            tarinfo.uid = uid
+            tarinfo.uname = ""
+        if gid is not None:
+            tarinfo.gid = gid
+            tarinfo.gname = ""
+        if mode is not None and tarinfo.isfile():
+            tarinfo.mode = mode
+        return tarinfo
+
+    fd = io.BytesIO()
     tf = tarfile.open(mode="w", fileobj=fd)
-    tf.add(abspath, arcname=os.path.basename(src), recursive=recursive)
+    tf.add(abspath, arcname=arcname or os.path.basename(src),
+           recursive=recursive, filter=_set_attrs)
+    tf.close()
+    fd.seek(0)
+    return fd
+
+
+def make_data_tarfile(files, uid=None, gid=None):
+    """Creates in-memory tar archive of file contents.
+
+    :param files: A list of ``(path, content, mode)`` tuples; if ``mode``
+                  is ``None``, ``0644`` is used.
+    :param uid: Owner ID of archived files (if any).
+    :param gid: Group ID of archived files (if any).
+    :returns: A file-like object of tar archive.
+    """
+    fd = io.BytesIO()
+    tf = tarfile.open(mode="w", fileobj=fd)
+    mtime = time.time()
+
+    for path, content, mode in files:
+        if isinstance(content, unicode):
+            content = content.encode("utf-8")
+
+        tarinfo = tarfile.TarInfo(path.lstrip("/"))
+        tarinfo.size = len(content)
+        tarinfo.mtime = mtime
+        tarinfo.mode = 0o644 if mode is None else mode
+        if uid is not None:
+            tarinfo.uid = uid
+        if gid is not None:
+            tarinfo.gid = gid
+        tf.addfile(tarinfo, io.BytesIO(content))
+
     tf.close()
     fd.seek(0)
     return fd
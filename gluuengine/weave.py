@@ -4,6 +4,7 @@
 # All rights reserved.
 
 import re
+import threading
 
 from .database import db
 from .machine import Machine
@@ -12,6 +13,21 @@ from .machine import Machine
 # whereas newer weave dns-args returns --dns=x.x.x.x --dns-search=weave.local.
 DNS_ARGS_RE = re.compile(r"--dns[=|\s](.+) --dns-search=(.+)")
 
+# a mapping of node name and its DNS arguments; the arguments only change
+# when weave is relaunched, hence they're cached for process lifetime
+_dns_args_cache = {}
+_dns_args_lock = threading.Lock()
+
+
+def invalidate_dns_args(node_name):
+    """Removes cached DNS arguments of a node. Must be called
+    after (re)launching weave.
+
+    :param node_name: Name of the node.
+    """
+    with _dns_args_lock:
+        _dns_args_cache.pop(node_name, None)
+
 
 class Weave(object):
     def __init__(self, node, app):
@@ -19,17 +35,8 @@ class Weave(object):
         self.app = app
 
         with self.app.app_context():
-            try:
-                self.master_node = db.search_from_table(
-                    "nodes", {"type": "master"},
-                )[0]
-            except IndexError:
-                self.master_node = None
-
-            try:
-                self.cluster = db.all("clusters")[0]
-            except IndexError:
-                self.cluster = None
+            self.master_node = db.get_master_node()
+            self.cluster = db.get_cluster()
 
         self.machine = Machine()
         self.weave_encryption = self.app.config['WEAVE_ENCRYPTION']
@@ -58,7 +65,20 @@ class Weave(object):
         :param node_id: ID of the container/node.
         :param domain_name: Local domain name.
         """
-        dns_cmd = "sudo weave dns-add {} -h {}".format(container_id, hostname)
+        self.dns_add_many([(container_id, hostname,)])
+
+    def dns_add_many(self, entries):
+        """Adds entries to weave DNS in a single remote invocation.
+
+        :param entries: A list of ``(container_id, hostname)`` tuples.
+        """
+        if not entries:
+            return
+
+        dns_cmd = " && ".join(
+            "sudo weave dns-add {} -h {}".format(container_id, hostname)
+            for container_id, hostname in entries
+        )
         self.machine.ssh(self.node.name, dns_cmd)
 
     def docker_bridge_ip(self):  # pragma: no cover
@@ -67,10 +87,16 @@ class Weave(object):
         return self.machine.ssh(self.node.name, "sudo weave docker-bridge-ip")
 
     def dns_args(self):
-        """Gets DNS arguments.
+        """Gets DNS arguments. The result is cached per node until
+        :func:`invalidate_dns_args` is called.
 
         :returns: A tuple consists of docker bridge IP and DNS search
         """
+        with _dns_args_lock:
+            cached = _dns_args_cache.get(self.node.name)
+        if cached:
+            return cached
+
         bridge_ip = None
         dns_search = None
         output = self.machine.ssh(self.node.name, "sudo weave dns-args")
@@ -78,4 +104,6 @@ class Weave(object):
         rgx = DNS_ARGS_RE.match(output)
         if rgx:
             bridge_ip, dns_search = rgx.groups()
+            with _dns_args_lock:
+                _dns_args_cache[self.node.name] = (bridge_ip, dns_search,)
         return bridge_ip, dns_search
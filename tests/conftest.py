@@ -24,12 +24,16 @@ def app(request):
 @pytest.fixture()
 def db(request, app):
     from gluuengine.database import db
+    from gluuengine.sqlitedb import is_sqlite_uri
+    from gluuengine.sqlitedb import path_from_uri
 
     db.init_app(app)
 
     def teardown():
+        if not is_sqlite_uri(app.config["DATABASE_URI"]):
+            return
         try:
-            os.unlink(app.config["DATABASE_URI"])
+            os.unlink(path_from_uri(app.config["DATABASE_URI"]))
         except OSError:
             pass
 
@@ -372,6 +376,30 @@ def patched_exec_cmd(monkeypatch):
     )
 
 
+@pytest.fixture()
+def patched_exec_batch(monkeypatch):
+    from gluuengine.dockerclient._docker import DockerExecResult
+
+    monkeypatch.setattr(
+        "gluuengine.dockerclient.Docker.exec_batch",
+        lambda cls, container, cmds, stop_on_error=True: [
+            DockerExecResult(cmd, 0, "") for cmd in cmds
+        ],
+    )
+
+
+@pytest.fixture()
+def patched_put_files(monkeypatch):
+    archives = []
+
+    def put_files(cls, container, files):
+        archives.append(files)
+        return [dest for dest, _, _ in files]
+
+    monkeypatch.setattr("gluuengine.dockerclient.Docker.put_files", put_files)
+    return archives
+
+
 @pytest.fixture()
 def base_setup(monkeypatch, app, db, swarm_config,
                cluster, ldap_container, master_node):
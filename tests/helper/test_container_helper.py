@@ -0,0 +1,98 @@
+class FakeWeave(object):
+    def __init__(self, node, app):
+        self.dns_entries = []
+
+    def dns_args(self):
+        return "172.17.0.1", "weave.local."
+
+    def dns_add_many(self, entries):
+        self.dns_entries.extend(entries)
+
+
+def test_mp_setup_resume(monkeypatch, app, db, swarm_config,
+                         cluster, master_node, ldap_container):
+    from gluuengine.helper.container_helper import BaseContainerHelper
+    from gluuengine.model import STATE_FAILED
+    from gluuengine.model import STATE_SUCCESS
+    from gluuengine.setup.base import BaseSetup
+    from gluuengine.setup.steps import Step
+
+    calls = []
+
+    class FakeSetup(BaseSetup):
+        def setup(self):
+            self.run_steps([
+                Step("setup_opendj", lambda: calls.append("setup_opendj")),
+                Step("reload_supervisor",
+                     lambda: calls.append("reload_supervisor"),
+                     requires=["setup_opendj"], checkpoint=False),
+                Step("configure_opendj",
+                     lambda: calls.append("configure_opendj"),
+                     requires=["reload_supervisor"]),
+            ])
+
+    class FakeHelper(BaseContainerHelper):
+        setup_class = FakeSetup
+
+    monkeypatch.setattr(
+        "gluuengine.machine.Machine.config",
+        lambda cls, name: {},
+    )
+    monkeypatch.setattr(
+        "gluuengine.machine.Machine.swarm_config",
+        lambda cls, name: swarm_config,
+    )
+    monkeypatch.setattr(
+        "gluuengine.dockerclient.Docker.start_container",
+        lambda cls, container_id: calls.append("start " + container_id),
+    )
+    monkeypatch.setattr(
+        "gluuengine.dockerclient.Docker.setup_container",
+        lambda cls, **kwargs: calls.append("create"),
+    )
+    monkeypatch.setattr(
+        "gluuengine.helper.container_helper.Weave", FakeWeave,
+    )
+    monkeypatch.setattr(
+        "gluuengine.helper.container_helper.distribute_cluster_data",
+        lambda app, node: None,
+    )
+
+    # container stopped by previous (failed) attempt
+    ldap_container.cid = "123"
+    ldap_container.hostname = "123.ldap.weave.local"
+    ldap_container.state = STATE_FAILED
+    ldap_container.setup_steps = ["setup_opendj"]
+    db.persist(cluster, "clusters")
+    db.persist(master_node, "nodes")
+    db.persist(ldap_container, "containers")
+
+    helper = FakeHelper(ldap_container, app)
+    helper.mp_setup(resume=True)
+
+    # existing container is restarted and finished steps are skipped
+    assert calls == ["start 123", "reload_supervisor", "configure_opendj"]
+
+    with app.app_context():
+        container = db.get(ldap_container.id, "containers")
+    assert container.state == STATE_SUCCESS
+    assert container.cid == "123"
+    assert container.setup_steps == ["setup_opendj", "configure_opendj"]
+
+
+def test_recover_container_job(app, db, ldap_container):
+    from gluuengine.helper.container_helper import container_job
+    from gluuengine.helper.container_helper import recover_container_job
+    from gluuengine.model import STATE_FAILED
+    from gluuengine.model import STATE_IN_PROGRESS
+
+    ldap_container.state = STATE_IN_PROGRESS
+    db.persist(ldap_container, "containers")
+
+    # setup interrupted by dead dispatcher can be resumed
+    _, _, args, _, _ = container_job("setup", ldap_container, "setup.log")
+    recover_container_job(app, args)
+
+    with app.app_context():
+        container = db.get(ldap_container.id, "containers")
+    assert container.state == STATE_FAILED
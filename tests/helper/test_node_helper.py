@@ -0,0 +1,77 @@
+import pytest
+
+
+class FakeMachine(object):
+    def __init__(self, running):
+        self.running = running
+        self.checked = []
+
+    def status(self, machine_name):
+        self.checked.append(machine_name)
+        return machine_name in self.running
+
+
+@pytest.mark.parametrize("running, reachable, message", [
+    (["worker-node", "master-node", "discovery-node"], True, ""),
+    (["master-node", "discovery-node"], False,
+     "access denied due to target node being unreachable"),
+    (["worker-node", "discovery-node"], False,
+     "access denied due to master node being unreachable"),
+    (["worker-node", "master-node"], False,
+     "access denied due to discovery node being unreachable"),
+])
+def test_check_nodes_reachable(monkeypatch, master_node, worker_node,
+                               discovery_node, running, reachable, message):
+    from gluuengine.helper import check_nodes_reachable
+
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_master_node", lambda: master_node,
+    )
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_discovery_node", lambda: discovery_node,
+    )
+    machine = FakeMachine(running)
+    assert check_nodes_reachable(worker_node, machine) == (reachable, message)
+    assert sorted(machine.checked) == sorted([
+        "worker-node", "master-node", "discovery-node",
+    ])
+
+
+def test_check_nodes_reachable_dedup(monkeypatch, master_node, discovery_node):
+    from gluuengine.helper import check_nodes_reachable
+
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_master_node", lambda: master_node,
+    )
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_discovery_node", lambda: discovery_node,
+    )
+    machine = FakeMachine(["master-node", "discovery-node"])
+    assert check_nodes_reachable(master_node, machine) == (True, "")
+
+    # master node is checked once although it's also the target node
+    assert machine.checked.count("master-node") == 1
+
+
+def test_check_nodes_reachable_missing_discovery(monkeypatch, master_node):
+    from gluuengine.helper import check_nodes_reachable
+
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_master_node", lambda: master_node,
+    )
+    monkeypatch.setattr(
+        "gluuengine.database.db.get_discovery_node", lambda: None,
+    )
+    machine = FakeMachine(["master-node"])
+    assert check_nodes_reachable(master_node, machine) == (
+        False, "access denied due to discovery node being unreachable",
+    )
+
+
+def test_status_executor_init_app(app):
+    from gluuengine.helper.node_helper import StatusExecutor
+
+    executor = StatusExecutor()
+    executor.init_app(app)
+    assert executor.max_workers == app.config["NODE_STATUS_WORKERS"]
+    assert executor.submit(len, [1, 2]).result() == 2
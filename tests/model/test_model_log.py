@@ -14,3 +14,13 @@ def test_get_log(db, container_log, ldap_container):
     ldap_container.name = "ldap-123"
     db.persist(ldap_container, "containers")
     assert ContainerLog.create_or_get(ldap_container)
+
+
+def test_log_from_container(ldap_container):
+    from gluuengine.model import ContainerLog
+
+    ldap_container.name = "ldap-123"
+    container_log = ContainerLog.from_container(ldap_container)
+    assert container_log.id == "ldap-123"
+    assert container_log.setup_log == "ldap-123-setup.log"
+    assert container_log.teardown_log == "ldap-123-teardown.log"
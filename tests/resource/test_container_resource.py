@@ -0,0 +1,168 @@
+def test_container_resume_not_found(app, db):
+    resp = app.test_client().post("/containers/random-id/resume")
+    assert resp.status_code == 404
+
+
+def test_container_resume_not_failed(app, db, ldap_container):
+    from gluuengine.model import STATE_SUCCESS
+
+    ldap_container.state = STATE_SUCCESS
+    db.persist(ldap_container, "containers")
+
+    resp = app.test_client().post(
+        "/containers/{}/resume".format(ldap_container.id),
+    )
+    assert resp.status_code == 403
+
+
+def test_container_resume_once(monkeypatch, app, db, master_node,
+                               ldap_container):
+    from gluuengine.model import STATE_FAILED
+    from gluuengine.model import STATE_IN_PROGRESS
+    from gluuengine.resource.container import get_container
+
+    monkeypatch.setattr(
+        "gluuengine.resource.container.check_nodes_reachable",
+        lambda node: (True, ""),
+    )
+
+    ldap_container.state = STATE_FAILED
+    db.persist(master_node, "nodes")
+    db.persist(ldap_container, "containers")
+
+    # container is resumed by other request after it has been read
+    def resumed_container(db, container_id):
+        container = get_container(db, container_id)
+        db.set_fields("containers", {"name": container.name},
+                      {"state": STATE_IN_PROGRESS})
+        return container
+
+    monkeypatch.setattr(
+        "gluuengine.resource.container.get_container", resumed_container,
+    )
+
+    resp = app.test_client().post(
+        "/containers/{}/resume".format(ldap_container.id),
+    )
+    assert resp.status_code == 403
+
+    with app.app_context():
+        assert db.count_from_table("jobs", {"name": "resume ldap-node"}) == 0
+
+
+def test_container_resume_busy(monkeypatch, app, db, master_node,
+                               ldap_container):
+    from gluuengine.model import ContainerLog
+    from gluuengine.model import STATE_FAILED
+    from gluuengine.model import STATE_SETUP_FINISHED
+    from gluuengine.scheduler import SchedulerBusy
+
+    def submit(*args, **kwargs):
+        raise SchedulerBusy("deployment queue is full")
+
+    monkeypatch.setattr(
+        "gluuengine.resource.container.check_nodes_reachable",
+        lambda node: (True, ""),
+    )
+    monkeypatch.setattr("gluuengine.scheduler.scheduler.submit", submit)
+
+    ldap_container.state = STATE_FAILED
+    container_log = ContainerLog.from_container(ldap_container)
+    container_log.state = STATE_SETUP_FINISHED
+    db.persist(master_node, "nodes")
+    db.persist(ldap_container, "containers")
+    db.persist(container_log, "container_logs")
+
+    resp = app.test_client().post(
+        "/containers/{}/resume".format(ldap_container.id),
+    )
+    assert resp.status_code == 429
+
+    # container can be resumed later
+    with app.app_context():
+        assert db.get(ldap_container.id, "containers").state == STATE_FAILED
+        assert db.get(container_log.id, "container_logs").state == \
+            STATE_SETUP_FINISHED
+
+
+def test_scale_node_id_pool(monkeypatch, app, db, master_node, worker_node,
+                            oxauth_container):
+    from gluuengine.model import STATE_IN_PROGRESS
+    from gluuengine.resource.container import ScaleContainerResource
+
+    monkeypatch.setattr(
+        ScaleContainerResource, "get_running_nodes",
+        lambda self: [master_node.name, worker_node.name],
+    )
+
+    # container deployed to master node by other process
+    oxauth_container.state = STATE_IN_PROGRESS
+    db.persist(oxauth_container, "containers")
+
+    with app.app_context():
+        pool = ScaleContainerResource().make_node_id_pool(
+            [master_node, worker_node],
+        )
+    assert next(pool) == worker_node.id
+
+
+def test_container_delete_busy(monkeypatch, app, db, master_node,
+                               ldap_container):
+    from gluuengine.model import ContainerLog
+    from gluuengine.model import STATE_SETUP_FINISHED
+    from gluuengine.model import STATE_SUCCESS
+    from gluuengine.scheduler import SchedulerBusy
+
+    def submit(*args, **kwargs):
+        raise SchedulerBusy("deployment queue is full")
+
+    monkeypatch.setattr(
+        "gluuengine.resource.container.check_nodes_reachable",
+        lambda node: (True, ""),
+    )
+    monkeypatch.setattr("gluuengine.scheduler.scheduler.submit", submit)
+
+    ldap_container.state = STATE_SUCCESS
+    container_log = ContainerLog.from_container(ldap_container)
+    container_log.state = STATE_SETUP_FINISHED
+    db.persist(master_node, "nodes")
+    db.persist(ldap_container, "containers")
+    db.persist(container_log, "container_logs")
+
+    resp = app.test_client().delete(
+        "/containers/{}".format(ldap_container.id),
+    )
+    assert resp.status_code == 429
+
+    # rejected teardown leaves container and its log untouched
+    with app.app_context():
+        assert db.get(ldap_container.id, "containers")
+        assert db.get(container_log.id, "container_logs").state == \
+            STATE_SETUP_FINISHED
+
+
+def test_scale_cancel_delete(app, db, ldap_container, oxauth_container):
+    from gluuengine.model import ContainerLog
+    from gluuengine.model import STATE_SETUP_FINISHED
+    from gluuengine.resource.container import ScaleContainerResource
+
+    oxauth_container.name = "oxauth-node"
+    container_log = ContainerLog.from_container(ldap_container)
+    container_log.state = STATE_SETUP_FINISHED
+    db.persist(ldap_container, "containers")
+    db.persist(oxauth_container, "containers")
+    db.persist(container_log, "container_logs")
+
+    resource = ScaleContainerResource()
+    with app.app_context():
+        prepared, previous_states = resource.prepare_delete(
+            [ldap_container, oxauth_container],
+        )
+        resource.cancel_delete(prepared, previous_states)
+
+        assert len(db.all("containers")) == 2
+        # existing log is restored while the new one is removed
+        assert [
+            (log.container_name, log.state)
+            for log in db.all("container_logs")
+        ] == [("ldap-node", STATE_SETUP_FINISHED)]
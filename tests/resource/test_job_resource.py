@@ -0,0 +1,26 @@
+import json
+
+
+def test_job_list(app, db):
+    resp = app.test_client().get("/jobs")
+    actual_data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert "jobs" in actual_data
+    assert actual_data["stats"]["max_workers"] == app.config["DEPLOY_MAX_WORKERS"]
+
+
+def test_job_get(app, db):
+    from gluuengine.scheduler import scheduler
+
+    # job submitted by other process is read from database
+    with app.app_context():
+        job = scheduler.submit("noop", "noop")
+    resp = app.test_client().get("/jobs/{}".format(job.id))
+    assert resp.status_code == 200
+    assert json.loads(resp.data)["name"] == "noop"
+
+
+def test_job_get_not_found(app, db):
+    resp = app.test_client().get("/jobs/random-id")
+    assert resp.status_code == 404
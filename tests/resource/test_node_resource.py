@@ -438,3 +438,21 @@ def test_delete_node_log(app, db, node_log):
 def test_delete_node_log_not_found(app):
     resp = app.test_client().delete("/node_logs/random")
     assert resp.status_code == 404
+
+
+def test_node_health(monkeypatch, app):
+    monkeypatch.setattr(
+        "gluuengine.machine.Machine.ls",
+        lambda cls: [
+            {"Name": "worker-node", "State": "Stopped"},
+            {"Name": "master-node", "State": "Running"},
+        ],
+    )
+    monkeypatch.setattr("gluuengine.machine.node_health.updated_at", None)
+
+    resp = app.test_client().get("/nodes/health")
+    actual_data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert [item["name"] for item in actual_data] == ["master-node", "worker-node"]
+    assert actual_data[0]["state"] == "Running"
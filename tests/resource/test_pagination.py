@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+
+def test_page_token():
+    from gluuengine.resource.pagination import decode_page_token
+    from gluuengine.resource.pagination import encode_page_token
+
+    token = encode_page_token("ldap-1")
+    assert "ldap-1" not in token
+    assert decode_page_token(token) == "ldap-1"
+
+
+@pytest.mark.parametrize("token", ["random", "e30=", u"é"])
+def test_page_token_invalid(token):
+    from gluuengine.resource.pagination import decode_page_token
+
+    with pytest.raises(ValueError):
+        decode_page_token(token)
+
+
+@pytest.mark.parametrize("limit", ["0", "abc", "100000"])
+def test_list_invalid_limit(app, limit):
+    resp = app.test_client().get("/containers?limit={}".format(limit))
+    assert resp.status_code == 400
+    assert "message" in json.loads(resp.data)
+
+
+def test_list_invalid_page_token(app):
+    resp = app.test_client().get("/nodes?limit=10&after=random")
+    assert resp.status_code == 400
+
+
+def _persist_objects(db, table_name):
+    from gluuengine.model import ContainerLog
+    from gluuengine.model import LdapContainer
+    from gluuengine.model import WorkerNode
+
+    ids = []
+    for idx in range(5):
+        if table_name == "containers":
+            obj = LdapContainer()
+            obj.name = "ldap-{}".format(idx)
+        elif table_name == "nodes":
+            obj = WorkerNode()
+            obj.name = "worker-{}".format(idx)
+        else:
+            obj = ContainerLog()
+            obj.id = obj.container_name = "ldap-{}".format(idx)
+        db.persist(obj, table_name)
+        ids.append(obj.id)
+    return sorted(ids)
+
+
+LIST_ENDPOINTS = [
+    ("/containers", "containers"),
+    ("/nodes", "nodes"),
+    ("/container_logs", "container_logs"),
+]
+
+
+@pytest.mark.parametrize("url, table_name", LIST_ENDPOINTS)
+def test_list_pages(app, db, url, table_name):
+    ids = _persist_objects(db, table_name)
+    client = app.test_client()
+
+    pages = []
+    resp = client.get("{}?limit=2".format(url))
+    while True:
+        assert resp.status_code == 200
+        pages.append([item["id"] for item in json.loads(resp.data)])
+
+        token = resp.headers.get("X-Next-Page-Token")
+        if not token:
+            break
+        resp = client.get("{}?limit=2&after={}".format(url, token))
+
+    assert pages == [ids[:2], ids[2:4], ids[4:]]
+
+
+@pytest.mark.parametrize("url, table_name", LIST_ENDPOINTS)
+@pytest.mark.parametrize("query, headers", [
+    ("?stream=1", {}),
+    ("", {"Accept": "application/x-ndjson"}),
+])
+def test_list_stream(app, db, url, table_name, query, headers):
+    ids = _persist_objects(db, table_name)
+
+    resp = app.test_client().get(url + query, headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in resp.data.splitlines() if line]
+    assert [row["id"] for row in rows] == ids
@@ -8,22 +8,52 @@ def test_remove_build_dir(base_setup):
     assert os.path.exists(base_setup.build_dir) is False
 
 
-def test_render_template(patched_po_run, base_setup):
+def test_render_template(base_setup, patched_put_files):
     src = "tests/setup/fake_template.txt"
-    dest = os.path.join(base_setup.build_dir, "fake_template.txt")
+    dest = "/etc/fake_template.txt"
     ctx = {"name": "johndoe"}
-    base_setup.render_template(src, dest, ctx)
+    base_setup.render_template(src, dest, ctx, mode=0o755)
 
-    assert os.path.exists(dest)
-    assert "johndoe" in open(dest, "r").read()
-    os.unlink(dest)
+    path, content, mode = patched_put_files[0][0]
+    assert path == dest
+    assert "johndoe" in content
+    assert mode == 0o755
 
 
-def test_gen_cert(base_setup, patched_exec_cmd):
+def test_render_bundle(base_setup, patched_put_files):
+    src = "tests/setup/fake_template.txt"
+    ctx = {"name": "johndoe"}
+
+    with base_setup.render_bundle():
+        base_setup.render_template(src, "/etc/a.txt", ctx)
+        # nested bundle is merged into the outermost one
+        with base_setup.render_bundle():
+            base_setup.put_file("/etc/b.txt", "b")
+        assert patched_put_files == []
+
+    # all files are uploaded at once
+    assert len(patched_put_files) == 1
+    assert [f[0] for f in patched_put_files[0]] == ["/etc/a.txt", "/etc/b.txt"]
+
+
+def test_render_bundle_error(base_setup, patched_put_files):
+    import pytest
+
+    with pytest.raises(RuntimeError):
+        with base_setup.render_bundle():
+            base_setup.put_file("/etc/a.txt", "a")
+            raise RuntimeError("failed")
+
+    # nothing is uploaded and bundle is reset
+    assert patched_put_files == []
+    assert base_setup._bundle is None
+
+
+def test_gen_cert(base_setup, patched_exec_batch):
     base_setup.gen_cert("ldap", "secret", "root", "root", "localhost")
 
 
-def test_change_cert_access(base_setup, patched_exec_cmd):
+def test_change_cert_access(base_setup, patched_exec_batch):
     base_setup.change_cert_access("root", "root")
 
 
@@ -48,7 +78,7 @@ def test_render_jinja_template(base_setup):
     assert "johndoe" in txt
 
 
-def test_copy_rendered_jinja_template(base_setup, patched_po_run):
+def test_copy_rendered_jinja_template(base_setup, patched_put_files):
     import os
     from jinja2 import Environment
     from jinja2 import FileSystemLoader
@@ -58,8 +88,9 @@ def test_copy_rendered_jinja_template(base_setup, patched_po_run):
     )
     src = "fake_jinja_template.txt"
     ctx = {"name": "johndoe"}
-    dest = os.path.join(base_setup.build_dir, "fake_jinja_template.txt")
+    dest = "/etc/fake_jinja_template.txt"
     base_setup.copy_rendered_jinja_template(src, dest, ctx)
+    assert "johndoe" in patched_put_files[0][0][1]
 
 
 def test_reload_supervisor(base_setup, patched_exec_cmd, patched_sleep):
@@ -74,16 +105,17 @@ def test_ldap_failover_hostname(monkeypatch, base_setup):
     assert base_setup.ldap_failover_hostname() == "ldap.weave.local"
 
 
-def test_write_salt_file(ox_setup, patched_po_run):
+def test_write_salt_file(ox_setup, patched_put_files):
     ox_setup.write_salt_file()
+    assert patched_put_files[0][0][1].startswith("encodeSalt = ")
 
 
-def test_gen_keystore(ox_setup, patched_po_run, patched_exec_cmd):
+def test_gen_keystore(ox_setup, patched_po_run, patched_exec_batch):
     ox_setup.gen_keystore("shibIDP", "/tmp/shibIDP.jks", "changeme",
                           "in.key", "in.crt", "root", "root", "localhost")
 
 
-def test_render_ldap_props_template(monkeypatch, ox_setup, patched_po_run):
+def test_render_ldap_props_template(monkeypatch, ox_setup, patched_put_files):
     monkeypatch.setattr(
         "gluuengine.setup.base.OxSetup.ldap_failover_hostname",
         lambda cls: "ldap.weave.local",
@@ -91,9 +123,10 @@ def test_render_ldap_props_template(monkeypatch, ox_setup, patched_po_run):
     ox_setup.render_ldap_props_template()
 
 
-def test_configure_vhost(ox_setup, patched_exec_cmd):
+def test_configure_vhost(ox_setup, patched_exec_batch):
     ox_setup.configure_vhost()
 
 
-def test_import_nginx_cert(ox_setup, patched_po_run, patched_exec_cmd):
+def test_import_nginx_cert(ox_setup, patched_po_run, patched_exec_cmd,
+                           patched_exec_batch):
     ox_setup.import_nginx_cert()
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+
+def test_sort_steps():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import sort_steps
+
+    def noop():
+        pass
+
+    steps = [
+        Step("c", noop, requires=["a", "b"]),
+        Step("a", noop),
+        Step("b", noop, requires=["a"]),
+    ]
+    assert [step.name for step in sort_steps(steps)] == ["a", "b", "c"]
+
+
+def test_sort_steps_unknown_requirement():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import sort_steps
+
+    with pytest.raises(ValueError):
+        sort_steps([Step("a", lambda: None, requires=["missing"])])
+
+
+def test_sort_steps_cycle():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import sort_steps
+
+    with pytest.raises(ValueError):
+        sort_steps([
+            Step("a", lambda: None, requires=["b"]),
+            Step("b", lambda: None, requires=["a"]),
+        ])
+
+
+def test_sort_steps_duplicate_name():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import sort_steps
+
+    with pytest.raises(ValueError):
+        sort_steps([Step("a", lambda: None), Step("a", lambda: None)])
+
+
+def test_run_steps_order():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import run_steps
+
+    calls = []
+    timings = run_steps([
+        Step("last", lambda: calls.append("last"), requires=["first", "second"]),
+        Step("first", lambda: calls.append("first")),
+        Step("second", lambda: calls.append("second"), requires=["first"]),
+    ])
+    assert calls == ["first", "second", "last"]
+    assert list(timings) == ["first", "second", "last"]
+
+
+def test_run_steps_concurrently():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import run_steps
+
+    event = threading.Event()
+    waited = []
+
+    def wait():
+        # set by the other step only if both are running at the same time
+        waited.append(event.wait(5))
+
+    run_steps([Step("wait", wait), Step("set", event.set)], max_workers=2)
+    assert waited == [True]
+
+
+def test_run_steps_error():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import run_steps
+
+    calls = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    def slow():
+        time.sleep(0.1)
+        calls.append("slow")
+
+    with pytest.raises(RuntimeError):
+        run_steps([
+            Step("fail", fail),
+            Step("slow", slow),
+            Step("after", lambda: calls.append("after"), requires=["fail"]),
+        ], max_workers=2)
+    # running step is finished but no further step is started
+    assert calls == ["slow"]
+
+
+def test_run_steps_resume():
+    from gluuengine.setup.steps import Step
+    from gluuengine.setup.steps import run_steps
+
+    calls = []
+    finished = []
+    run_steps([
+        Step("first", lambda: calls.append("first")),
+        Step("restart", lambda: calls.append("restart"),
+             requires=["first"], checkpoint=False),
+        Step("last", lambda: calls.append("last"), requires=["restart"]),
+    ], done=["first", "restart"], on_finished=lambda step: finished.append(step.name))
+
+    # non-checkpointed step is run on every attempt
+    assert calls == ["restart", "last"]
+    assert finished == ["restart", "last"]
@@ -0,0 +1,24 @@
+def test_poll(monkeypatch, app):
+    from gluuengine.machine import NodeHealthTable
+    from gluuengine.task import NodeHealthTask
+
+    monkeypatch.setattr(
+        "gluuengine.machine.Machine.ls",
+        lambda cls: [{"Name": "master-node", "State": "Running"}],
+    )
+    table = NodeHealthTable()
+    NodeHealthTask(app, table).poll()
+    assert table.running_nodes() == ["master-node"]
+
+
+def test_poll_error(monkeypatch, app):
+    from gluuengine.machine import NodeHealthTable
+    from gluuengine.task import NodeHealthTask
+
+    def ls(cls):
+        raise RuntimeError("docker-machine is unavailable")
+
+    monkeypatch.setattr("gluuengine.machine.Machine.ls", ls)
+    table = NodeHealthTable()
+    NodeHealthTask(app, table).poll()
+    assert table.fresh is False
@@ -0,0 +1,36 @@
+def test_cache_get_set():
+    from gluuengine.cache import TTLCache
+
+    cache = TTLCache()
+    cache.set("node-1", "10.10.10.10")
+    assert cache.get("node-1") == "10.10.10.10"
+    assert "node-1" in cache
+    assert cache.get("node-2", "missing") == "missing"
+
+
+def test_cache_expired():
+    from gluuengine.cache import TTLCache
+
+    cache = TTLCache()
+    cache.set("node-1", "10.10.10.10", ttl=-1)
+    assert cache.get("node-1") is None
+    assert "node-1" not in cache
+
+
+def test_cache_delete():
+    from gluuengine.cache import TTLCache
+
+    cache = TTLCache()
+    cache.set(("node-1", "ip"), "10.10.10.10")
+    cache.set(("node-1", "status"), True)
+    cache.set(("node-2", "ip"), "10.10.10.11")
+
+    cache.delete(("node-1", "ip"))
+    assert ("node-1", "ip") not in cache
+
+    cache.delete_matching(lambda key: key[0] == "node-1")
+    assert ("node-1", "status") not in cache
+    assert ("node-2", "ip") in cache
+
+    cache.clear()
+    assert ("node-2", "ip") not in cache
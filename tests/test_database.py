@@ -3,3 +3,97 @@ def test_database_init(app):
 
     db = Database(app)
     assert db.app == app
+
+
+def test_ensure_indexes(monkeypatch):
+    from gluuengine.database import Database
+    from gluuengine.database import INDEXES
+
+    created = []
+
+    class FakeCollection(object):
+        def __init__(self, name):
+            self.name = name
+
+        def create_index(self, keys, **kwargs):
+            created.append((self.name, keys))
+
+    monkeypatch.setattr(Database, "db", {
+        name: FakeCollection(name) for name in INDEXES
+    })
+    assert Database().ensure_indexes() is True
+    assert ("containers", INDEXES["containers"][2]) in created
+    assert len(created) == sum(len(keys) for keys in INDEXES.values())
+
+
+def test_ensure_indexes_failed(monkeypatch):
+    from pymongo.errors import ServerSelectionTimeoutError
+    from gluuengine.database import Database
+
+    class FakeCollection(object):
+        def create_index(self, keys, **kwargs):
+            raise ServerSelectionTimeoutError("mongo:27017")
+
+    monkeypatch.setattr(Database, "db", {"nodes": FakeCollection()})
+    assert Database().ensure_indexes({"nodes": [[("type", 1)]]}) is False
+
+
+def test_set_fields(monkeypatch):
+    from gluuengine.database import Database
+
+    updates = []
+
+    class FakeCollection(object):
+        def update_one(self, condition, update):
+            updates.append((condition, update))
+
+    monkeypatch.setattr(Database, "db", {"containers": FakeCollection()})
+    Database().set_fields("containers", {"name": "ldap_1"},
+                          {"cid": "abc", "state": "SUCCESS"})
+    assert updates == [(
+        {"name": "ldap_1"},
+        {"$set": {"cid": "abc", "state": "SUCCESS"}},
+    )]
+
+
+def test_bulk_write(monkeypatch, master_node):
+    from pymongo import DeleteOne
+    from pymongo import InsertOne
+    from pymongo import ReplaceOne
+    from gluuengine.database import Database
+
+    batches = []
+
+    class FakeCollection(object):
+        def bulk_write(self, requests, ordered=True):
+            batches.append(requests)
+
+    monkeypatch.setattr(Database, "db", {"nodes": FakeCollection()})
+    db = Database()
+
+    db.bulk_persist([master_node], "nodes")
+    db.bulk_update([master_node], "nodes")
+    db.bulk_delete("nodes", [{"name": master_node.name}])
+
+    # nothing to write
+    assert db.bulk_persist([], "nodes") is None
+
+    assert len(batches) == 3
+    assert isinstance(batches[0][0], InsertOne)
+    assert isinstance(batches[1][0], ReplaceOne)
+    assert isinstance(batches[2][0], DeleteOne)
+
+
+def test_with_pool_options():
+    from gluuengine.database import with_pool_options
+
+    uri = with_pool_options(
+        "mongodb://mongo:27017/gluuengine?maxPoolSize=10",
+        {"DATABASE_MAX_POOL_SIZE": 50, "DATABASE_WAIT_QUEUE_TIMEOUT_MS": 1000},
+    )
+    assert uri.startswith("mongodb://mongo:27017/gluuengine?")
+
+    # option set in URI takes precedence
+    assert "maxPoolSize=10" in uri
+    assert "maxPoolSize=50" not in uri
+    assert "waitQueueTimeoutMS=1000" in uri
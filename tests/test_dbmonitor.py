@@ -0,0 +1,45 @@
+class FakeEvent(object):
+    def __init__(self, command_name, command=None, duration_micros=0):
+        self.command_name = command_name
+        self.command = command or {}
+        self.duration_micros = duration_micros
+        self.request_id = 1
+        self.connection_id = ("mongo", 27017)
+
+
+def test_command_listener():
+    from gluuengine.dbmonitor import CommandMetricsListener
+    from gluuengine.dbmonitor import DatabaseMetrics
+
+    metrics = DatabaseMetrics(slow_query_ms=100)
+    listener = CommandMetricsListener(metrics)
+
+    listener.started(FakeEvent("find", {"find": "containers"}))
+    listener.succeeded(FakeEvent("find", duration_micros=150000))
+
+    # commands without collection are ignored
+    listener.started(FakeEvent("ismaster", {"ismaster": 1}))
+    listener.succeeded(FakeEvent("ismaster", duration_micros=150000))
+
+    data = metrics.as_dict()
+    assert data["tables"]["containers"]["commands"] == 1
+    assert data["tables"]["containers"]["slow"] == 1
+    assert data["slow_queries"][0]["command"] == "find"
+    assert "admin" not in data["tables"]
+
+
+def test_pool_metrics():
+    from gluuengine.dbmonitor import DatabaseMetrics
+
+    metrics = DatabaseMetrics()
+    metrics.record_checkout(10.0)
+    metrics.record_checkout(30.0)
+    metrics.record_checkout(5000.0, failed=True)
+    metrics.record_checkin()
+
+    pool = metrics.as_dict()["pool"]
+    assert pool["checkouts"] == 2
+    assert pool["checkout_failures"] == 1
+    assert pool["checked_out"] == 1
+    assert pool["max_wait_time_ms"] == 5000.0
+    assert pool["avg_wait_time_ms"] == 5040.0 / 3
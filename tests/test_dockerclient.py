@@ -90,9 +90,72 @@ def test_remove_container(monkeypatch, dockerclient):
     assert dockerclient.remove_container("gluuopendj_123") == "gluuopendj_123"
 
 
-@pytest.mark.skip(reason="implement me")
-def test_copy_to_container(dockerclient):
-    pass
+def test_copy_to_container(monkeypatch, dockerclient, tmpdir):
+    import tarfile
+
+    archives = []
+
+    def put_archive(cls, container, path, data):
+        archives.append((path, tarfile.open(fileobj=data)))
+        return True
+
+    monkeypatch.setattr("docker.Client.put_archive", put_archive)
+    monkeypatch.setattr(
+        "docker.Client.exec_create",
+        lambda cls, container, cmd: pytest.fail("unexpected exec"),
+    )
+
+    src = tmpdir.join("nginx.crt")
+    src.write("cert")
+    dockerclient.copy_to_container("123", str(src), "/etc/certs/nginx.crt",
+                                   mode=0o600)
+
+    path, tf = archives[0]
+    member = tf.getmember("etc/certs/nginx.crt")
+    assert path == "/"
+    assert member.uid == 0 and member.gid == 0
+    assert member.mode == 0o600
+    assert tf.extractfile(member).read() == "cert"
+
+
+def test_copy_dir_to_container(monkeypatch, dockerclient, tmpdir):
+    import tarfile
+
+    archives = []
+
+    def put_archive(cls, container, path, data):
+        archives.append(tarfile.open(fileobj=data))
+        return True
+
+    monkeypatch.setattr("docker.Client.put_archive", put_archive)
+
+    src = tmpdir.mkdir("idp")
+    src.join("idp.xml").write("xml")
+    dockerclient.copy_to_container("123", str(src), "/opt")
+    assert "opt/idp/idp.xml" in archives[0].getnames()
+
+
+def test_put_files(monkeypatch, dockerclient):
+    import tarfile
+
+    archives = []
+
+    def put_archive(cls, container, path, data):
+        archives.append(tarfile.open(fileobj=data))
+        return True
+
+    monkeypatch.setattr("docker.Client.put_archive", put_archive)
+
+    manifest = dockerclient.put_files("123", [
+        ("/etc/supervisor/conf.d/tomcat.conf", u"[program:tomcat]", None),
+        ("/usr/bin/check_ssl", "#!/bin/sh", 0o755),
+    ])
+    assert manifest == ["/etc/supervisor/conf.d/tomcat.conf",
+                        "/usr/bin/check_ssl"]
+
+    tf = archives[0]
+    assert tf.getmember("etc/supervisor/conf.d/tomcat.conf").mode == 0o644
+    assert tf.getmember("usr/bin/check_ssl").mode == 0o755
 
 
 @pytest.mark.skip(reason="implement me")
@@ -108,3 +171,99 @@ def test_swarm_conf_str(dockerclient):
 @pytest.mark.skip(reason="implement me")
 def test_exec_cmd(dockerclient):
     pass
+
+
+@pytest.fixture()
+def patched_exec_script(monkeypatch):
+    import subprocess
+
+    # runs the shipped script locally instead of inside a container
+    monkeypatch.setattr(
+        "docker.Client.exec_create",
+        lambda cls, container, cmd: {"Id": cmd},
+    )
+    monkeypatch.setattr(
+        "docker.Client.exec_start",
+        lambda cls, exec_id: subprocess.Popen(
+            exec_id["Id"], stdout=subprocess.PIPE,
+        ).communicate()[0],
+    )
+
+
+def test_exec_batch(dockerclient, patched_exec_script):
+    results = dockerclient.exec_batch("abc", ["echo a", "printf b"])
+
+    assert [result.retval for result in results] == ["a", "b"]
+    assert [result.exit_code for result in results] == [0, 0]
+
+
+def test_exec_batch_stop_on_error(dockerclient, patched_exec_script):
+    from gluuengine.errors import DockerExecError
+
+    with pytest.raises(DockerExecError) as exc:
+        dockerclient.exec_batch("abc", ["echo a", "false", "echo c"])
+    assert exc.value.exit_code == 1
+
+
+def test_exec_batch_continue_on_error(dockerclient, patched_exec_script):
+    results = dockerclient.exec_batch(
+        "abc", ["echo a", "false", "echo c"], stop_on_error=False,
+    )
+    assert [result.exit_code for result in results] == [0, 1, 0]
+    assert results[2].retval == "c"
+
+
+def test_client_pool_reuse_client():
+    from gluuengine.dockerclient import ClientPool
+
+    pool = ClientPool()
+    with pool.client("https://10.10.10.10:3376") as client:
+        first = client
+
+    with pool.client("https://10.10.10.10:3376") as client:
+        assert client is first
+    assert pool.size("https://10.10.10.10:3376") == 1
+
+
+def test_client_pool_key_by_endpoint(swarm_config):
+    from gluuengine.dockerclient import ClientPool
+
+    pool = ClientPool()
+    with pool.client(swarm_config["base_url"], swarm_config["tls"]) as client:
+        tls_client = client
+
+    with pool.client(swarm_config["base_url"]) as client:
+        assert client is not tls_client
+    assert pool.size() == 2
+
+
+def test_client_pool_max_size():
+    from gluuengine.dockerclient import ClientPool
+
+    pool = ClientPool(max_size=1)
+    with pool.client("https://10.10.10.10:3376"):
+        with pool.client("https://10.10.10.10:3376"):
+            pass
+    assert pool.size() == 1
+
+
+def test_client_pool_evict_idle():
+    from gluuengine.dockerclient import ClientPool
+
+    pool = ClientPool(idle_timeout=-1)
+    with pool.client("https://10.10.10.10:3376") as client:
+        first = client
+
+    with pool.client("https://10.10.10.10:3376") as client:
+        assert client is not first
+
+
+def test_client_pool_discard_broken_client():
+    from requests.exceptions import ConnectionError
+    from gluuengine.dockerclient import ClientPool
+
+    pool = ClientPool()
+    with pytest.raises(ConnectionError):
+        with pool.client("https://10.10.10.10:3376"):
+            raise ConnectionError()
+    assert pool.size() == 0
@@ -0,0 +1,174 @@
+import pytest
+
+
+@pytest.fixture()
+def machine(monkeypatch):
+    from gluuengine.cache import TTLCache
+    from gluuengine.machine import Machine
+
+    calls = []
+
+    def _run(cls, cmd_str, raise_error=True):
+        calls.append(cmd_str)
+        if cmd_str.startswith("status"):
+            return "Running", "", 0
+        return "10.10.10.10", "", 0
+
+    monkeypatch.setattr("gluuengine.machine.Machine._run", _run)
+    machine = Machine(cache=TTLCache())
+    machine.calls = calls
+    return machine
+
+
+def test_ip_cached(machine):
+    assert machine.ip("node-1") == "10.10.10.10"
+    assert machine.ip("node-1") == "10.10.10.10"
+    assert machine.calls == ["ip node-1"]
+
+
+def test_status_cached(machine):
+    assert machine.status("node-1") is True
+    assert machine.status("node-1") is True
+    assert machine.calls == ["status node-1"]
+
+
+def test_status_expired(machine):
+    machine.status_ttl = -1
+    machine.status("node-1")
+    machine.status("node-1")
+    assert len(machine.calls) == 2
+
+
+@pytest.mark.parametrize("method", [
+    "rm", "regenerate_certs", "restart", "start", "stop", "kill",
+])
+def test_invalidate(machine, method):
+    machine.ip("node-1")
+    machine.ip("node-2")
+    getattr(machine, method)("node-1")
+
+    machine.ip("node-1")
+    machine.ip("node-2")
+    assert machine.calls.count("ip node-1") == 2
+    assert machine.calls.count("ip node-2") == 1
+
+
+def test_node_health_table():
+    from gluuengine.machine import NodeHealthTable
+
+    table = NodeHealthTable()
+    assert table.is_running("master-node") is None
+    assert table.running_nodes() is None
+
+    table.update([
+        {"Name": "master-node", "State": "Running", "ResponseTime": "12ms",
+         "Error": "", "DockerVersion": "v1.11.1"},
+        {"Name": "worker-node", "State": "Stopped", "ResponseTime": "",
+         "Error": "", "DockerVersion": "Unknown"},
+        {"Name": ""},
+    ])
+    assert table.is_running("master-node") is True
+    assert table.is_running("worker-node") is False
+    assert table.is_running("random-node") is None
+    assert table.running_nodes() == ["master-node"]
+    assert table.get("master-node")["docker_version"] == "v1.11.1"
+    assert len(table.all()) == 2
+
+
+def test_node_health_table_stale():
+    from gluuengine.machine import NodeHealthTable
+
+    table = NodeHealthTable(max_age=-1)
+    table.update([{"Name": "master-node", "State": "Running"}])
+    assert table.fresh is False
+    assert table.is_running("master-node") is None
+
+
+def test_node_health_table_shared(tmpdir):
+    from gluuengine.machine import NodeHealthTable
+
+    path = str(tmpdir.join("node_health.json"))
+    poller = NodeHealthTable(path=path)
+    reader = NodeHealthTable(path=path)
+    assert reader.is_running("master-node") is None
+
+    poller.update([{"Name": "master-node", "State": "Running"}])
+    assert reader.is_running("master-node") is True
+    assert reader.running_nodes() == ["master-node"]
+
+
+class FakeMultiplexer(object):
+    def __init__(self):
+        self.commands = []
+
+    def params_from_inspect(self, inspect, machine_name):
+        from gluuengine.machine import SSHMultiplexer
+        return SSHMultiplexer.params_from_inspect(inspect, machine_name)
+
+    def run(self, params, cmd, data=None):
+        self.commands.append((params["host"], cmd))
+        return "ok", "", 0
+
+    def copy(self, params, source, destination, recursive=False):
+        self.commands.append((params["host"], source, destination))
+
+    def close(self, params):
+        self.commands.append((params["host"], "close"))
+
+
+def test_params_from_inspect(tmpdir):
+    from gluuengine.machine import SSHMultiplexer
+
+    key = tmpdir.join("id_rsa")
+    key.write("key")
+    inspect = {"Driver": {
+        "IPAddress": "10.10.10.10",
+        "SSHUser": "ubuntu",
+        "SSHPort": 2222,
+        "SSHKeyPath": str(key),
+    }}
+    assert SSHMultiplexer.params_from_inspect(inspect, "node-1") == {
+        "host": "10.10.10.10",
+        "user": "ubuntu",
+        "port": 2222,
+        "key": str(key),
+    }
+
+    # missing key
+    inspect["Driver"]["SSHKeyPath"] = str(tmpdir.join("random"))
+    assert SSHMultiplexer.params_from_inspect(inspect, "node-1") is None
+
+
+def test_ssh_multiplexed(monkeypatch, tmpdir):
+    import json
+    from gluuengine.cache import TTLCache
+    from gluuengine.machine import Machine
+
+    key = tmpdir.join("id_rsa")
+    key.write("key")
+    inspect = {"Driver": {"IPAddress": "10.10.10.10", "SSHKeyPath": str(key)}}
+    monkeypatch.setattr(
+        "gluuengine.machine.Machine._run",
+        lambda cls, cmd_str, raise_error=True: (json.dumps(inspect), "", 0),
+    )
+
+    mux = FakeMultiplexer()
+    machine = Machine(cache=TTLCache(), ssh_mux=mux)
+    assert machine.ssh("node-1", "sudo weave dns-args") == "ok"
+    machine.scp("/tmp/cert.pem", "node-1:/etc/docker")
+    assert mux.commands == [
+        ("10.10.10.10", "sudo weave dns-args"),
+        ("10.10.10.10", "/tmp/cert.pem", "/etc/docker"),
+    ]
+
+    # multiplexed connection is closed on invalidation
+    machine.restart("node-1")
+    assert mux.commands[-1] == ("10.10.10.10", "close")
+
+
+def test_ssh_fallback(machine):
+    from gluuengine.machine.ssh import SSHMultiplexer
+
+    machine.ssh_mux = SSHMultiplexer()
+    machine.ssh("node-1", "sudo weave dns-args")
+    assert machine.calls == ["inspect node-1", "ssh node-1 sudo weave dns-args"]
@@ -0,0 +1,71 @@
+def test_singleton_cache(master_node):
+    from gluuengine.modelcache import SingletonCache
+
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return master_node
+
+    cache = SingletonCache()
+    node = cache.get("nodes", "master", loader)
+    assert node.name == "master-node"
+
+    # cached object is copied
+    node.name = "changed"
+    assert cache.get("nodes", "master", loader).name == "master-node"
+    assert len(loads) == 1
+
+    cache.invalidate("clusters")
+    cache.get("nodes", "master", loader)
+    assert len(loads) == 1
+
+    cache.invalidate("nodes")
+    cache.get("nodes", "master", loader)
+    assert len(loads) == 2
+
+
+def test_singleton_cache_missing():
+    from gluuengine.modelcache import SingletonCache
+
+    loads = []
+
+    def loader():
+        loads.append(1)
+
+    cache = SingletonCache()
+    assert cache.get("clusters", "cluster", loader) is None
+    assert cache.get("clusters", "cluster", loader) is None
+
+    # missing object is never cached
+    assert len(loads) == 2
+
+
+def test_write_through(monkeypatch, master_node):
+    from gluuengine.database import Database
+    from gluuengine.modelcache import singletons
+
+    class FakeCollection(object):
+        def update_one(self, condition, update):
+            pass
+
+    monkeypatch.setattr(Database, "db", {"nodes": FakeCollection()})
+    singletons.get("nodes", "master", lambda: master_node)
+    assert ("nodes", "master") in singletons.cache
+
+    Database().set_fields("nodes", {"id": master_node.id}, {"name": "abc"})
+    assert ("nodes", "master") not in singletons.cache
+
+
+def test_singleton_cache_stale_load(master_node):
+    from gluuengine.modelcache import SingletonCache
+
+    cache = SingletonCache()
+
+    def loader():
+        # a write is finished while the object is being loaded
+        cache.invalidate("nodes")
+        return master_node
+
+    assert cache.get("nodes", "master", loader).name == "master-node"
+    assert ("nodes", "master") not in cache.cache
@@ -0,0 +1,102 @@
+import pytest
+
+
+class FakeDocker(object):
+    def __init__(self, outputs):
+        # a list of ``(exit_code, output)`` returned by successive calls
+        self.outputs = list(outputs)
+        self.cmds = []
+
+    def exec_batch(self, container, cmds, stop_on_error=True):
+        from gluuengine.dockerclient._docker import DockerExecResult
+
+        self.cmds.extend(cmds)
+        exit_code, output = self.outputs.pop(0)
+        return [DockerExecResult(cmd=cmds[0], exit_code=exit_code,
+                                 retval=output)]
+
+
+@pytest.fixture
+def recorded_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr("time.sleep", delays.append)
+    return delays
+
+
+def test_wait_for_backoff(recorded_sleep):
+    from gluuengine.probe import wait_for
+
+    results = iter([False, False, False, False, True])
+    wait_for(lambda: next(results), initial_delay=1, max_delay=4)
+    assert recorded_sleep == [1, 2, 4, 4]
+
+
+def test_wait_for_timeout(monkeypatch, recorded_sleep):
+    from gluuengine.errors import ProbeTimeoutError
+    from gluuengine.probe import wait_for
+
+    clock = iter(range(100))
+    monkeypatch.setattr("time.time", lambda: next(clock))
+
+    with pytest.raises(ProbeTimeoutError):
+        wait_for(lambda: False, timeout=3, name="ldap")
+
+
+def test_supervisor_running():
+    from gluuengine.probe import supervisor_running
+
+    docker = FakeDocker([
+        (2, "unix:///var/run/supervisor.sock refused connection"),
+        (3, "tomcat    STARTING\nhttpd    RUNNING   pid 10, uptime 0:00:01"),
+        (0, "tomcat    RUNNING   pid 11, uptime 0:00:02\n"
+            "httpd    RUNNING   pid 10, uptime 0:00:03"),
+    ])
+    probe = supervisor_running(docker, "cid")
+    assert [probe(), probe(), probe()] == [False, False, True]
+
+
+def test_supervisor_running_after_reload():
+    from gluuengine.probe import supervisor_pids
+    from gluuengine.probe import supervisor_running
+
+    old = "opendj    RUNNING   pid 10, uptime 0:05:00"
+    docker = FakeDocker([
+        (0, old),
+        # reload hasn't taken effect yet
+        (0, old),
+        (0, "opendj    RUNNING   pid 42, uptime 0:00:01"),
+    ])
+    pids = supervisor_pids(docker, "cid")
+    assert pids == {"opendj": "10"}
+
+    probe = supervisor_running(docker, "cid", pids)
+    assert [probe(), probe()] == [False, True]
+
+
+def test_supervisor_running_after_refused():
+    from gluuengine.probe import supervisor_running
+
+    docker = FakeDocker([
+        (2, "unix:///var/run/supervisor.sock refused connection"),
+        (0, "opendj    RUNNING   pid 10, uptime 0:00:01"),
+    ])
+    # the same PID may be reused by restarted program
+    probe = supervisor_running(docker, "cid", {"opendj": "10"})
+    assert [probe(), probe()] == [False, True]
+
+
+def test_http_ok():
+    from gluuengine.probe import http_ok
+
+    docker = FakeDocker([(7, "000"), (0, "503"), (0, "200")])
+    probe = http_ok(docker, "cid", "https://localhost:8443/oxauth/")
+    assert [probe(), probe(), probe()] == [False, False, True]
+
+
+def test_port_open():
+    from gluuengine.probe import port_open
+
+    docker = FakeDocker([(1, ""), (0, "")])
+    probe = port_open(docker, "cid", 4444)
+    assert [probe(), probe()] == [False, True]
+    assert "/dev/tcp/127.0.0.1/4444" in docker.cmds[0]
@@ -0,0 +1,214 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture()
+def make_scheduler(request, app, db):
+    from gluuengine.scheduler import DeploymentScheduler
+
+    def factory(**kwargs):
+        scheduler = DeploymentScheduler(poll_interval=0.01, **kwargs)
+        request.addfinalizer(scheduler.stop)
+        return scheduler
+    return factory
+
+
+def wait_done(app, scheduler, jobs, timeout=5):
+    deadline = time.time() + timeout
+    with app.app_context():
+        while not all(scheduler.get(job.id).done for job in jobs):
+            assert time.time() < deadline
+            time.sleep(0.01)
+
+
+def test_scheduler_runs_jobs(app, make_scheduler):
+    from gluuengine.scheduler import JOB_FAILED
+    from gluuengine.scheduler import JOB_FINISHED
+
+    results = []
+
+    def fail(app, args):
+        raise RuntimeError("boom")
+
+    # jobs submitted by a process are run by the dispatcher process
+    dispatcher = make_scheduler(max_workers=2)
+    dispatcher.register("append", lambda app, args: results.append(args["value"]))
+    dispatcher.register("fail", fail)
+    dispatcher.start(app)
+
+    submitter = make_scheduler()
+    with app.app_context():
+        ok = submitter.submit("ok", "append", {"value": 1})
+        failed = submitter.submit("fail", "fail")
+    wait_done(app, submitter, [ok, failed])
+
+    assert results == [1]
+    with app.app_context():
+        assert submitter.get(ok.id).state == JOB_FINISHED
+        assert submitter.get(failed.id).state == JOB_FAILED
+        assert submitter.get(failed.id).error == "boom"
+
+
+def test_scheduler_runs_job_once(app, make_scheduler):
+    lock = threading.Lock()
+    runs = {}
+
+    def work(app, args):
+        with lock:
+            runs[args["idx"]] = runs.get(args["idx"], 0) + 1
+
+    # queued job is started by a single dispatcher only
+    schedulers = [make_scheduler(), make_scheduler()]
+    for scheduler in schedulers:
+        scheduler.register("work", work)
+        scheduler.start(app)
+
+    with app.app_context():
+        jobs = schedulers[0].submit_many([
+            ("job", "work", {"idx": idx}, None, None) for idx in range(10)
+        ])
+    wait_done(app, schedulers[0], jobs)
+
+    assert runs == dict.fromkeys(range(10), 1)
+
+
+def test_scheduler_key_limit(app, make_scheduler):
+    lock = threading.Lock()
+    running = {"node-1": 0, "node-2": 0}
+    peak = {"node-1": 0, "node-2": 0}
+
+    def work(app, args):
+        key = args["key"]
+        with lock:
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+        time.sleep(0.05)
+        with lock:
+            running[key] -= 1
+
+    scheduler = make_scheduler(max_workers=4, key_limit=1)
+    scheduler.register("work", work)
+    scheduler.start(app)
+
+    with app.app_context():
+        jobs = scheduler.submit_many([
+            ("job", "work", {"key": key}, key, None)
+            for key in ["node-1", "node-2"] * 3
+        ])
+    wait_done(app, scheduler, jobs)
+
+    assert peak == {"node-1": 1, "node-2": 1}
+
+
+def test_scheduler_queue_full(app, make_scheduler):
+    from gluuengine.scheduler import SchedulerBusy
+
+    # queue is shared by all processes
+    scheduler = make_scheduler(queue_size=2)
+    other = make_scheduler(queue_size=2)
+
+    with app.app_context():
+        scheduler.submit("noop", "noop")
+        assert other.can_accept(1)
+        assert not other.can_accept(2)
+
+        with pytest.raises(SchedulerBusy):
+            other.submit_many([("noop", "noop", None, None, None)] * 2)
+        other.submit("noop", "noop")
+        assert not scheduler.can_accept()
+        assert scheduler.stats()["queued"] == 2
+
+
+def test_scheduler_history(app, make_scheduler):
+    scheduler = make_scheduler(history_size=1)
+    scheduler.register("noop", lambda app, args: None)
+    scheduler.start(app)
+
+    for _ in range(3):
+        with app.app_context():
+            job = scheduler.submit("noop", "noop")
+        wait_done(app, scheduler, [job])
+
+    with app.app_context():
+        assert len(scheduler.jobs()) == 1
+
+
+def test_scheduler_group_limit(app, make_scheduler):
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(app, args):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+
+    scheduler = make_scheduler(max_workers=6, key_limit=2, group_limit=3)
+    scheduler.register("work", work)
+    scheduler.start(app)
+
+    with app.app_context():
+        jobs = scheduler.submit_many([
+            ("job", "work", None, "node-{}".format(idx % 3), "cluster")
+            for idx in range(9)
+        ])
+    wait_done(app, scheduler, jobs)
+
+    assert state["peak"] == 3
+
+
+def test_scheduler_in_flight(app, db, make_scheduler, master_node,
+                             ldap_container, oxauth_container):
+    from gluuengine.helper.container_helper import container_job
+    from gluuengine.model import STATE_IN_PROGRESS
+    from gluuengine.model import STATE_SUCCESS
+
+    scheduler = make_scheduler(key_limit=1)
+
+    # ldap setup is started by other process
+    ldap_container.state = STATE_IN_PROGRESS
+    oxauth_container.name = "oxauth-node"
+    oxauth_container.state = STATE_IN_PROGRESS
+    db.persist(ldap_container, "containers")
+    db.persist(oxauth_container, "containers")
+
+    with app.app_context():
+        job = scheduler.submit(*container_job(
+            "setup", oxauth_container, "setup.log",
+        ))
+
+        # queued setup doesn't take a slot
+        assert scheduler.in_flight("key", master_node.id) == 1
+        assert not scheduler._has_slot(job)
+
+        db.set_fields("containers", {"name": ldap_container.name},
+                      {"state": STATE_SUCCESS})
+        assert scheduler.in_flight("key", master_node.id) == 0
+        assert scheduler._has_slot(job)
+
+
+def test_scheduler_recover(app, db, make_scheduler):
+    from gluuengine.model import Job
+    from gluuengine.scheduler import JOB_FAILED
+    from gluuengine.scheduler import JOB_RUNNING
+
+    # job left running by dead dispatcher
+    job = Job("setup", "work", {"name": "ldap"})
+    job.state = JOB_RUNNING
+    with app.app_context():
+        db.persist(job, "jobs")
+
+    recovered = []
+    scheduler = make_scheduler()
+    scheduler.register("work", lambda app, args: None,
+                       recover=lambda app, args: recovered.append(args["name"]))
+    scheduler.start(app)
+
+    assert recovered == ["ldap"]
+    with app.app_context():
+        assert scheduler.get(job.id).state == JOB_FAILED
+        assert scheduler.get(job.id).error == "interrupted"
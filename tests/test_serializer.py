@@ -0,0 +1,108 @@
+def test_dump(master_node):
+    from gluuengine.serializer import dump
+
+    data = dump(master_node)
+    assert data["py/object"] == "gluuengine.model.node.MasterNode"
+    assert data["name"] == "master-node"
+    assert data["state_weave_launch"] is False
+
+    # class-level attributes are not stored
+    assert "resource_fields" not in data
+
+
+def test_load(master_node):
+    from gluuengine.model import MasterNode
+    from gluuengine.serializer import dump
+    from gluuengine.serializer import load
+
+    data = dump(master_node)
+    data["_id"] = data["id"]
+    node = load(data)
+
+    assert isinstance(node, MasterNode)
+    assert node.as_dict() == master_node.as_dict()
+    assert not hasattr(node, "_id")
+
+
+def test_load_legacy_document(master_node):
+    from gluuengine.serializer import dump
+    from gluuengine.serializer import load
+
+    # documents written by older versions may store ``resource_fields``
+    # and miss newly introduced attributes
+    data = dump(master_node)
+    data["resource_fields"] = {"id": None}
+    data.pop("state_pull_images")
+    node = load(data)
+
+    assert "state_complete" in node.resource_fields
+    assert node.state_pull_images is False
+
+
+def test_adhoc_attribute_not_persisted(master_node):
+    from gluuengine.serializer import dump
+    from gluuengine.serializer import load
+
+    master_node.tmp_flag = True
+    data = dump(master_node)
+    assert "tmp_flag" not in data
+
+    data["tmp_flag"] = True
+    assert not hasattr(load(data), "tmp_flag")
+
+
+def test_declared_persistent_fields(monkeypatch):
+    from gluuengine.model import LdapContainer
+    from gluuengine.serializer import dump
+
+    monkeypatch.setattr(LdapContainer, "persistent_fields", ("id", "name",))
+    # defaults are cached per class
+    monkeypatch.setattr("gluuengine.serializer._defaults", {})
+
+    ctr = LdapContainer()
+    ctr.name = "ldap-node"
+    data = dump(ctr)
+    assert set(data) == {"id", "name", "py/object"}
+
+
+def test_get_class_registry():
+    from gluuengine.model import LdapContainer
+    from gluuengine.serializer import get_class
+
+    assert get_class("gluuengine.model.container.LdapContainer") is LdapContainer
+
+
+def test_projection():
+    from gluuengine.model import MasterNode
+    from gluuengine.model import WorkerNode
+    from gluuengine.serializer import projection
+
+    spec = projection([MasterNode, WorkerNode], extra_fields=("setup_log",))
+    assert spec["py/object"] is True
+    assert spec["_id"] is False
+    assert spec["state_weave_launch"] is True
+    assert spec["setup_log"] is True
+
+
+def test_model_view(master_node):
+    import pytest
+    from gluuengine.model import MasterNode
+    from gluuengine.serializer import dump
+    from gluuengine.serializer import projection
+    from gluuengine.serializer import ModelView
+
+    spec = projection([MasterNode])
+    data = {
+        k: v for k, v in dump(master_node).iteritems()
+        if k in spec and k != "state_pull_images"
+    }
+    view = ModelView(data, [k for k, v in spec.iteritems() if v])
+
+    assert view.model_class is MasterNode
+    assert view.as_dict() == master_node.as_dict()
+
+    # missing projected attribute is populated from class's defaults
+    assert view.state_pull_images is False
+
+    with pytest.raises(AttributeError):
+        view.name = "worker-node"
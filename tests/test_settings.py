@@ -16,7 +16,7 @@ def test_test_config():
     # sanity checks
     assert cfg.DEBUG is True
     assert cfg.TESTING is True
-    assert cfg.DATABASE_URI == "/var/lib/gluuengine/db/db_test.json"
+    assert cfg.DATABASE_URI == "sqlite:///:memory:"
 
 
 def test_prod_config():
@@ -0,0 +1,92 @@
+import pytest
+
+
+@pytest.fixture()
+def sqlite_db():
+    from gluuengine.sqlitedb import SQLiteDatabase
+    return SQLiteDatabase(":memory:")
+
+
+def test_path_from_uri():
+    from gluuengine.sqlitedb import path_from_uri
+
+    assert path_from_uri("sqlite:///:memory:") == ":memory:"
+    assert path_from_uri("sqlite:////var/lib/gluuengine/db/gluuengine.db") == \
+        "/var/lib/gluuengine/db/gluuengine.db"
+
+
+def test_translate():
+    from gluuengine.sqlitedb import translate
+
+    clause, params = translate({
+        "$or": [{"type": "master"}, {"type": "worker"}],
+        "state_complete": True,
+    })
+    assert clause == "(json_extract(doc, '$.type') = ? OR " \
+                     "json_extract(doc, '$.type') = ?) AND " \
+                     "json_extract(doc, '$.state_complete') = ?"
+    assert params == ["master", "worker", 1]
+
+
+def test_translate_unsupported():
+    from pymongo.errors import OperationFailure
+    from gluuengine.sqlitedb import translate
+
+    with pytest.raises(OperationFailure):
+        translate({"name": {"$regex": "^ldap"}})
+
+
+def test_collection_crud(sqlite_db):
+    containers = sqlite_db["containers"]
+    containers.insert_one({"_id": "a", "id": "a", "type": "ldap", "state": ""})
+    containers.insert_one({"_id": "b", "id": "b", "type": "oxauth", "state": ""})
+    containers.insert_one({"_id": "c", "id": "c", "type": "oxauth", "state": ""})
+
+    assert containers.count({"type": "oxauth"}) == 2
+    assert [doc["id"] for doc in containers.find({"id": {"$gt": "a"}}).sort("id")] == ["b", "c"]
+    assert containers.find_one({"id": "a"}, {"type": True, "_id": False}) == {"type": "ldap"}
+
+    result = containers.update_one({"id": "b"}, {"$set": {"state": "SUCCESS"}})
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    assert containers.find_one({"id": "b"})["state"] == "SUCCESS"
+
+    result = containers.update_one({"id": "b"}, {"$set": {"state": "SUCCESS"}})
+    assert (result.matched_count, result.modified_count) == (1, 0)
+    result = containers.update_one({"id": "x"}, {"$set": {"state": "SUCCESS"}})
+    assert (result.matched_count, result.modified_count) == (0, 0)
+
+    # replace keeps primary key
+    containers.update({"id": "c"}, {"id": "c", "type": "nginx"}, True)
+    assert containers.find_one({"id": "c"}) == {"_id": "c", "id": "c", "type": "nginx"}
+
+    containers.delete_one({"id": "a"})
+    assert containers.count({"type": {"$in": ["ldap", "nginx"]}}) == 1
+
+
+def test_collection_bulk_write(sqlite_db):
+    from pymongo import DeleteOne
+    from pymongo import InsertOne
+    from pymongo import ReplaceOne
+
+    nodes = sqlite_db["nodes"]
+    nodes.create_index([("type", 1)])
+    nodes.bulk_write([
+        InsertOne({"_id": "m", "id": "m", "type": "master"}),
+        InsertOne({"_id": "w", "id": "w", "type": "worker"}),
+        ReplaceOne({"id": "d"}, {"id": "d", "type": "discovery"}, upsert=True),
+        DeleteOne({"id": "w"}),
+    ])
+    assert sorted(doc["id"] for doc in nodes.find()) == ["d", "m"]
+
+
+def test_database_sqlite_backend(app, master_node):
+    from gluuengine.database import Database
+
+    app.config["SQLITE_TEST_URI"] = "sqlite:///:memory:"
+    db = Database()
+    db.init_app(app, "SQLITE_TEST")
+
+    with app.app_context():
+        db.persist(master_node, "nodes")
+        assert db.get(master_node.id, "nodes").name == "master-node"
+        assert db.count_from_table("nodes", {"type": "master"}) == 1
@@ -0,0 +1,39 @@
+import os
+
+
+def test_jinja_env_shared(app, tmpdir):
+    from gluuengine.templating import TemplateCache
+
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = str(tmpdir.join("jinja"))
+    cache = TemplateCache()
+    cache.init_app(app)
+
+    assert cache.jinja_env is cache.jinja_env
+    assert os.path.isdir(app.config["JINJA_BYTECODE_CACHE_DIR"])
+
+
+def test_jinja_env_without_bytecode_cache(app):
+    from gluuengine.templating import TemplateCache
+
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = ""
+    cache = TemplateCache()
+    cache.init_app(app)
+    assert cache.jinja_env.bytecode_cache is None
+
+
+def test_read_template(tmpdir):
+    from gluuengine.templating import TemplateCache
+
+    cache = TemplateCache()
+    src = tmpdir.join("opendj-setup.properties")
+    src.write("hostname=%(hostname)s")
+    assert cache.read_template(str(src)) == "hostname=%(hostname)s"
+
+    # cached content is used as long as mtime is unchanged
+    cache._sources[str(src)] = (os.path.getmtime(str(src)), "cached")
+    assert cache.read_template(str(src)) == "cached"
+
+    # modified template is reloaded
+    src.write("port=%(port)s")
+    src.setmtime(os.path.getmtime(str(src)) + 10)
+    assert cache.read_template(str(src)) == "port=%(port)s"
@@ -0,0 +1,61 @@
+def test_identity_map(master_node):
+    from gluuengine.model import MasterNode
+    from gluuengine.unitofwork import query_key
+    from gluuengine.unitofwork import UnitOfWork
+
+    unit = UnitOfWork()
+    key = query_key("search", {"type": "master"})
+    assert unit.get_query("nodes", key) is None
+
+    unit.set_query("nodes", key, [master_node])
+    assert unit.get_query("nodes", key) == [master_node]
+
+    # object with same id is resolved to the one in identity map
+    other = MasterNode()
+    other.id = master_node.id
+    objs = unit.set_query("nodes", query_key("get", master_node.id), [other])
+    assert objs[0] is master_node
+
+    unit.invalidate("nodes")
+    assert unit.get_query("nodes", key) is None
+
+
+def test_query_key():
+    from gluuengine.unitofwork import query_key
+
+    assert query_key("search", {"a": 1, "b": 2}) == \
+        query_key("search", {"b": 2, "a": 1})
+    assert query_key("get", "abc") != query_key("search", "abc")
+
+
+def test_unit_of_work(monkeypatch, master_node):
+    from gluuengine.database import Database
+    from gluuengine.serializer import dump
+
+    finds = []
+
+    class FakeCollection(object):
+        def find(self, condition=None, projection=None):
+            finds.append(condition)
+            return [dump(master_node)]
+
+        def delete_one(self, condition):
+            pass
+
+    monkeypatch.setattr(Database, "db", {"nodes": FakeCollection()})
+    db = Database()
+
+    with db.unit_of_work():
+        node = db.search_from_table("nodes", {"type": "master"})[0]
+        assert db.search_from_table("nodes", {"type": "master"})[0] is node
+        assert len(finds) == 1
+
+        # writes discard loaded objects
+        db.delete_from_table("nodes", {"name": "worker-node"})
+        db.search_from_table("nodes", {"type": "master"})
+        assert len(finds) == 2
+
+    # no unit of work
+    db.search_from_table("nodes", {"type": "master"})
+    assert len(finds) == 3
+    assert db.unit is None
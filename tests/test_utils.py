@@ -52,3 +52,34 @@ def test_decrypt_text():
     key = "123456789012345678901234"
     enc_text = "im6yqa0BROeTNcwvx4XCaw=="
     assert decrypt_text(enc_text, key) == "password"
+
+
+def test_make_tarfile(tmpdir):
+    import tarfile
+    from gluuengine.utils import make_tarfile
+
+    src = tmpdir.join("salt")
+    src.write("encodeSalt = abc")
+
+    tf = tarfile.open(fileobj=make_tarfile(str(src), arcname="opt/salt",
+                                           mode=0o640, uid=0, gid=0))
+    member = tf.getmember("opt/salt")
+    assert member.mode == 0o640
+    assert member.uid == 0 and member.gid == 0
+    assert tf.extractfile(member).read() == "encodeSalt = abc"
+
+
+def test_claim_runfile(tmpdir):
+    import fcntl
+    from gluuengine.utils import claim_runfile
+
+    runfile = str(tmpdir.join("task.run"))
+
+    # runfile locked by other process
+    with open(runfile, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        assert not claim_runfile(runfile)
+
+    # lock is released once the process exits
+    assert claim_runfile(runfile)
+    assert claim_runfile(runfile)
@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture()
+def weave(monkeypatch, app, master_node):
+    from gluuengine.weave import Weave
+    from gluuengine.weave import invalidate_dns_args
+
+    monkeypatch.setattr(
+        "gluuengine.database.db.search_from_table",
+        lambda table_name, condition: [master_node],
+    )
+    monkeypatch.setattr(
+        "gluuengine.database.db.all",
+        lambda table_name: [],
+    )
+
+    commands = []
+
+    def ssh(cls, machine_name, cmd=""):
+        commands.append(cmd)
+        if cmd == "sudo weave dns-args":
+            return "--dns=172.17.0.1 --dns-search=weave.local."
+        return ""
+
+    monkeypatch.setattr("gluuengine.machine.Machine.ssh", ssh)
+
+    invalidate_dns_args(master_node.name)
+    weave = Weave(master_node, app)
+    weave.commands = commands
+    return weave
+
+
+def test_dns_args_cached(weave):
+    from gluuengine.weave import invalidate_dns_args
+
+    assert weave.dns_args() == ("172.17.0.1", "weave.local.")
+    assert weave.dns_args() == ("172.17.0.1", "weave.local.")
+    assert weave.commands == ["sudo weave dns-args"]
+
+    # cache is cleared after weave is relaunched
+    invalidate_dns_args(weave.node.name)
+    weave.dns_args()
+    assert len(weave.commands) == 2
+
+
+def test_dns_add_many(weave):
+    weave.dns_add_many([
+        ("abc", "abc.oxauth.weave.local"),
+        ("abc", "oxauth.weave.local"),
+    ])
+    assert weave.commands == [
+        "sudo weave dns-add abc -h abc.oxauth.weave.local && "
+        "sudo weave dns-add abc -h oxauth.weave.local",
+    ]